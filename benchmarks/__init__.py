@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 性能基准测试
+@Date       : 2026/10/18 17:10
+@Author     : lkkings
+@FileName:  : __init__.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
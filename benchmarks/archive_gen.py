@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 可复现的合成归档生成器
+@Date       : 2026/10/18 17:10
+@Author     : lkkings
+@FileName:  : archive_gen.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import io
+import json
+import os
+import random
+import tarfile
+import time
+import zipfile
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, List, Tuple
+
+# 生成算法的版本，变更后已缓存的归档会重新生成
+GENERATOR_VERSION = 2
+# 生成数据时每次写入的块大小
+_BLOCK_SIZE = 1024 * 1024
+# 数据块池的大小，每次读取时对块做随机字节置换，保证块间不重复
+_POOL_SIZE = 4
+_WORDS = [b"data", b"hive", b"archive", b"member", b"stream", b"chunk", b"offset", b"budget",
+          b"journal", b"extract", b"shard", b"buffer", b"zip", b"tar", b"lzma", b"bzip2"]
+
+
+@dataclass(frozen=True)
+class Profile:
+    """
+    数据集描述
+
+    :param name: 名称
+    :param files: 文件数量
+    :param min_size: 最小文件大小（字节）
+    :param max_size: 最大文件大小（字节）
+    :param depth: 目录深度
+    :param fanout: 每层子目录数量
+    :param compressible: 数据是否可压缩（文本）或不可压缩（随机字节）
+    """
+    name: str
+    files: int
+    min_size: int
+    max_size: int
+    depth: int = 1
+    fanout: int = 4
+    compressible: bool = True
+
+    def scaled(self, scale: float) -> "Profile":
+        """按比例缩放数据集，大文件缩放大小，小文件缩放数量"""
+        if self.files <= 16:
+            return Profile(self.name, self.files, max(1, int(self.min_size * scale)),
+                           max(1, int(self.max_size * scale)), self.depth, self.fanout, self.compressible)
+        return Profile(self.name, max(1, int(self.files * scale)), self.min_size, self.max_size,
+                       self.depth, self.fanout, self.compressible)
+
+
+PROFILES: Dict[str, Profile] = {
+    # 大量小文件：考验逐成员开销
+    "tiny": Profile("tiny", files=20000, min_size=256, max_size=4096, depth=2, fanout=16),
+    # 少量大文件：考验吞吐
+    "huge": Profile("huge", files=4, min_size=64 * 1024 * 1024, max_size=64 * 1024 * 1024),
+    # 深层目录树：考验目录创建
+    "deep": Profile("deep", files=4000, min_size=1024, max_size=16 * 1024, depth=24, fanout=2),
+    # 不可压缩数据：存储与 deflate 的差异最明显
+    "random": Profile("random", files=64, min_size=1024 * 1024, max_size=4 * 1024 * 1024, compressible=False),
+}
+
+# 格式名 -> (文件扩展名, 写入函数名, 参数)
+FORMATS: Dict[str, Tuple[str, str, object]] = {
+    "zip": (".zip", "_write_zip", zipfile.ZIP_DEFLATED),
+    "zip-stored": (".stored.zip", "_write_zip", zipfile.ZIP_STORED),
+    "tar.gz": (".tar.gz", "_write_tar", "gz"),
+    "tar.bz2": (".tar.bz2", "_write_tar", "bz2"),
+    "tar.xz": (".tar.xz", "_write_tar", "xz"),
+}
+
+
+class _SyntheticFile(io.RawIOBase):
+    """
+    按种子确定性生成内容的只读流，生成大文件时不占用等量内存。
+    每块数据取自块池并做一次随机字节置换（bytes.translate），
+    熵与原块相同，但块间不再重复，避免 xz 等大窗口算法得到失真的压缩率。
+    """
+
+    def __init__(self, size: int, seed: int, pool: List[bytes]):
+        super().__init__()
+        self._left = size
+        self._rng = random.Random(seed)
+        self._pool = pool
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._left <= 0:
+            return 0
+        view = memoryview(buffer).cast("B")
+        block = self._pool[self._rng.randrange(len(self._pool))]
+        table = bytearray(range(256))
+        self._rng.shuffle(table)
+        n = min(len(view), self._left, len(block))
+        view[:n] = block[:n].translate(table)
+        self._left -= n
+        return n
+
+
+def _block_pool(seed: int, compressible: bool) -> List[bytes]:
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(_POOL_SIZE):
+        if compressible:
+            words = []
+            size = 0
+            while size < _BLOCK_SIZE:
+                word = rng.choice(_WORDS) + (b"\n" if rng.random() < 0.1 else b" ")
+                words.append(word)
+                size += len(word)
+            pool.append(b"".join(words)[:_BLOCK_SIZE])
+        else:
+            pool.append(rng.getrandbits(_BLOCK_SIZE * 8).to_bytes(_BLOCK_SIZE, "little"))
+    return pool
+
+
+def iter_members(profile: Profile, seed: int = 0) -> Iterator[Tuple[str, int, int]]:
+    """按种子生成成员列表: (成员名, 大小, 内容种子)"""
+    rng = random.Random(f"{profile.name}:{seed}")
+    for index in range(profile.files):
+        parts = [f"d{rng.randrange(profile.fanout)}" for _ in range(rng.randint(1, profile.depth))]
+        name = "/".join(parts + [f"f{index}.bin"])
+        yield name, rng.randint(profile.min_size, profile.max_size), rng.getrandbits(32)
+
+
+def _write_zip(path: str, profile: Profile, seed: int, compression: int) -> Tuple[int, int]:
+    pool = _block_pool(seed, profile.compressible)
+    files = nbytes = 0
+    with zipfile.ZipFile(path, "w", compression=compression) as zip_file:
+        for name, size, member_seed in iter_members(profile, seed):
+            info = zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = compression
+            with zip_file.open(info, "w", force_zip64=size >= 0x7FFFFFFF) as dst:
+                src = _SyntheticFile(size, member_seed, pool)
+                buffer = bytearray(_BLOCK_SIZE)
+                while True:
+                    n = src.readinto(buffer)
+                    if not n:
+                        break
+                    dst.write(memoryview(buffer)[:n])
+            files += 1
+            nbytes += size
+    return files, nbytes
+
+
+def _write_tar(path: str, profile: Profile, seed: int, compression: str) -> Tuple[int, int]:
+    pool = _block_pool(seed, profile.compressible)
+    files = nbytes = 0
+    with tarfile.open(path, f"w:{compression}") as tar_file:
+        for name, size, member_seed in iter_members(profile, seed):
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = 1577836800
+            tar_file.addfile(info, io.BufferedReader(_SyntheticFile(size, member_seed, pool), _BLOCK_SIZE))
+            files += 1
+            nbytes += size
+    return files, nbytes
+
+
+def generate(work_dir: str, profile: Profile, fmt: str, seed: int = 0, regenerate: bool = False) -> Dict:
+    """
+    生成（或复用已生成的）合成归档，并在同名 .json 中记录数据集参数与统计
+
+    :param work_dir: 归档存放目录
+    :param profile: 数据集
+    :param fmt: 格式名，见 FORMATS
+    :param seed: 随机种子，相同参数生成的归档内容完全一致
+    :param regenerate: 是否忽略已生成的归档
+    :return: 归档清单 {"path", "profile", "format", "seed", "files", "bytes", "archive_bytes"}
+    """
+    extension, writer, argument = FORMATS[fmt]
+    path = os.path.join(work_dir, f"{profile.name}{extension}")
+    manifest_path = path + ".json"
+    expected = {"generator": GENERATOR_VERSION, "profile": asdict(profile), "format": fmt, "seed": seed}
+    if not regenerate and os.path.exists(path) and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if all(manifest.get(key) == value for key, value in expected.items()):
+            return manifest
+    os.makedirs(work_dir, exist_ok=True)
+    start = time.perf_counter()
+    files, nbytes = globals()[writer](path, profile, seed, argument)
+    manifest = dict(expected, path=os.path.abspath(path), files=files, bytes=nbytes,
+                    archive_bytes=os.path.getsize(path), generate_seconds=round(time.perf_counter() - start, 3))
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
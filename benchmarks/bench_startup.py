@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: dh 命令行启动耗时基准
+@Date       : 2026/10/19 9:30
+@Author     : lkkings
+@FileName:  : bench_startup.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+用法:
+    python -m benchmarks.bench_startup --repeat 20 --output result.json
+    python -m benchmarks.bench_startup --max-ms 150
+
+每次在新的解释器中执行 dh 命令（默认 --version），记录耗时与加载的模块，
+并检查 rich、psutil、aiopath 等只在子命令执行时才需要的模块没有被导入。
+超过 --max-ms 或导入了禁止的模块时以非零状态退出，可作为回归检查。
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+# 启动时不应导入的模块
+FORBIDDEN_MODULES = [
+    "asyncio",
+    "loguru",
+    "rich",
+    "psutil",
+    "pynput",
+    "aiopath",
+    "aiofiles",
+    "asyncio_pool",
+    "rarfile",
+    "multiprocessing.shared_memory",
+    "datahive.cli.cli_console",
+    "datahive.script",
+]
+
+# 子进程中执行的脚本：运行命令后输出已加载的模块
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.argv = ["dh"] + json.loads(sys.argv[1])
+from datahive.cli.cli_commands import main
+try:
+    main(standalone_mode=False)
+finally:
+    sys.stderr.write("\\n" + json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure(args: List[str]) -> Dict:
+    """在新的解释器中执行一次命令，返回导入与执行耗时（不含解释器自身启动）、进程总耗时与已加载模块"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", _PROBE, json.dumps(args)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip()}
+    result = json.loads(completed.stderr.rstrip().rsplit("\n", 1)[-1])
+    result["wall_seconds"] = wall
+    return result
+
+
+def _forbidden(modules: List[str]) -> List[str]:
+    return [name for name in FORBIDDEN_MODULES if any(m == name or m.startswith(name + ".") for m in modules)]
+
+
+def run_benchmark(args: List[str], repeat: int = 10) -> Dict:
+    runs = [measure(args) for _ in range(repeat)]
+    errors = [run["error"] for run in runs if "error" in run]
+    if errors:
+        return {"args": args, "error": errors[0]}
+    modules = runs[-1]["modules"]
+    seconds = [run["seconds"] for run in runs]
+    wall = [run["wall_seconds"] for run in runs]
+    return {
+        "args": args,
+        "import_ms": {
+            "best": round(min(seconds) * 1000, 2),
+            "median": round(statistics.median(seconds) * 1000, 2),
+        },
+        "wall_ms": {
+            "best": round(min(wall) * 1000, 2),
+            "median": round(statistics.median(wall) * 1000, 2),
+        },
+        "modules": len(modules),
+        "forbidden": _forbidden(modules),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="dh 命令行启动耗时基准")
+    parser.add_argument("--args", nargs="*", default=["--version"], help="传给 dh 的参数，默认 --version")
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数，取最快一次与中位数")
+    parser.add_argument("--max-ms", type=float, default=None, help="导入与执行耗时（最快一次）上限，超过时以非零状态退出")
+    parser.add_argument("--output", "-o", default=None, help="结果 JSON 文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    from datahive import __version__
+    result = run_benchmark(args.args, args.repeat)
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "result": result,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+    if "error" in result:
+        sys.exit(f"命令执行失败: {result['error']}")
+    failures = []
+    if result["forbidden"]:
+        failures.append(f"启动时导入了: {', '.join(result['forbidden'])}")
+    if args.max_ms is not None and result["import_ms"]["best"] > args.max_ms:
+        failures.append(f"启动耗时 {result['import_ms']['best']}ms 超过 {args.max_ms}ms")
+    if failures:
+        sys.exit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
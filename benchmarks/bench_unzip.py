@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: dh unzip 解压性能基准
+@Date       : 2026/10/18 17:40
+@Author     : lkkings
+@FileName:  : bench_unzip.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+用法:
+    python -m benchmarks.bench_unzip --work /tmp/dh-bench --scale 0.1 --output result.json
+
+每个用例在独立进程中运行，主进程采样整个进程树的内存峰值，
+结果以 JSON 输出，便于在不同版本之间比较。
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import platform
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import psutil
+
+from benchmarks.archive_gen import FORMATS, PROFILES, generate
+
+# 内存采样间隔（秒）
+SAMPLE_INTERVAL = 0.02
+
+
+def _cpu_seconds() -> float:
+    times = psutil.Process().cpu_times()
+    # 已回收子进程（进程池）的 CPU 时间，部分平台不提供
+    return times.user + times.system + getattr(times, "children_user", 0.0) + getattr(times, "children_system", 0.0)
+
+
+async def _extract(input_file: str, output_file: str, max_workers: int):
+    from aiopath import AsyncPath
+    from datahive.script.extraction import factory
+
+    input_path = AsyncPath(input_file)
+    strategy = factory.get_strategy(''.join(input_path.suffixes))
+    strategy.max_workers = max_workers
+    await strategy.extract(input_path, AsyncPath(output_file))
+    return type(strategy).__name__
+
+
+async def _batch(task_list: str, max_workers: int):
+    from datahive.script import unzip
+
+    await unzip.batch_run(task_list, max_workers)
+    return "unzip.batch_run"
+
+
+def _run_case(conn, case: str, args: tuple):
+    """用例子进程：执行解压并回传耗时与 CPU 时间"""
+    # 进度界面输出到空设备，标准输出只留给结果 JSON
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    try:
+        func = _extract if case == "strategy" else _batch
+        cpu = _cpu_seconds()
+        start = time.perf_counter()
+        name = asyncio.run(func(*args))
+        conn.send({"name": name, "seconds": time.perf_counter() - start, "cpu_seconds": _cpu_seconds() - cpu})
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def _tree_rss(process: psutil.Process) -> int:
+    rss = 0
+    try:
+        for p in [process] + process.children(recursive=True):
+            try:
+                rss += p.memory_info().rss
+            except psutil.Error:
+                pass
+    except psutil.Error:
+        pass
+    return rss
+
+
+def measure(case: str, args: tuple) -> Dict:
+    """在独立进程中运行一个用例，采样进程树的内存峰值"""
+    ctx = mp.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    child = ctx.Process(target=_run_case, args=(sender, case, args))
+    child.start()
+    sender.close()
+    process = psutil.Process(child.pid)
+    peak_rss = 0
+    while not receiver.poll(SAMPLE_INTERVAL):
+        peak_rss = max(peak_rss, _tree_rss(process))
+        if not child.is_alive():
+            break
+    result = receiver.recv() if receiver.poll() else {"error": f"进程异常退出 -> {child.exitcode}"}
+    child.join()
+    result["peak_rss"] = peak_rss
+    return result
+
+
+def _scan_output(paths: List[str]) -> Tuple[int, int]:
+    """统计解压输出的文件数与字节数，用于确认用例完整执行"""
+    files = nbytes = 0
+    for path in paths:
+        for root, _, names in os.walk(path):
+            for name in names:
+                files += 1
+                nbytes += os.path.getsize(os.path.join(root, name))
+    return files, nbytes
+
+
+def _summary(result: Dict, files: int, nbytes: int, outputs: List[str]) -> Dict:
+    if "error" in result:
+        return result
+    if _scan_output(outputs) != (files, nbytes):
+        return {"error": "解压结果不完整", **result}
+    seconds = result["seconds"]
+    return {
+        "name": result["name"],
+        "seconds": round(seconds, 4),
+        "mb_s": round(nbytes / seconds / 1024 / 1024, 2),
+        "files_s": round(files / seconds, 1),
+        "peak_rss": result["peak_rss"],
+        "cpu_seconds": round(result["cpu_seconds"], 3),
+        # 可能超过 100%，表示多核并行
+        "cpu_percent": round(result["cpu_seconds"] / seconds * 100, 1),
+    }
+
+
+def _best(runs: List[Dict]) -> Optional[Dict]:
+    runs = [run for run in runs if "error" not in run]
+    return min(runs, key=lambda run: run["seconds"]) if runs else None
+
+
+def run_benchmarks(work_dir: str, profiles: List[str], formats: List[str], scale: float = 1.0, repeat: int = 3,
+                   max_workers: int = 1, batch: bool = True, seed: int = 0, regenerate: bool = False) -> Dict:
+    work_dir = os.path.abspath(work_dir)
+    archive_dir = os.path.join(work_dir, "archives")
+    output_root = os.path.join(work_dir, "output")
+    manifests = []
+    for profile_name in profiles:
+        profile = PROFILES[profile_name].scaled(scale)
+        for fmt in formats:
+            manifests.append(generate(archive_dir, profile, fmt, seed, regenerate))
+
+    def clean():
+        shutil.rmtree(output_root, ignore_errors=True)
+        os.makedirs(output_root)
+
+    results = []
+    for manifest in manifests:
+        name = os.path.basename(manifest["path"])
+        output = os.path.join(output_root, name, "out")
+        runs = []
+        for _ in range(repeat):
+            clean()
+            result = measure("strategy", (manifest["path"], output, max_workers))
+            runs.append(_summary(result, manifest["files"], manifest["bytes"], [output]))
+        results.append({
+            "case": "strategy",
+            "archive": name,
+            "profile": manifest["profile"]["name"],
+            "format": manifest["format"],
+            "files": manifest["files"],
+            "bytes": manifest["bytes"],
+            "archive_bytes": manifest["archive_bytes"],
+            "best": _best(runs),
+            "runs": runs,
+        })
+    if batch and manifests:
+        task_list = os.path.join(work_dir, "bench.task")
+        outputs = [os.path.join(output_root, os.path.basename(manifest["path"]), "out") for manifest in manifests]
+        with open(task_list, "w", encoding="utf-8") as f:
+            for manifest, output in zip(manifests, outputs):
+                f.write(f"{manifest['path']}|{output}\n")
+        files = sum(manifest["files"] for manifest in manifests)
+        nbytes = sum(manifest["bytes"] for manifest in manifests)
+        runs = []
+        for _ in range(repeat):
+            clean()
+            result = measure("batch", (task_list, max(max_workers, mp.cpu_count())))
+            runs.append(_summary(result, files, nbytes, outputs))
+        results.append({
+            "case": "batch",
+            "archive": os.path.basename(task_list),
+            "files": files,
+            "bytes": nbytes,
+            "best": _best(runs),
+            "runs": runs,
+        })
+    shutil.rmtree(output_root, ignore_errors=True)
+
+    from datahive import __version__
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": mp.cpu_count(),
+        "scale": scale,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="dh unzip 解压性能基准")
+    parser.add_argument("--work", default=os.path.join(os.getcwd(), ".bench"), help="归档与解压输出的工作目录")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument("--scale", type=float, default=1.0, help="数据集缩放比例，快速验证可用 0.1")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的重复次数，取最快一次")
+    parser.add_argument("--max_workers", type=int, default=1, help="单个归档的解压进程数")
+    parser.add_argument("--no-batch", dest="batch", action="store_false", help="不运行 unzip.batch_run 用例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--regenerate", action="store_true", help="重新生成归档")
+    parser.add_argument("--output", "-o", default=None, help="结果 JSON 文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+    report = run_benchmarks(args.work, args.profiles, args.formats, args.scale, args.repeat,
+                            args.max_workers, args.batch, args.seed, args.regenerate)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
-from datahive.cli.cli_console import  ProgressManager, RichConsoleManager
-
+# 按需导入，避免 import datahive.cli 时加载 rich 等依赖
 __all__ = ["ProgressManager", "RichConsoleManager"]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        from datahive.cli import cli_console
+        return getattr(cli_console, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,17 +1,25 @@
-import re
+import os
 import sys
+from functools import wraps
 
 import click
-from typing import Optional, Union, Any
-import multiprocessing as mp
-
-from loguru import logger
+from typing import Optional, Union, Any, Tuple
 
 import datahive
-from datahive import helps
-from datahive.script import unzip
-from datahive.script import diff
-from datahive.utils.async_util import run_async_func
+
+# 子命令的实现模块（及 rich、psutil、aiopath 等依赖）在命令执行时才导入，
+# dh --version、dh --help 等不需要加载它们
+
+
+def lazy_run_async_func(func):
+    """同 run_async_func，执行命令时才导入 asyncio 与 async_util"""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        from datahive.utils.async_util import run_async_func
+        return run_async_func(func)(*args, **kwargs)
+
+    return wrapper
 
 
 # 处理帮助信息
@@ -22,6 +30,7 @@ def handle_help(
 ) -> None:
     if not value or ctx.resilient_parsing:
         return
+    from datahive import helps
     helps.main()
     ctx.exit()
 
@@ -47,6 +56,7 @@ def handle_debug(
     if not value or ctx.resilient_parsing:
         return
     from rich.traceback import install
+    from loguru import logger
     install()
     logger.remove(0)
     logger.add(sys.stdout, level="value")
@@ -105,24 +115,155 @@ def main(ctx) -> None:
 )
 @click.option(
     "--task_list",
-    type=click.Path(exists=True),
+    type=click.Path(exists=True, allow_dash=True),
     nargs=1,
-    required=False
+    required=False,
+    help="批量解压的任务列表：*.task（INPUT_FILE|OUTPUT_FILE）、*.jsonl（{\"input\": ..., \"output\": ...}），"
+         "或 - 从标准输入流式读取"
 )
 @click.option(
     "--max_workers",
     "-P",
     type=int,
-    default=mp.cpu_count() * 4,
-    required=False
+    default=(os.cpu_count() or 1) * 4,
+    required=False,
+    help="并发预算：单个归档时为分片解压的进程数上限；--task_list 时为全局并发数，"
+         "解压进程数不超过 CPU 数，其余作为各进程内同时写出的成员数"
+)
+@click.option(
+    "--max_memory",
+    "-M",
+    type=str,
+    default=None,
+    required=False,
+    help="所有解压进程共享的在途数据内存预算，如 512M、2G"
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="根据解压日志续解，跳过已完整写出的成员"
+)
+@click.option(
+    "--dedup",
+    "dedup_mode",
+    type=click.Choice(["hardlink", "reflink"]),
+    default=None,
+    required=False,
+    help="内容去重：重复的成员（同一归档内及整个任务列表内）写为硬链接或写时复制克隆"
+)
+@click.option(
+    "--list",
+    "-l",
+    "list_only",
+    is_flag=True,
+    default=False,
+    help="只列出归档成员，不解压（使用缓存的归档索引）"
+)
+@click.option(
+    "--include",
+    "-i",
+    type=str,
+    multiple=True,
+    required=False,
+    help="只解压名称匹配该模式的成员（fnmatch，匹配目录时包含其下全部成员），可多次指定"
+)
+@click.option(
+    "--recursive",
+    "-r",
+    type=int,
+    default=0,
+    required=False,
+    help="递归解压嵌套归档的最大层数，嵌套归档在内存中直接解压到去掉扩展名的同名目录，不写出中间文件"
+)
+@click.option(
+    "--nested_max_size",
+    type=str,
+    default=None,
+    required=False,
+    help="在内存中递归解压的嵌套归档大小上限，如 64M，更大的嵌套归档按普通文件写出"
+)
+@click.option(
+    "--metrics",
+    "metrics_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    required=False,
+    help="定期导出各阶段耗时、队列深度等运行指标：*.prom 为 Prometheus 文本文件（每次整体替换），"
+         "其余按 JSON 行追加"
+)
+@click.option(
+    "--metrics_interval",
+    type=float,
+    default=5.0,
+    required=False,
+    help="运行指标的导出间隔（秒）"
 )
 @click.pass_context
-@run_async_func
-async def unzip_command(ctx, input_file: str, output_file: Optional[str], task_list: Optional[str], max_workers: int) -> None:
-    if task_list:
-        await unzip.batch_run(task_list, max_workers)
+@lazy_run_async_func
+async def unzip_command(ctx, input_file: str, output_file: Optional[str], task_list: Optional[str], max_workers: int,
+                        max_memory: Optional[str], resume: bool, dedup_mode: Optional[str], list_only: bool,
+                        include: Tuple[str, ...], recursive: int, nested_max_size: Optional[str],
+                        metrics_path: Optional[str], metrics_interval: float) -> None:
+    from datahive.script import unzip
+    include = list(include) or None
+    if list_only:
+        await unzip.list_run(input_file)
+    elif task_list:
+        await unzip.batch_run(task_list, max_workers, max_memory, resume, dedup_mode, include, recursive,
+                              nested_max_size, metrics_path, metrics_interval)
     else:
-        await unzip.run(input_file, output_file)
+        await unzip.run(input_file, output_file, max_workers, max_memory, resume, dedup_mode, include, recursive,
+                        nested_max_size, metrics_path, metrics_interval)
+
+
+@main.command(
+    "convert",
+    help="归档格式转换的命令行工具，成员数据直接从源归档写入目标归档\n\n"
+         "INPUT_FILE: 源归档路径\n"
+         "OUTPUT_FILE: 目标归档路径，格式由扩展名决定（.zip/.tar/.tar.gz/.tar.xz/.tar.bz2/.tar.zst）"
+)
+@click.argument(
+    "input_file",
+    type=click.Path(exists=True),
+    nargs=1,
+    required=True,
+)
+@click.argument(
+    "output_file",
+    type=click.Path(exists=False),
+    nargs=1,
+    required=True
+)
+@click.option(
+    "--max_workers",
+    "-P",
+    type=int,
+    default=os.cpu_count() or 1,
+    required=False,
+    help="并行压缩的线程数"
+)
+@click.option(
+    "--level",
+    type=click.IntRange(0, 9),
+    default=None,
+    required=False,
+    help="压缩级别，默认使用各格式的默认级别"
+)
+@click.option(
+    "--include",
+    "-i",
+    type=str,
+    multiple=True,
+    required=False,
+    help="只转换名称匹配该模式的成员（fnmatch），可多次指定"
+)
+@click.pass_context
+@lazy_run_async_func
+async def convert_command(ctx, input_file: str, output_file: str, max_workers: int, level: Optional[int],
+                          include: Tuple[str, ...]) -> None:
+    from datahive.script import convert
+    await convert.run(input_file, output_file, max_workers, level, list(include) or None)
 
 
 @main.command(
@@ -135,6 +276,7 @@ async def unzip_command(ctx, input_file: str, output_file: Optional[str], task_l
 @click.option('-t2', '--text2', type=str, help="新文本")
 @click.pass_context
 def diff_command(ctx, file1: Optional[str], file2: Optional[str], text1: Optional[str], text2: Optional[str]):
+    from datahive.script import diff
     diff.run(file1, file2, text1, text2)
 
 
@@ -1,11 +1,14 @@
 import json
+import mmap
+import multiprocessing as mp
+import os
 import shutil
 import struct
+import tempfile
 import threading
 import time
-from pathlib import Path
-import shutil
-import multiprocessing.shared_memory as shm
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import psutil
 from rich.layout import Layout
@@ -16,14 +19,12 @@ from rich.console import Console
 from rich.progress import (
     BarColumn,
     TextColumn,
-    TimeRemainingColumn,
     ProgressColumn, Progress,
 )
 from rich.style import Style
+from rich.table import Table
 from rich.text import Text
 
-from datahive.utils.share_meory_util import SharedMemoryDict
-
 HACK_STYLE = Style(color="#00ff00", bgcolor="#000000", bold=True)
 HACK_BAR_STYLE = Style(color="#00ff00", bgcolor="#000000")
 HACK_TEXT_STYLE = Style(color="#00ff00", bold=True)
@@ -33,7 +34,8 @@ FONT_MAX_LENGTH = shutil.get_terminal_size().columns // 5
 
 def get_system_status():
     memory = psutil.virtual_memory()
-    cpu_percent = psutil.cpu_percent(interval=0.1)
+    # interval=None 时与上次调用比较，不阻塞渲染线程
+    cpu_percent = psutil.cpu_percent(interval=None)
     return (
         f"内存: {memory.percent}% | "
         f"CPU: {cpu_percent}%"
@@ -56,13 +58,186 @@ class StateColumn(ProgressColumn):
 
 
 # 定义任务结构
-# 假设任务名称最大长度为 20 个字符（20 bytes），完成量和总量各为 4 字节整数
-TASK_NAME_MAX_LENGTH = 20
-TASK_STRUCT_FORMAT = f"{TASK_NAME_MAX_LENGTH}sii"  # 20s: 字符串, i: 整数, i: 整数
+# 每个任务一条定长记录：任务名（UTF-8，超长截断）、完成量、完成字节数、总量、总字节数（总量为 -1 表示未知）、状态，
+# 整数按 8 字节对齐，完成量与完成字节数相邻，更新计数只需原位写入 16 个字节
+TASK_NAME_MAX_LENGTH = 96
+TASK_STRUCT_FORMAT = f"{TASK_NAME_MAX_LENGTH}sqqqqb7x"
 TASK_STRUCT_SIZE = struct.calcsize(TASK_STRUCT_FORMAT)
+_COMPLETED_OFFSET = TASK_NAME_MAX_LENGTH
+_TOTAL_OFFSET = _COMPLETED_OFFSET + 16
+_TOTAL_BYTES_OFFSET = _TOTAL_OFFSET + 8
+_STATE_OFFSET = _TOTAL_BYTES_OFFSET + 8
+# 记录中的状态，成功与警告由渲染线程根据计数判断
+STATE_RUNNING = 0
+STATE_FAILED = 1
+# 头部：已分配的记录数、容量
+_HEADER_FORMAT = "qq"
+_HEADER_SIZE = 64
+
+
+# 速度取最近该时间窗口（秒）内的平均值
+SPEED_WINDOW = 3.0
+
+
+class TaskProgress(NamedTuple):
+    """进度板中一个任务合并后的进度，总量未知时为 None"""
+    completed: int
+    total: Optional[int]
+    completed_bytes: int
+    total_bytes: Optional[int]
+    failed: bool
+
+
+def _encode_name(task_name: str) -> bytes:
+    return task_name.encode("utf-8")[:TASK_NAME_MAX_LENGTH].decode("utf-8", "ignore").encode("utf-8")
+
+
+def _shm_dir() -> str:
+    """优先使用内存文件系统，进度板的读写不落盘"""
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+class ProgressBoard:
+    """
+    跨进程共享的进度板：映射到内存文件的定长记录数组，容量不足时按倍数扩容。
+
+    每个进程只写自己分配到的记录，计数原位更新，不加锁也不序列化；只有分配记录时持有跨进程锁。
+    同一任务在多个进程中都有更新时（如大归档按成员拆分到多个进程），各进程各用一条记录，读取时按任务名合并。
+    锁与文件路径通过 state/attach 传给进程池。
+    """
+    # 初始记录数
+    initial_capacity = 256
+
+    def __init__(self):
+        fd, self._path = tempfile.mkstemp(prefix="datahive-progress-", suffix=".bin", dir=_shm_dir())
+        os.ftruncate(fd, _HEADER_SIZE + self.initial_capacity * TASK_STRUCT_SIZE)
+        self._fd = fd
+        self._map = mmap.mmap(fd, 0)
+        struct.pack_into(_HEADER_FORMAT, self._map, 0, 0, self.initial_capacity)
+        self._lock = mp.Lock()
+        self._owner = os.getpid()
+        self._pid = self._owner
+        # 任务名 -> 本进程的记录序号
+        self._slots: Dict[bytes, int] = {}
+
+    @property
+    def state(self) -> Tuple[str, object]:
+        """供进程池 initializer 传递的共享状态"""
+        return self._path, self._lock
+
+    def attach(self, state: Tuple[str, object]):
+        """子进程接入主进程的进度板"""
+        # spawn 方式启动的子进程会先创建自己的进度板，接入前释放
+        self.close()
+        self._path, self._lock = state
+        self._fd = os.open(self._path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        self._map = mmap.mmap(self._fd, 0)
+        self._pid = os.getpid()
+        self._slots = {}
+
+    def _ensure_mapped(self, size: int):
+        """其他进程扩容后，重新映射到文件的当前大小"""
+        if len(self._map) < size:
+            self._map.close()
+            self._map = mmap.mmap(self._fd, 0)
+
+    def _allocate(self, name: bytes, total: Optional[int]) -> int:
+        with self._lock:
+            self._ensure_mapped(_HEADER_SIZE)
+            used, capacity = struct.unpack_from(_HEADER_FORMAT, self._map, 0)
+            if used == capacity:
+                capacity *= 2
+                os.ftruncate(self._fd, _HEADER_SIZE + capacity * TASK_STRUCT_SIZE)
+            self._ensure_mapped(_HEADER_SIZE + capacity * TASK_STRUCT_SIZE)
+            struct.pack_into(TASK_STRUCT_FORMAT, self._map, _HEADER_SIZE + used * TASK_STRUCT_SIZE,
+                             name, 0, 0, -1 if total is None else total, -1, STATE_RUNNING)
+            # 记录写完后再发布，读取方只读已发布的记录
+            struct.pack_into(_HEADER_FORMAT, self._map, 0, used + 1, capacity)
+        return used
+
+    def _offset(self, task_name: str) -> int:
+        """本进程中该任务的记录偏移，尚未分配时分配一条总量未知的记录"""
+        if self._pid != os.getpid():
+            # fork 出的子进程不能沿用父进程的记录
+            self._pid = os.getpid()
+            self._slots = {}
+        name = _encode_name(task_name)
+        slot = self._slots.get(name)
+        if slot is None:
+            slot = self._slots[name] = self._allocate(name, None)
+        offset = _HEADER_SIZE + slot * TASK_STRUCT_SIZE
+        self._ensure_mapped(offset + TASK_STRUCT_SIZE)
+        return offset
+
+    def add_task(self, task_name: str, total: Optional[int]):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._slots = {}
+        name = _encode_name(task_name)
+        self._slots[name] = self._allocate(name, total)
+
+    def set_total_bytes(self, task_name: str, total_bytes: Optional[int]):
+        struct.pack_into("q", self._map, self._offset(task_name) + _TOTAL_BYTES_OFFSET,
+                         -1 if total_bytes is None else total_bytes)
+
+    def update(self, task_name: str, advance: int = 1, nbytes: int = 0):
+        offset = self._offset(task_name) + _COMPLETED_OFFSET
+        completed, completed_bytes = struct.unpack_from("qq", self._map, offset)
+        struct.pack_into("qq", self._map, offset, completed + advance, completed_bytes + nbytes)
+
+    def failed(self, task_name: str):
+        struct.pack_into("b", self._map, self._offset(task_name) + _STATE_OFFSET, STATE_FAILED)
+
+    def read(self) -> Dict[str, TaskProgress]:
+        """一次读出全部记录并按任务名合并"""
+        used, _ = struct.unpack_from(_HEADER_FORMAT, self._map, 0)
+        end = _HEADER_SIZE + used * TASK_STRUCT_SIZE
+        self._ensure_mapped(end)
+        tasks: Dict[str, list] = {}
+        with memoryview(self._map) as view:
+            for name, completed, completed_bytes, total, total_bytes, state in struct.iter_unpack(
+                    TASK_STRUCT_FORMAT, view[_HEADER_SIZE:end]):
+                task = tasks.get(name)
+                if task is None:
+                    task = tasks[name] = [0, None, 0, None, False]
+                task[0] += completed
+                if total >= 0:
+                    task[1] = (task[1] or 0) + total
+                task[2] += completed_bytes
+                if total_bytes >= 0:
+                    task[3] = (task[3] or 0) + total_bytes
+                task[4] = task[4] or state == STATE_FAILED
+        return {name.rstrip(b"\0").decode("utf-8"): TaskProgress(*task) for name, task in tasks.items()}
+
+    def close(self):
+        """关闭映射，创建进度板的进程同时删除文件"""
+        self._map.close()
+        os.close(self._fd)
+        if os.getpid() == self._owner:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+
+def _format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-:--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
 
 
 class ProgressManager(threading.Thread):
+    """
+    进度界面：渲染线程定时读取进度板并刷新。
+
+    各进程的 update 先在本进程内按任务累计，至少间隔 flush_interval 秒才写入一次进度板，
+    渲染线程每次刷新前也会写入主进程累计的部分；批量任务的子进程在每个单元结束时调用 flush。
+    有字节数的任务（如解压）按字节显示进度、速度（MB/s）与剩余时间，其余按完成量显示。
+    """
     __slots__ = (
         "_progress",
         "_layout",
@@ -70,10 +245,14 @@ class ProgressManager(threading.Thread):
         "_running",
         "_title",
         "_util",
-        "_shm_dict_key",
-        "_shm_dict",
+        "_board",
+        "_pending",
+        "_pending_lock",
+        "_flushed_at",
         "_refresh_per_second"
     )
+    # 本进程内累计的进度写入进度板的最小间隔（秒）
+    flush_interval = 0.2
 
     def __init__(self, title: str = "任务进度UI", util="it", refresh_per_second=0.2):
         super().__init__()
@@ -87,8 +266,9 @@ class ProgressManager(threading.Thread):
             ),
             TextColumn("[progress.percentage]{task.percentage:>3.0f}%", style=HACK_TEXT_STYLE),
             TextColumn("•", style=HACK_TEXT_STYLE),
-            TextColumn("[bold green]ETA", style=HACK_TEXT_STYLE),
-            TimeRemainingColumn(),
+            TextColumn("{task.fields[count]}", style=HACK_TEXT_STYLE),
+            TextColumn("•", style=HACK_TEXT_STYLE),
+            TextColumn("[bold green]ETA {task.fields[eta]}", style=HACK_TEXT_STYLE),
             TextColumn("{task.fields[speed]}", style=HACK_TEXT_STYLE),
             expand=True,
         )
@@ -98,13 +278,28 @@ class ProgressManager(threading.Thread):
         self._title = title
         self._util = util
         self._refresh_per_second = refresh_per_second
-        self._shm_dict_key = f"task_shm_dict"
-        self._shm_dict = SharedMemoryDict(self._shm_dict_key, size=1024, create=True, initial_data={})
+        self._board = ProgressBoard()
+        # 任务名 -> [累计完成量, 累计字节数]，尚未写入进度板
+        self._pending: Dict[str, List[int]] = {}
+        self._pending_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    @property
+    def state(self):
+        """供进程池 initializer 传递的进度板状态"""
+        return self._board.state
+
+    def attach(self, state):
+        """子进程接入主进程的进度板"""
+        self._board.attach(state)
+        # fork 时渲染线程可能正持有锁，子进程重新创建，也不沿用父进程尚未写入的进度
+        self._pending = {}
+        self._pending_lock = threading.Lock()
 
     def stop(self):
         self._running = False
         self.join()
-        self._shm_dict.unlink()
+        self._board.close()
 
     def _make_layout(self):
         # 创建布局
@@ -127,72 +322,98 @@ class ProgressManager(threading.Thread):
             )
         )
 
-    def add_task(self, task_name: str, total: int):
-        with SharedMemoryDict(self._shm_dict_key, size=1024) as write_shm_dict:
-            write_shm_dict[task_name] = {
-                "total": total,
-                "completed": 0,
-                "state": "running"
-            }
-
-    def update(self, task_name: str, advance: int = 1):
-        with SharedMemoryDict(self._shm_dict_key, size=1024) as write_shm_dict:
-            task = write_shm_dict[task_name].copy()
-            task["completed"] = task["completed"]+ advance
-            write_shm_dict[task_name] = task
+    def add_task(self, task_name: str, total: Optional[int]):
+        self._board.add_task(task_name, total)
+
+    def set_total_bytes(self, task_name: str, total_bytes: Optional[int]):
+        self._board.set_total_bytes(task_name, total_bytes)
+
+    def update(self, task_name: str, advance: int = 1, nbytes: int = 0):
+        with self._pending_lock:
+            pending = self._pending.get(task_name)
+            if pending is None:
+                self._pending[task_name] = [advance, nbytes]
+            else:
+                pending[0] += advance
+                pending[1] += nbytes
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def update_bytes(self, task_name: str, nbytes: int):
+        self.update(task_name, 0, nbytes)
+
+    def flush(self):
+        """把本进程累计的进度写入进度板"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+            for task_name, (advance, nbytes) in pending.items():
+                self._board.update(task_name, advance, nbytes)
 
     def failed(self, task_name: str):
-        with SharedMemoryDict(self._shm_dict_key, size=1024) as write_shm_dict:
-            task = write_shm_dict[task_name].copy()
-            task["state"] = "failed"
-            write_shm_dict[task_name] = task
+        # 任务可能在登记总量之前就已失败（如归档损坏）
+        self._board.failed(task_name)
 
     def run(self):
         self._running = True
         self._make_layout()
         task_ids = {}
+        # 任务名 -> [时间窗口内的 (刷新时间, 完成量) 采样, 速度, 是否按字节计量]
         task_states = {}
-        task_time = {}
 
         def _flash(is_end=False):
-            with SharedMemoryDict(self._shm_dict_key, size=1024) as read_shm_dict:
-                for task_name, _task in read_shm_dict.items():
-                    task = _task.copy()
-                    now_time = time.time()
-                    completed = task["completed"]
-                    total = task["total"]
-                    if task_name not in task_ids:
-                        task_id = self._progress.add_task(
-                            task_name,
-                            total=total,
-                            speed=f"速度: 0 {self._util}/s",
-                        )
-                        task_ids[task_name] = task_id
-                    else:
-                        task_id = task_ids[task_name]
-                        speed = (completed - task_states[task_name]) / (now_time - task_time[task_name])
-                        self._progress.update(
-                            task_id,
-                            completed=completed,
-                            speed=f"速度: {speed:0.2f} {self._util}/s"
-                        )
-                    task_states[task_name] = completed
-                    task_time[task_name] = now_time
-                    if completed == total:
-                        self._progress.update(
-                            task_id,
-                            state="success"
-                        )
-                    if task['state'] == "failed":
-                        self._progress.update(
-                            task_id,
-                            state="failed"
-                        )
-                    if is_end and total != completed:
-                        self._progress.update(
-                            task_id,
-                            state="warning"
-                        )
+            self.flush()
+            now_time = time.time()
+            for task_name, task in self._board.read().items():
+                by_bytes = task.total_bytes is not None or task.completed_bytes > 0
+                completed, total = (task.completed_bytes, task.total_bytes) if by_bytes \
+                    else (task.completed, task.total)
+                state = task_states.get(task_name)
+                if state is None or state[2] != by_bytes:
+                    # 首次出现，或开始有字节数时重新采样
+                    state = task_states[task_name] = [deque([(now_time, completed)]), 0.0, by_bytes]
+                elif total is None or state[0][-1][1] < total:
+                    # 已完成的任务保留完成时的速度
+                    samples = state[0]
+                    samples.append((now_time, completed))
+                    while len(samples) > 2 and now_time - samples[1][0] >= SPEED_WINDOW:
+                        samples.popleft()
+                    start_time, start_completed = samples[0]
+                    if now_time > start_time:
+                        state[1] = (completed - start_completed) / (now_time - start_time)
+                speed = state[1]
+                if total is None or speed <= 0:
+                    eta = 0 if total is not None and completed >= total else None
+                else:
+                    eta = max(total - completed, 0) / speed
+                fields = dict(
+                    total=total,
+                    completed=completed,
+                    count=f"{task.completed}/{'?' if task.total is None else task.total}",
+                    eta=_format_eta(eta),
+                    speed=f"速度: {speed / 1024 ** 2:0.2f} MB/s" if by_bytes else f"速度: {speed:0.2f} {self._util}/s",
+                )
+                if task_name not in task_ids:
+                    task_id = task_ids[task_name] = self._progress.add_task(task_name, **fields)
+                else:
+                    task_id = task_ids[task_name]
+                    self._progress.update(task_id, **fields)
+                # 成功与否按完成量判断；total 为 None 表示总量未知（如流式解压），结束时视为完成
+                if task.completed == task.total or (is_end and task.total is None):
+                    self._progress.update(
+                        task_id,
+                        state="success"
+                    )
+                if task.failed:
+                    self._progress.update(
+                        task_id,
+                        state="failed"
+                    )
+                if is_end and task.total is not None and task.total != task.completed and not task.failed:
+                    self._progress.update(
+                        task_id,
+                        state="warning"
+                    )
 
             self._layout["footer"].update(
                 Panel(
@@ -229,6 +450,14 @@ class RichConsoleManager:
         success_text = Text(f"✅ {message}", style="bold green")
         self._console.print(Panel(success_text, title="成功", border_style="green"))
 
+    def print_table(self, title: str, columns: List[str], rows: List[List[Any]]):
+        table = Table(title=title, header_style="bold cyan")
+        for column in columns:
+            table.add_column(column)
+        for row in rows:
+            table.add_row(*(str(cell) for cell in row))
+        self._console.print(table)
+
     def print_json(self, json_data: str):
         try:
             json.loads(json_data)
@@ -238,5 +467,17 @@ class RichConsoleManager:
             self._console.print_json(json_data)
 
 
-console = RichConsoleManager()
-progress = ProgressManager()
+# 全局的 console / progress 在首次访问时才创建：ProgressManager 会分配共享内存，
+# 只导入本模块（如查看版本、帮助）时不应产生这些开销
+_LAZY_GLOBALS = {
+    "console": RichConsoleManager,
+    "progress": ProgressManager,
+}
+
+
+def __getattr__(name: str):
+    factory = _LAZY_GLOBALS.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = factory()
+    return value
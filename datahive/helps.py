@@ -40,6 +40,7 @@ def main() -> None:
     table.add_column("描述", no_wrap=True, style="bold")
     table.add_column("状态", no_wrap=True, justify="left", style="bold")
     table.add_row("unzip", "解压文件的命令行工具", "🧪")
+    table.add_row("convert", "归档格式转换的命令行工具", "🧪")
     table.add_row("diff", "字符串差异比对的命令行工具", "🧪")
     table.add_row("look", "文本查看的命令行工具", "💻")
 
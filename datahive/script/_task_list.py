@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 流式读取与校验批量解压的任务列表
+@Date       : 2026/10/19 12:10
+@Author     : lkkings
+@FileName:  : _task_list.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+支持的格式（每行一个任务，空行忽略）:
+    *.task   INPUT_FILE|OUTPUT_FILE，或只有 INPUT_FILE（必须为绝对路径，输出到去掉扩展名的同名目录）
+    *.jsonl  {"input": "...", "output": "..."}，output 可省略
+    -        从标准输入读取，以 { 开头的行按 JSON 解析，其余按 INPUT_FILE|OUTPUT_FILE 解析
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import TimeoutError
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+STDIN = "-"
+FORMAT_TASK = "task"
+FORMAT_JSONL = "jsonl"
+FORMAT_AUTO = "auto"
+
+# 每批校验的行数
+BATCH_SIZE = 256
+# 同时校验的批次数
+PARALLEL_BATCHES = 4
+# 读取线程每次读取的字节数
+READ_SIZE = 64 * 1024
+
+
+class TaskEntry(NamedTuple):
+    """校验后的任务"""
+    # 在任务列表中的行号，同时作为任务序号
+    line: int
+    input_file: str
+    # None 表示输出到去掉扩展名的同名目录
+    output_file: Optional[str]
+    # 归档大小（字节），用于调度时估计工作量
+    size: int
+    # 校验失败的原因，None 表示有效
+    error: Optional[str] = None
+
+
+def task_list_format(task_list: str) -> str:
+    """根据任务列表路径确定格式，不支持的格式抛出 ValueError"""
+    if task_list == STDIN:
+        return FORMAT_AUTO
+    if task_list.endswith(".task"):
+        return FORMAT_TASK
+    if task_list.endswith(".jsonl"):
+        return FORMAT_JSONL
+    raise ValueError('任务列表应为 "*.task" 或 "*.jsonl" 格式，或用 - 从标准输入读取')
+
+
+def parse_line(line: str, fmt: str) -> Tuple[str, Optional[str]]:
+    """解析一行任务，返回 (输入路径, 输出路径)"""
+    if fmt == FORMAT_JSONL or (fmt == FORMAT_AUTO and line.startswith("{")):
+        task = json.loads(line)
+        if not isinstance(task, dict) or not isinstance(task.get("input"), str) or not task["input"].strip():
+            raise ValueError('格式错误，应为 {"input": INPUT_FILE, "output": OUTPUT_FILE}')
+        output_file = task.get("output")
+        if output_file is not None and not isinstance(output_file, str):
+            raise ValueError('格式错误，output 应为字符串')
+        return task["input"].strip(), output_file.strip() if output_file else None
+    arg = line.split('|')
+    if len(arg) == 1 and arg[0].strip():
+        return arg[0].strip(), None
+    if len(arg) == 2 and arg[0].strip():
+        return arg[0].strip(), arg[1].strip() or None
+    raise ValueError('格式错误，应为 INPUT_FILE|OUTPUT_FILE')
+
+
+def validate_line(number: int, line: str, fmt: str) -> TaskEntry:
+    """解析并校验一行任务，错误记录在返回的任务中而不是抛出"""
+    input_file, output_file = "", None
+    try:
+        input_file, output_file = parse_line(line, fmt)
+        if output_file is None and not os.path.isabs(input_file):
+            raise ValueError(f'路径必须为绝对路径 -> {input_file}')
+        if output_file is not None and not os.path.isabs(output_file):
+            raise ValueError(f'路径必须为绝对路径 -> {output_file}')
+        try:
+            size = os.stat(input_file).st_size
+        except FileNotFoundError:
+            raise FileNotFoundError(f'文件不存在 -> {input_file}') from None
+    except Exception as e:
+        return TaskEntry(number, input_file or line, output_file, 0, f'第{number}行存在错误:{e}')
+    return TaskEntry(number, input_file, output_file, size)
+
+
+def validate_batch(lines: List[Tuple[int, str]], fmt: str) -> List[TaskEntry]:
+    return [validate_line(number, line, fmt) for number, line in lines]
+
+
+def _read_lines(task_list: str, batch_size: int, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue,
+                stop: threading.Event):
+    """
+    读取线程：按块读取原始字节，每次只返回已到达的数据，切分出完整的行后成批放入队列。
+    文件一次读到多行，管道中逐行写入的任务也能立即交出；队列满时阻塞，形成背压。
+    结束时放入 None，出错时放入异常。
+
+    标准输入直接读取文件描述符，不经过 sys.stdin：读取线程阻塞时不持有它的锁，
+    fork 出的解压进程启动时关闭 sys.stdin 不会因此死锁。
+    """
+
+    def put(item) -> bool:
+        if stop.is_set():
+            return False
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while not stop.is_set():
+            try:
+                future.result(timeout=0.1)
+                return True
+            except TimeoutError:
+                continue
+        future.cancel()
+        return False
+
+    fd = None
+    try:
+        fd = sys.stdin.fileno() if task_list == STDIN else os.open(task_list, os.O_RDONLY)
+        number, rest = 0, b""
+        while True:
+            data = os.read(fd, READ_SIZE)
+            if data:
+                data = rest + data
+                end = data.rfind(b"\n") + 1
+                data, rest = data[:end], data[end:]
+            elif rest:
+                # 最后一行没有换行符
+                data, rest = rest + b"\n", b""
+            else:
+                break
+            lines = []
+            for line in data.split(b"\n")[:-1]:
+                number += 1
+                line = line.strip()
+                if line:
+                    lines.append((number, line.decode('utf-8', errors='replace')))
+            for start in range(0, len(lines), batch_size):
+                if not put(lines[start:start + batch_size]):
+                    return
+    except Exception as e:
+        put(e)
+        return
+    finally:
+        if fd is not None and task_list != STDIN:
+            os.close(fd)
+    put(None)
+
+
+async def iter_tasks(task_list: str, batch_size: int = BATCH_SIZE,
+                     parallel: int = PARALLEL_BATCHES) -> AsyncIterator[List[TaskEntry]]:
+    """
+    流式读取任务列表，按批产出校验后的任务。
+
+    读取线程持续读入行，已到达的行（至多 batch_size 行）组成一批，上游从管道逐行写入时任务也能立即开始；
+    各批在线程池中并行校验（检查路径并读取归档大小），按行序产出。
+    """
+    fmt = task_list_format(task_list)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=parallel)
+    stop = threading.Event()
+    # 守护线程：标准输入的上游一直不关闭时，阻塞的读取不影响进程退出
+    threading.Thread(target=_read_lines, args=(task_list, batch_size, loop, queue, stop), daemon=True).start()
+    validating = deque()
+    try:
+        while True:
+            lines = await queue.get()
+            if lines is None:
+                break
+            if isinstance(lines, Exception):
+                raise lines
+            validating.append(asyncio.ensure_future(asyncio.to_thread(validate_batch, lines, fmt)))
+            # 暂时没有新的行时不再积压已提交的批次
+            while validating and (validating[0].done() or len(validating) >= parallel or queue.empty()):
+                yield await validating.popleft()
+        while validating:
+            yield await validating.popleft()
+    finally:
+        stop.set()
+        for future in validating:
+            future.cancel()
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 
+@Date       : 2026/10/18 23:10
+@Author     : lkkings
+@FileName:  : __init__.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+from datahive.script.archiving._factory import factory
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 
+@Date       : 2026/10/18 23:10
+@Author     : lkkings
+@FileName:  : _factory.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import importlib
+import inspect
+from pathlib import Path
+from typing import List, Type
+
+from datahive.script.archiving.base_writer import ArchiveWriter
+
+
+def import_writer() -> List[Type[ArchiveWriter]]:
+    folder_path = Path(__file__).parent.resolve()
+    writers = []
+    for file_path in folder_path.glob("*.py"):
+        if file_path.name == "__init__.py":
+            continue
+        module_name = file_path.stem
+        module = importlib.import_module(f"datahive.script.archiving.{module_name}")
+
+        # 筛选出 ArchiveWriter 的子类，写出器带有输出文件状态，按需实例化
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, ArchiveWriter) and cls != ArchiveWriter and cls not in writers:
+                writers.append(cls)
+    return writers
+
+
+# ------------------------------
+# 写出器工厂类：按目标文件扩展名选择归档写出器
+# ------------------------------
+class ArchiveWriterFactory:
+    """归档写出器工厂"""
+
+    def __init__(self):
+        self._writers: List[Type[ArchiveWriter]] = []
+
+    @property
+    def writers(self):
+        if len(self._writers) == 0:
+            self._writers = import_writer()
+        return self._writers
+
+    def get_writer(self, file_name: str) -> Type[ArchiveWriter]:
+        """根据文件名获取写出器类，较长的扩展名优先，如 .tar.gz 先于 .tar"""
+        matched = [(len(support_type), writer) for writer in self.writers for support_type in writer.support_types
+                   if file_name.endswith(support_type)]
+        if not matched:
+            raise ValueError(f"不支持的目标文件类型: {file_name}")
+        return max(matched, key=lambda item: item[0])[1]
+
+
+factory = ArchiveWriterFactory()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 分块并行压缩
+@Date       : 2026/10/18 23:10
+@Author     : lkkings
+@FileName:  : _parallel.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import bz2
+import lzma
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Optional, Union
+
+# deflate 回溯窗口大小，每块以前一块末尾这部分数据作为预置字典
+WINDOW_SIZE = 32 * 1024
+
+# 写出队列中的一段数据：现成的字节、压缩中的 Future，或写出时才生成字节的函数
+Part = Union[bytes, Future, Callable[[], bytes]]
+
+
+class ParallelWriter:
+    """
+    按提交顺序写出数据的压缩线程池。
+
+    zlib、lzma、bz2 压缩时都会释放 GIL，各数据块在线程池中并行压缩，
+    写出线程按顺序取出结果；在途的压缩任务超过上限时先写出最早的部分，内存占用与块大小 × 线程数成正比。
+    """
+
+    def __init__(self, fileobj: BinaryIO, workers: int = 1):
+        self._fp = fileobj
+        self._pool = ThreadPoolExecutor(max_workers=max(workers, 1))
+        self._limit = max(workers, 1) * 2
+        self._parts = deque()
+        self._in_flight = 0
+        # 已写出的字节数
+        self.position = 0
+
+    def put(self, part: Part, stat: Optional["BlockStat"] = None):
+        """
+        追加一段数据
+
+        :param stat: 写出后累加该段压缩数据大小的统计对象
+        """
+        self._parts.append((part, stat))
+        if len(self._parts) == 1 and not isinstance(part, Future):
+            # 前面没有等待中的数据，直接写出
+            self._write_next()
+
+    def submit(self, fn: Callable[..., bytes], *args, stat: Optional["BlockStat"] = None):
+        """提交一个压缩任务，结果按提交顺序写出"""
+        self._parts.append((self._pool.submit(fn, *args), stat))
+        self._in_flight += 1
+        while self._in_flight > self._limit:
+            self._write_next()
+
+    def _write_next(self):
+        part, stat = self._parts.popleft()
+        if isinstance(part, Future):
+            data = part.result()
+            self._in_flight -= 1
+        elif callable(part):
+            data = part()
+        else:
+            data = part
+        self._fp.write(data)
+        self.position += len(data)
+        if stat is not None:
+            stat.compress_size += len(data)
+
+    def flush(self):
+        while self._parts:
+            self._write_next()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def abort(self):
+        """放弃尚未写出的数据"""
+        self._parts.clear()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class BlockStat:
+    """一个压缩数据流的统计：原始数据的 CRC32 与大小在提交时累计，压缩后大小在写出时累计"""
+
+    def __init__(self):
+        self.crc = 0
+        self.size = 0
+        self.compress_size = 0
+
+
+class Codec:
+    """
+    分块压缩格式。各块相互独立地压缩，拼接后仍是合法的压缩数据流。
+
+    :param level: 压缩级别，None 为格式默认值
+    """
+    # 每块的原始数据大小
+    block_size = 1024 * 1024
+    # 压缩块时是否需要前一块末尾的数据作为字典
+    needs_dictionary = False
+    default_level = None
+
+    def __init__(self, level: Optional[int] = None):
+        self.level = self.default_level if level is None else level
+
+    def header(self) -> bytes:
+        return b""
+
+    def trailer(self, stat: BlockStat) -> bytes:
+        return b""
+
+    def compress(self, block: bytes, dictionary: bytes, last: bool) -> bytes:
+        raise NotImplementedError
+
+
+class DeflateCodec(Codec):
+    """
+    pigz 方式的并行 raw deflate：每块以前一块末尾 32KB 为预置字典单独压缩，
+    中间块以同步刷新结束（字节对齐的空存储块），最后一块以结束块收尾，拼接后即为一个完整的 deflate 流。
+    同步刷新点也正是解压端记录 gzip 检查点的位置。
+    """
+    needs_dictionary = True
+    default_level = 6
+
+    def compress(self, block: bytes, dictionary: bytes, last: bool) -> bytes:
+        if dictionary:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class GzipCodec(DeflateCodec):
+    """单成员 gzip：并行 deflate 数据加上 gzip 头与 CRC32/长度尾"""
+
+    def header(self) -> bytes:
+        xfl = 2 if self.level == 9 else 4 if self.level == 1 else 0
+        return b"\x1f\x8b\x08\x00" + struct.pack("<L", int(time.time())) + bytes((xfl, 255))
+
+    def trailer(self, stat: BlockStat) -> bytes:
+        return struct.pack("<LL", stat.crc, stat.size & 0xffffffff)
+
+
+class XzCodec(Codec):
+    """每块压缩为一个独立的 xz 流，多个流拼接仍是合法的 xz 文件，且解压端可按流随机访问"""
+    block_size = 16 * 1024 * 1024
+    default_level = 6
+
+    def compress(self, block: bytes, dictionary: bytes, last: bool) -> bytes:
+        return lzma.compress(block, lzma.FORMAT_XZ, preset=self.level)
+
+
+class Bzip2Codec(Codec):
+    """每块压缩为一个独立的 bz2 流，bzip2 与 Python 的 bz2 模块都支持多流拼接"""
+    block_size = 9 * 900 * 1000
+    default_level = 9
+
+    def compress(self, block: bytes, dictionary: bytes, last: bool) -> bytes:
+        # bz2 没有 0 级
+        return bz2.compress(block, max(self.level, 1))
+
+
+class ZstdCodec(Codec):
+    """每块压缩为一个记录了内容大小的独立 zstd 帧，解压端可按帧并行解压"""
+    block_size = 8 * 1024 * 1024
+    default_level = 3
+
+    def __init__(self, level: Optional[int] = None):
+        super().__init__(level)
+        from datahive.script.extraction._zstd import load_zstandard
+        self._zstd = load_zstandard()
+
+    def compress(self, block: bytes, dictionary: bytes, last: bool) -> bytes:
+        return self._zstd.ZstdCompressor(level=self.level).compress(block)
+
+
+class BlockStream:
+    """
+    可写的压缩数据流：写入的数据按块切分后交给线程池压缩。
+    提供 write/tell，可直接作为 tarfile 的输出文件对象。
+    """
+
+    def __init__(self, writer: ParallelWriter, codec: Codec, stat: Optional[BlockStat] = None):
+        self._writer = writer
+        self._codec = codec
+        self.stat = stat or BlockStat()
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._blocks = 0
+        self.closed = False
+        header = codec.header()
+        if header:
+            writer.put(header, self.stat)
+
+    def write(self, data) -> int:
+        n = len(data)
+        self.stat.crc = zlib.crc32(data, self.stat.crc)
+        self.stat.size += n
+        self._buffer += data
+        block_size = self._codec.block_size
+        if len(self._buffer) >= block_size:
+            view = memoryview(self._buffer)
+            start = 0
+            while len(self._buffer) - start >= block_size:
+                self._submit(bytes(view[start:start + block_size]), False)
+                start += block_size
+            view.release()
+            del self._buffer[:start]
+        return n
+
+    def tell(self) -> int:
+        return self.stat.size
+
+    def _submit(self, block: bytes, last: bool):
+        dictionary = self._dictionary
+        if self._codec.needs_dictionary:
+            self._dictionary = block[-WINDOW_SIZE:]
+        self._writer.submit(self._codec.compress, block, dictionary, last, stat=self.stat)
+        self._blocks += 1
+
+    def close(self):
+        """提交剩余数据作为最后一块；deflate 即使没有剩余数据也需要一个结束块"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._buffer or self._blocks == 0 or self._codec.needs_dictionary:
+            self._submit(bytes(self._buffer), True)
+            self._buffer.clear()
+        trailer = self._codec.trailer(self.stat)
+        if trailer:
+            self._writer.put(trailer, self.stat)
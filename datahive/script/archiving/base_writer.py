@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 归档写出器基类
+@Date       : 2026/10/18 23:10
+@Author     : lkkings
+@FileName:  : base_writer.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional
+
+from datahive.script.archiving._parallel import ParallelWriter
+from datahive.script.extraction.base_extraction import ArchiveMember, discard, to_part_path
+
+
+class ArchiveWriter(ABC):
+    """
+    归档写出器：按顺序接收成员，数据直接写入目标归档，不经过解压后的目录。
+    写出到临时文件，关闭时原子重命名为目标文件；出错时删除临时文件。
+
+    :param output_file: 目标归档路径
+    :param workers: 并行压缩的线程数
+    :param level: 压缩级别，None 为格式默认值
+    """
+    support_types = []
+    # 从成员读取数据的块大小
+    chunk_size = 1024 * 1024
+
+    def __init__(self, output_file, workers: int = 1, level: Optional[int] = None):
+        self.output_file = os.fspath(output_file)
+        self.part_path = to_part_path(self.output_file)
+        self.level = level
+        self._fp = open(self.part_path, "wb")
+        self._writer = ParallelWriter(self._fp, workers)
+
+    @abstractmethod
+    def add(self, member: ArchiveMember):
+        """写入一个成员（在工作线程中调用）"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish(self):
+        """提交剩余数据并写出归档尾部结构"""
+        raise NotImplementedError
+
+    def copy(self, member: ArchiveMember, dst: BinaryIO):
+        """把成员数据分块复制到 dst"""
+        with member.open() as src:
+            while True:
+                data = src.read(self.chunk_size)
+                if not data:
+                    break
+                dst.write(data)
+
+    def close(self, commit: bool = True):
+        try:
+            if commit:
+                self.finish()
+                self._writer.close()
+        except BaseException:
+            commit = False
+            raise
+        finally:
+            if not commit:
+                self._writer.abort()
+            self._fp.close()
+            if commit:
+                os.replace(self.part_path, self.output_file)
+            else:
+                discard(self.part_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(commit=exc_type is None)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: tar 归档写出器
+@Date       : 2026/10/18 23:10
+@Author     : lkkings
+@FileName:  : tar_writer.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import stat
+import tarfile
+from typing import Optional, Type
+
+from datahive.script.archiving._parallel import BlockStream, Bzip2Codec, Codec, GzipCodec, XzCodec, ZstdCodec
+from datahive.script.archiving.base_writer import ArchiveWriter
+from datahive.script.extraction.base_extraction import ArchiveMember
+
+
+class TarWriter(ArchiveWriter):
+    """
+    tar 流直接写入分块并行压缩的数据流：gzip 为 pigz 方式的单个 deflate 流，
+    xz、bz2 为多个独立压缩流的拼接，zstd 为多个独立帧。未压缩的 tar 直接写出。
+    """
+    support_types = [".tar"]
+    codec: Optional[Type[Codec]] = None
+
+    def __init__(self, output_file, workers: int = 1, level: Optional[int] = None):
+        super().__init__(output_file, workers, level)
+        if self.codec is None:
+            self._stream = None
+            fileobj = self._fp
+        else:
+            self._stream = BlockStream(self._writer, self.codec(level))
+            fileobj = self._stream
+        self._tar = tarfile.open(fileobj=fileobj, mode="w", format=tarfile.PAX_FORMAT, copybufsize=self.chunk_size)
+
+    @staticmethod
+    def to_tarinfo(member: ArchiveMember) -> tarfile.TarInfo:
+        file_info = tarfile.TarInfo(member.name.rstrip("/") if member.is_dir else member.name)
+        file_info.mtime = int(member.mtime)
+        if member.is_dir:
+            file_info.type = tarfile.DIRTYPE
+            file_info.mode = stat.S_IMODE(member.mode) if member.mode else 0o755
+        else:
+            file_info.size = member.size
+            file_info.mode = stat.S_IMODE(member.mode) if member.mode else 0o644
+        return file_info
+
+    def add(self, member: ArchiveMember):
+        file_info = self.to_tarinfo(member)
+        if member.is_dir:
+            self._tar.addfile(file_info)
+            return
+        with member.open() as src:
+            self._tar.addfile(file_info, src)
+
+    def finish(self):
+        self._tar.close()
+        if self._stream is not None:
+            self._stream.close()
+
+
+class TarGzWriter(TarWriter):
+    support_types = [".tar.gz", ".tgz"]
+    codec = GzipCodec
+
+
+class TarXzWriter(TarWriter):
+    support_types = [".tar.xz", ".txz"]
+    codec = XzCodec
+
+
+class TarBz2Writer(TarWriter):
+    support_types = [".tar.bz2", ".tbz2"]
+    codec = Bzip2Codec
+
+
+class TarZstWriter(TarWriter):
+    support_types = [".tar.zst", ".tzst"]
+    codec = ZstdCodec
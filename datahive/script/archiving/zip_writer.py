@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: zip 归档写出器
+@Date       : 2026/10/18 23:10
+@Author     : lkkings
+@FileName:  : zip_writer.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import stat
+import struct
+import time
+import zipfile
+from typing import List, Optional
+
+from datahive.script.archiving._parallel import BlockStat, BlockStream, DeflateCodec
+from datahive.script.archiving.base_writer import ArchiveWriter
+from datahive.script.extraction.base_extraction import ArchiveMember
+
+# 与 zipfile 相同的头部结构
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_END_RECORD64 = struct.Struct("<4sQ2H2L4Q")
+_END_LOCATOR64 = struct.Struct("<4sLQL")
+_DESCRIPTOR = struct.Struct("<4sLLL")
+_DESCRIPTOR64 = struct.Struct("<4sLQQ")
+
+_FLAG_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_VERSION = 20
+_VERSION64 = 45
+_SYSTEM_UNIX = 3
+_MAX32 = 0xffffffff
+_MAX16 = 0xffff
+
+
+def dos_datetime(mtime: float):
+    """zip 只能记录 1980 年以后的本地时间，精度 2 秒"""
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class _Entry(BlockStat):
+    """已写出成员的中央目录信息，压缩统计随数据写出累计"""
+
+    def __init__(self, name: bytes, flags: int, method: int, mtime: float, external_attr: int, zip64: bool):
+        super().__init__()
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.dos_time, self.dos_date = dos_datetime(mtime)
+        self.external_attr = external_attr
+        self.zip64 = zip64
+        self.offset = 0
+
+
+class ZipWriter(ArchiveWriter):
+    """
+    流式 zip 写出：成员数据以 pigz 方式分块并行 deflate，CRC 与大小写在数据之后的数据描述符中，
+    无需回写本地头；大文件与超过 4G 的偏移使用 zip64 扩展。
+    """
+    support_types = [".zip"]
+
+    def __init__(self, output_file, workers: int = 1, level: Optional[int] = None):
+        super().__init__(output_file, workers, level)
+        self._codec = DeflateCodec(level)
+        self._entries: List[_Entry] = []
+
+    def _local_header(self, entry: _Entry) -> bytes:
+        # 写出时才生成，此时写出位置即为本地头偏移
+        entry.offset = self._writer.position
+        extra = b""
+        size = 0
+        if entry.zip64:
+            # 真实大小在数据描述符中，这里只占位
+            extra = struct.pack("<HHQQ", 1, 16, 0, 0)
+            size = _MAX32
+        return _LOCAL_HEADER.pack(b"PK\003\004", _VERSION64 if entry.zip64 else _VERSION, 0, entry.flags,
+                                  entry.method, entry.dos_time, entry.dos_date, 0, size, size,
+                                  len(entry.name), len(extra)) + entry.name + extra
+
+    @staticmethod
+    def _descriptor(entry: _Entry) -> bytes:
+        if entry.zip64:
+            return _DESCRIPTOR64.pack(b"PK\007\010", entry.crc, entry.compress_size, entry.size)
+        return _DESCRIPTOR.pack(b"PK\007\010", entry.crc, entry.compress_size, entry.size)
+
+    def add(self, member: ArchiveMember):
+        name = member.name.rstrip("/") + "/" if member.is_dir else member.name
+        try:
+            encoded, flags = name.encode("ascii"), 0
+        except UnicodeEncodeError:
+            encoded, flags = name.encode("utf-8"), _FLAG_UTF8
+        if member.is_dir:
+            mode = stat.S_IFDIR | (stat.S_IMODE(member.mode) if member.mode else 0o755)
+            entry = _Entry(encoded, flags, zipfile.ZIP_STORED, member.mtime, (mode << 16) | 0x10, False)
+            self._entries.append(entry)
+            self._writer.put(lambda: self._local_header(entry))
+            return
+
+        mode = stat.S_IFREG | (stat.S_IMODE(member.mode) if member.mode else 0o644)
+        # 与 zipfile 相同的判断，为不可压缩数据的膨胀留出余量
+        zip64 = member.size * 1.05 > zipfile.ZIP64_LIMIT
+        entry = _Entry(encoded, flags | _FLAG_DESCRIPTOR, zipfile.ZIP_DEFLATED, member.mtime, mode << 16, zip64)
+        self._entries.append(entry)
+        self._writer.put(lambda: self._local_header(entry))
+        stream = BlockStream(self._writer, self._codec, stat=entry)
+        self.copy(member, stream)
+        stream.close()
+        self._writer.put(lambda: self._descriptor(entry))
+
+    def _central_header(self, entry: _Entry) -> bytes:
+        values = []
+        size, compress_size, offset = entry.size, entry.compress_size, entry.offset
+        if size > zipfile.ZIP64_LIMIT:
+            values.append(size)
+            size = _MAX32
+        if compress_size > zipfile.ZIP64_LIMIT:
+            values.append(compress_size)
+            compress_size = _MAX32
+        if offset > zipfile.ZIP64_LIMIT:
+            values.append(offset)
+            offset = _MAX32
+        extra = b""
+        if values:
+            extra = struct.pack(f"<HH{len(values)}Q", 1, 8 * len(values), *values)
+        version = _VERSION64 if values or entry.zip64 else _VERSION
+        return _CENTRAL_HEADER.pack(b"PK\001\002", version, _SYSTEM_UNIX, version, 0, entry.flags, entry.method,
+                                    entry.dos_time, entry.dos_date, entry.crc, compress_size, size,
+                                    len(entry.name), len(extra), 0, 0, 0, entry.external_attr,
+                                    offset) + entry.name + extra
+
+    def finish(self):
+        # 先写出全部成员数据，确定各本地头的偏移
+        self._writer.flush()
+        start = self._writer.position
+        for entry in self._entries:
+            self._writer.put(self._central_header(entry))
+        end = self._writer.position
+        count, size, offset = len(self._entries), end - start, start
+        if count >= _MAX16 or size > zipfile.ZIP64_LIMIT or offset > zipfile.ZIP64_LIMIT:
+            self._writer.put(_END_RECORD64.pack(b"PK\006\006", _END_RECORD64.size - 12, _VERSION64, _VERSION64,
+                                                0, 0, count, count, size, offset))
+            self._writer.put(_END_LOCATOR64.pack(b"PK\006\007", 0, end, 1))
+            count, size, offset = min(count, _MAX16), min(size, _MAX32), min(offset, _MAX32)
+        self._writer.put(_END_RECORD.pack(b"PK\005\006", 0, 0, count, count, size, offset, 0))
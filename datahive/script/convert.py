@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 归档格式转换：成员数据从源归档直接流入目标归档，不写出解压后的目录
+@Date       : 2026/10/18 23:10
+@Author     : lkkings
+@FileName:  : convert.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import os
+from typing import List, Optional
+
+from aiopath import AsyncPath
+
+from datahive.cli import cli_console
+from datahive.script import archiving
+from datahive.script.extraction import factory
+from datahive.script.extraction._index import IndexEntry
+from datahive.script.extraction.base_extraction import ExtractionStrategy, summarize_failures
+
+
+def _convert(extraction: ExtractionStrategy, input_file: AsyncPath, output_file: AsyncPath, task_name: str,
+             total: Optional[int], max_workers: int, level: Optional[int], entries: Optional[List[IndexEntry]]):
+    """在工作线程中按源归档顺序读取成员并写入目标归档，entries 不为 None 时顺带收集成员索引"""
+    writer_cls = archiving.factory.get_writer(output_file.name)
+    count = 0
+    with writer_cls(output_file, max_workers, level) as writer:
+        for member in extraction.iter_members(input_file, entries):
+            writer.add(member)
+            count += 1
+            cli_console.progress.update(task_name)
+    # 跳过的链接等成员不计入，补齐进度
+    if total is not None and total > count:
+        cli_console.progress.update(task_name, total - count)
+
+
+async def run(input_file: str, output_file: str, max_workers: int = 1, level: Optional[int] = None,
+              include: Optional[List[str]] = None):
+    try:
+        input_file = AsyncPath(os.path.abspath(input_file))
+        output_file = AsyncPath(os.path.abspath(output_file))
+        if input_file == output_file:
+            raise ValueError(f'输出文件不能与输入文件相同 -> {output_file}')
+        extraction = factory.get_strategy(str(input_file))
+        archiving.factory.get_writer(output_file.name)
+        extraction.include = include
+        # 策略实例由工厂缓存，清空上次转换记录的失败成员
+        extraction.failures = []
+        # 与解压相同，没有索引时不为统计成员数单独解压一遍归档：进度总数未知，转换时顺带收集索引
+        index = await extraction.load_index(input_file)
+    except Exception as e:
+        cli_console.console.print_error(str(e))
+        return
+    task_name = f"转换{input_file.name}"
+    cli_console.progress.start()
+    try:
+        if index is None:
+            entries, total = [], None
+        else:
+            entries, total = None, sum(1 for entry in index.entries if extraction.selected(entry.name))
+        cli_console.progress.add_task(task_name, total)
+        await asyncio.to_thread(_convert, extraction, input_file, output_file, task_name, total, max_workers, level,
+                                entries)
+        if entries is not None:
+            await extraction.save_index(input_file, entries)
+        # 无法转换的成员（如 tar 中的链接）不写入目标归档，汇总报告
+        error = summarize_failures(extraction.failures)
+        if error:
+            cli_console.console.print_error(error)
+    except Exception as e:
+        cli_console.progress.failed(task_name)
+        cli_console.console.print_error(str(e))
+    finally:
+        cli_console.progress.stop()
+
+
+if __name__ == '__main__':
+    pass
@@ -16,7 +16,7 @@ from typing import Optional
 
 from rich.text import Text
 
-from datahive.cli.cli_console import console
+from datahive.cli import cli_console
 from datahive.cli.cli_view import Viewer
 
 
@@ -89,4 +89,4 @@ def run(file1: Optional[str], file2: Optional[str], text1: Optional[str], text2:
         with Viewer(title="差异对比") as viewer:
             viewer.add_lines(lines)
     except Exception as e:
-        console.print_error(str(e))
+        cli_console.console.print_error(str(e))
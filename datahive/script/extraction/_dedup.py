@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 解压去重的内容索引
+@Date       : 2026/10/18 19:20
+@Author     : lkkings
+@FileName:  : _dedup.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import multiprocessing as mp
+import os
+from typing import Optional, Tuple
+
+from datahive.utils.io_util import clone_file
+
+# 去重方式
+HARDLINK = "hardlink"
+REFLINK = "reflink"
+DEDUP_MODES = (HARDLINK, REFLINK)
+
+
+class DedupIndex:
+    """
+    解压去重的内容索引，记录已写出成员的内容与路径：
+
+    - (大小, CRC32) -> (SHA-256, 路径)：带 CRC 的成员（zip/rar）写出前据此查找候选，
+      再只读计算一遍 SHA-256 确认，相同则直接链接，省去写盘；
+    - (大小, SHA-256) -> 路径：无 CRC 的成员（tar）写出时计算 SHA-256，
+      写完后发现重复则替换为链接，节省空间。
+
+    索引保存在 multiprocessing.Manager 中，通过 state/attach 传给进程池，
+    同一次运行（包括 --task_list 批量任务）的所有归档共用一份索引。
+    """
+
+    def __init__(self):
+        self.mode: Optional[str] = None
+        self._manager = None
+        self._by_crc = None
+        self._by_hash = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None
+
+    @property
+    def state(self) -> Tuple[Optional[str], object, object]:
+        """供进程池 initializer 传递的共享状态"""
+        return self.mode, self._by_crc, self._by_hash
+
+    def configure(self, mode: Optional[str]):
+        """
+        设置去重方式，None 表示关闭
+
+        :param mode: hardlink（硬链接，文件共享同一 inode）或 reflink（写时复制克隆，不支持时退化为复制）
+        """
+        if mode is not None and mode not in DEDUP_MODES:
+            raise ValueError(f"不支持的去重方式 -> {mode}")
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        self.mode = mode
+        self._by_crc = self._by_hash = None
+        if mode is not None:
+            self._manager = mp.Manager()
+            self._by_crc = self._manager.dict()
+            self._by_hash = self._manager.dict()
+
+    def attach(self, state: Tuple[Optional[str], object, object]):
+        """子进程接入主进程的索引"""
+        self.mode, self._by_crc, self._by_hash = state
+
+    def candidate(self, size: int, crc: int) -> Optional[Tuple[str, str]]:
+        """按 (大小, CRC) 查找候选，返回 (SHA-256, 路径)"""
+        return self._by_crc.get((size, crc))
+
+    def lookup(self, size: int, digest: str) -> Optional[str]:
+        return self._by_hash.get((size, digest))
+
+    def register(self, size: int, crc: Optional[int], digest: str, path: str):
+        if crc is not None:
+            self._by_crc.setdefault((size, crc), (digest, path))
+        self._by_hash.setdefault((size, digest), path)
+
+    def link(self, source: str, path: str, size: int) -> bool:
+        """
+        把 path 创建为 source 的链接，source 已被删除或改动大小等情况返回 False
+
+        :param source: 已写出的相同内容的文件
+        :param path: 新文件路径（须不存在）
+        :param size: 内容大小
+        """
+        try:
+            if os.path.getsize(source) != size:
+                return False
+            if self.mode == HARDLINK:
+                os.link(source, path)
+            else:
+                clone_file(source, path)
+            return True
+        except (OSError, EOFError):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return False
+
+
+dedup = DedupIndex()
@@ -11,54 +11,181 @@ Change Log  :
 
 """
 import importlib
-import inspect
 import os
-from pathlib import Path
-from typing import Dict, Type, List
+from importlib import metadata
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
 
+from loguru import logger
+
+from datahive.script.extraction._formats import RAR, TAR, TAR_BZ2, TAR_GZ, TAR_XZ, TAR_ZST, ZIP, ArchiveFormat, \
+    Magic
 from datahive.script.extraction.base_extraction import ExtractionStrategy
 
+# 第三方策略注册的入口点分组，入口点指向 ExtractionStrategy 子类
+ENTRY_POINT_GROUP = "datahive.extraction"
+# 嗅探格式时读取的文件头长度，需覆盖 tar 在 257 偏移处的 ustar 标记
+SNIFF_SIZE = 512
+
+# 内置策略: ("模块:类名", 格式)，格式与策略类的 support_types / magic 同源（见 _formats）。
+# 这里只登记元数据，策略模块（及 rarfile 等依赖）在首次匹配到时才导入
+_BUILTIN: List[Tuple[str, ArchiveFormat]] = [
+    ("datahive.script.extraction.zip_extraction:ZipExtractionStrategy", ZIP),
+    ("datahive.script.extraction.rar_extraction:RarExtractionStrategy", RAR),
+    ("datahive.script.extraction.tar_extraction:TarGzExtractionStrategy", TAR_GZ),
+    ("datahive.script.extraction.tar_extraction:TarZstExtractionStrategy", TAR_ZST),
+    ("datahive.script.extraction.tar_extraction:TarExtractionStrategy", TAR_BZ2),
+    ("datahive.script.extraction.tar_extraction:TarExtractionStrategy", TAR_XZ),
+    ("datahive.script.extraction.tar_extraction:TarExtractionStrategy", TAR),
+]
+
+
+def read_head(file_name) -> Optional[bytes]:
+    """读取文件头用于嗅探，不是已存在的文件时返回 None"""
+    try:
+        with open(file_name, "rb") as f:
+            return f.read(SNIFF_SIZE)
+    except OSError:
+        return None
 
-def import_strategy() -> List[ExtractionStrategy]:
-    folder_path = Path(__file__).parent.resolve()
-    instances = []
-    for file_path in folder_path.glob("*.py"):
-        if file_path.name == "__init__.py":
-            continue
-        module_name = file_path.stem
-        module = importlib.import_module(f"datahive.script.extraction.{module_name}")
 
-        # 获取模块中的所有类
-        classes = [cls for name, cls in inspect.getmembers(module, inspect.isclass)]
-        # 筛选出 base_class 的子类
-        for cls in classes:
-            if issubclass(cls, ExtractionStrategy) and cls != ExtractionStrategy:
-                instances.append(cls())
-    return instances
+def _entry_points():
+    eps = metadata.entry_points()
+    # Python 3.10 之前 entry_points() 返回按分组的字典
+    if hasattr(eps, "select"):
+        return eps.select(group=ENTRY_POINT_GROUP)
+    return eps.get(ENTRY_POINT_GROUP, [])
 
 
 # ------------------------------
 # 策略工厂类：管理解压策略的注册与获取
 # ------------------------------
 class ExtractionStrategyFactory:
-    """解压策略工厂，支持动态注册新格式"""
+    """
+    解压策略注册表。
+
+    先按文件头特征识别格式，扩展名作为提示（名称不对的文件也能识别）；文件头无法识别时按扩展名匹配。
+    特征按 (偏移, 长度) 分组建表、扩展名只查最后两级，查找次数与已注册的策略数量无关。
+    内置策略以 "模块:类名" 登记，首次匹配到时才导入并实例化；入口点中的第三方策略在内置策略都不匹配时才加载。
+    """
 
     def __init__(self):
-        self._strategies: List[ExtractionStrategy] = []
-
-    @property
-    def strategies(self):
-        if len(self._strategies) == 0:
-            self._strategies = import_strategy()
-        return self._strategies
-
-    def get_strategy(self, file_extension: str) -> ExtractionStrategy:
-        """根据文件扩展名获取解压策略"""
-        for strategy in self.strategies:
-            for support_type in strategy.support_types:
-                if file_extension.endswith(support_type):
-                    return strategy
-        raise ValueError(f"不支持的文件类型: {file_extension}")
+        self._classes: Dict[str, Type[ExtractionStrategy]] = {}
+        self._instances: Dict[str, ExtractionStrategy] = {}
+        self._suffixes: Dict[str, str] = {}
+        # (偏移, 长度) -> {特征字节: 策略}
+        self._magic: Dict[Tuple[int, int], Dict[bytes, str]] = {}
+        self._magic_order: List[Tuple[int, int]] = []
+        # (偏移, 特征字节) -> 特征匹配但扩展名不符时的确认函数
+        self._confirm: Dict[Magic, Callable[[bytes], bool]] = {}
+        self._entry_points_loaded = False
+        for target, fmt in _BUILTIN:
+            self.register(target, fmt.support_types, fmt.magic, fmt.confirm)
+
+    def register(self, target: Union[str, Type[ExtractionStrategy]], support_types: Optional[Sequence[str]] = None,
+                 magic: Optional[Sequence[Magic]] = None, confirm: Optional[Callable[[bytes], bool]] = None):
+        """
+        注册解压策略，后注册的覆盖先注册的同名扩展名与特征
+
+        :param target: 策略类，或延迟导入的 "模块:类名"
+        :param support_types: 扩展名，传入类时默认取类的 support_types
+        :param magic: 文件头特征，传入类时默认取类的 magic
+        :param confirm: 文件头特征匹配而扩展名不符时，用文件头再次确认格式的函数
+        """
+        if isinstance(target, str):
+            key = target
+        else:
+            key = f"{target.__module__}:{target.__qualname__}"
+            self._classes[key] = target
+            support_types = target.support_types if support_types is None else support_types
+            magic = target.magic if magic is None else magic
+        for support_type in support_types or []:
+            self._suffixes[support_type.lower()] = key
+        for offset, prefix in magic or []:
+            group = (offset, len(prefix))
+            if group not in self._magic:
+                self._magic[group] = {}
+                # 偏移小、特征长的优先
+                self._magic_order = sorted(self._magic, key=lambda g: (g[0], -g[1]))
+            self._magic[group][prefix] = key
+            if confirm is not None:
+                self._confirm[(offset, prefix)] = confirm
+            else:
+                self._confirm.pop((offset, prefix), None)
+
+    def _load_entry_points(self) -> bool:
+        """加载入口点中的第三方策略，返回是否有新注册的策略"""
+        if self._entry_points_loaded:
+            return False
+        self._entry_points_loaded = True
+        loaded = False
+        for entry_point in _entry_points():
+            try:
+                cls = entry_point.load()
+            except Exception as e:
+                logger.warning(f"加载解压策略失败: {entry_point.name} -> {e}")
+                continue
+            self.register(cls)
+            loaded = True
+        return loaded
+
+    def _instance(self, key: str) -> ExtractionStrategy:
+        strategy = self._instances.get(key)
+        if strategy is None:
+            cls = self._classes.get(key)
+            if cls is None:
+                module_name, class_name = key.split(":")
+                cls = getattr(importlib.import_module(module_name), class_name)
+                self._classes[key] = cls
+            strategy = self._instances[key] = cls()
+        return strategy
+
+    def _sniff(self, head: bytes, hint: Optional[str] = None) -> Optional[str]:
+        """按文件头识别格式，特征过于宽泛的格式与扩展名匹配到的策略 hint 不符时，需通过其确认函数"""
+        for offset, length in self._magic_order:
+            prefix = head[offset:offset + length]
+            key = self._magic[(offset, length)].get(prefix)
+            if key is None:
+                continue
+            confirm = self._confirm.get((offset, prefix))
+            if key == hint or confirm is None or confirm(head):
+                return key
+        return None
+
+    def _by_suffix(self, file_name: str) -> Optional[Tuple[str, str]]:
+        parts = os.path.basename(file_name).lower().split(".")
+        # 只需检查最后两级扩展名，如 .tar.gz 与 .gz
+        for n in (2, 1):
+            if len(parts) > n:
+                suffix = "." + ".".join(parts[-n:])
+                key = self._suffixes.get(suffix)
+                if key is not None:
+                    return key, suffix
+        return None
+
+    def match(self, file_name: str, head: Optional[bytes] = None) -> Optional[Tuple[ExtractionStrategy, str]]:
+        """
+        匹配解压策略
+
+        :param head: 文件头，None 时只按扩展名匹配（如归档内的成员名）
+        :return: (策略, 匹配到的扩展名)，按文件头识别且扩展名不符时扩展名为空串；不支持时返回 None
+        """
+        while True:
+            by_suffix = self._by_suffix(file_name)
+            key = self._sniff(head, by_suffix[0] if by_suffix else None) if head else None
+            if key is not None:
+                suffix = by_suffix[1] if by_suffix is not None and by_suffix[0] == key else ""
+                return self._instance(key), suffix
+            if by_suffix is not None:
+                return self._instance(by_suffix[0]), by_suffix[1]
+            if not self._load_entry_points():
+                return None
+
+    def get_strategy(self, file_name: str) -> ExtractionStrategy:
+        """根据文件获取解压策略，文件存在时先读取文件头识别格式"""
+        found = self.match(file_name, read_head(file_name))
+        if found is None:
+            raise ValueError(f"不支持的文件类型: {file_name}")
+        return found[0]
 
 
 factory = ExtractionStrategyFactory()
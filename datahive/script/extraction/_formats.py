@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 内置解压策略识别的归档格式：扩展名与文件头特征
+@Date       : 2026/10/21 10:00
+@Author     : lkkings
+@FileName:  : _formats.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import bz2
+import lzma
+import zlib
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+# 文件头特征: (偏移, 字节)
+Magic = Tuple[int, bytes]
+
+
+def _starts_with_tar(decompressor, head: bytes) -> bool:
+    """解压文件头中的数据，开头是带 ustar 标记的 tar 头时返回 True"""
+    try:
+        data = decompressor.decompress(head, 512)
+    except (zlib.error, lzma.LZMAError, OSError, EOFError):
+        return False
+    return data[257:262] == b"ustar"
+
+
+def is_tar_gz(head: bytes) -> bool:
+    return _starts_with_tar(zlib.decompressobj(16 + zlib.MAX_WBITS), head)
+
+
+def is_tar_bz2(head: bytes) -> bool:
+    """bz2 的块要整体读入才能解出，文件头中通常解不出数据，此时只按扩展名识别"""
+    return _starts_with_tar(bz2.BZ2Decompressor(), head)
+
+
+def is_tar_xz(head: bytes) -> bool:
+    return _starts_with_tar(lzma.LZMADecompressor(lzma.FORMAT_XZ), head)
+
+
+class ArchiveFormat(NamedTuple):
+    """
+    策略类的 support_types 与 magic 取自这里，工厂据此登记内置策略而不必导入策略模块
+
+    :param confirm: 文件头特征过于宽泛时（如任意 gzip 文件），扩展名不符的文件需再经此确认
+    """
+    support_types: List[str]
+    magic: List[Magic]
+    confirm: Optional[Callable[[bytes], bool]] = None
+
+
+ZIP = ArchiveFormat([".zip"], [(0, b"PK\x03\x04"), (0, b"PK\x05\x06")])
+RAR = ArchiveFormat([".rar"], [(0, b"Rar!\x1a\x07\x00"), (0, b"Rar!\x1a\x07\x01\x00")])
+TAR_GZ = ArchiveFormat([".tar.gz", ".tgz"], [(0, b"\x1f\x8b")], is_tar_gz)
+# zstd 数据帧与可跳过帧（0x184D2A50 ~ 0x184D2A5F）
+TAR_ZST = ArchiveFormat([".tar.zst", ".tzst"],
+                        [(0, b"\x28\xb5\x2f\xfd")] + [(0, bytes((0x50 + i, 0x2a, 0x4d, 0x18))) for i in range(16)])
+# bz2、xz 与未压缩的 tar 由同一个策略解压
+TAR_BZ2 = ArchiveFormat([".tar.bz2", ".tbz2", ".tbz"], [(0, b"BZh")], is_tar_bz2)
+TAR_XZ = ArchiveFormat([".tar.xz", ".txz"], [(0, b"\xfd7zXZ\x00")], is_tar_xz)
+TAR = ArchiveFormat([".tar"], [(257, b"ustar")])
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 归档成员索引的持久化缓存
+@Date       : 2026/10/18 20:30
+@Author     : lkkings
+@FileName:  : _index.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import hashlib
+import json
+import os
+import sys
+import zlib
+from typing import Iterator, List, NamedTuple, Optional
+
+# 索引文件后缀，默认与归档同目录存放
+INDEX_SUFFIX = ".dhidx"
+# 索引格式版本，变更后旧索引自动失效
+INDEX_VERSION = 1
+_MAGIC = b"DHIDX%d\n" % INDEX_VERSION
+
+
+class IndexEntry(NamedTuple):
+    """
+    索引中的一个成员
+
+    :param name: 成员名
+    :param is_dir: 是否为目录
+    :param size: 原始大小
+    :param compress_size: 压缩后大小，未知为 None
+    :param crc: CRC32，格式不提供时为 None
+    :param offset: 成员头在归档中的偏移（tar 为解压后数据流中的偏移）
+    :param data_offset: 成员数据的偏移，未知为 None
+    :param meta: 各格式还原成员信息所需的其余字段
+    """
+    name: str
+    is_dir: bool
+    size: int
+    compress_size: Optional[int] = None
+    crc: Optional[int] = None
+    offset: Optional[int] = None
+    data_offset: Optional[int] = None
+    meta: Optional[list] = None
+
+
+def cache_dir() -> str:
+    """归档所在目录不可写时，索引存放到用户缓存目录"""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "datahive", "index")
+
+
+def sidecar_locations(archive, suffix: str) -> List[str]:
+    """归档旁的 <归档名><后缀>，以及用户缓存目录下按路径哈希命名的备用位置"""
+    path = os.path.abspath(os.fspath(archive))
+    digest = hashlib.sha1(path.encode("utf-8", "surrogatepass")).hexdigest()
+    return [path + suffix, os.path.join(cache_dir(), digest + suffix)]
+
+
+def read_documents(archive, suffix: str, magic: bytes) -> Iterator[dict]:
+    """依次读取各位置上文件头正确、可以解析的文档"""
+    for location in sidecar_locations(archive, suffix):
+        try:
+            with open(location, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        if not data.startswith(magic):
+            continue
+        try:
+            yield json.loads(zlib.decompress(data[len(magic):]))
+        except (zlib.error, ValueError):
+            continue
+
+
+def write_document(archive, suffix: str, magic: bytes, document: dict) -> Optional[str]:
+    """以临时文件加原子重命名写入文档，返回保存位置；均不可写时返回 None"""
+    data = magic + zlib.compress(json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    for location in sidecar_locations(archive, suffix):
+        temp = f"{location}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, location)
+            return location
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+    return None
+
+
+class ArchiveIndex:
+    """
+    归档成员索引：成员名、偏移、大小与 CRC，以 (绝对路径, 大小, 修改时间) 为键。
+
+    首次解压或列出成员时生成，保存为归档旁的 <归档名>.dhidx（不可写时存入用户缓存目录），
+    之后再列出或选择性解压同一归档时直接读取，无需重新解析中央目录或解压整个 tar 流。
+    文件内容为 zlib 压缩的 JSON，不使用 pickle，读取来源不明的索引也不会执行代码。
+    """
+
+    def __init__(self, fmt: str, key: list, entries: List[IndexEntry]):
+        self.format = fmt
+        self.key = key
+        self.entries = entries
+
+    @staticmethod
+    def key_of(archive) -> list:
+        path = os.path.abspath(os.fspath(archive))
+        stat = os.stat(path)
+        return [path, stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def locations(archive) -> List[str]:
+        return sidecar_locations(archive, INDEX_SUFFIX)
+
+    @classmethod
+    def build(cls, archive, fmt: str, entries: List[IndexEntry]) -> "ArchiveIndex":
+        return cls(fmt, cls.key_of(archive), entries)
+
+    @classmethod
+    def load(cls, archive, fmt: str) -> Optional["ArchiveIndex"]:
+        """读取与归档当前状态一致的索引，不存在或已过期返回 None"""
+        try:
+            key = cls.key_of(archive)
+        except OSError:
+            return None
+        for document in read_documents(archive, INDEX_SUFFIX, _MAGIC):
+            if document.get("format") != fmt or document.get("key") != key:
+                continue
+            return cls(fmt, key, [IndexEntry(*entry) for entry in document["entries"]])
+        return None
+
+    def save(self, archive) -> Optional[str]:
+        """写入索引，返回保存位置；均不可写时返回 None，不影响解压"""
+        document = {"format": self.format, "key": self.key, "entries": self.entries}
+        return write_document(archive, INDEX_SUFFIX, _MAGIC, document)
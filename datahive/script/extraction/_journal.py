@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 断点续解的解压日志
+@Date       : 2026/10/18 16:30
+@Author     : lkkings
+@FileName:  : _journal.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from datahive.script.extraction._planner import normalize_name
+from datahive.utils.metrics_util import metrics
+
+# 写出中的临时文件后缀，完整写出后原子重命名为目标文件
+PART_SUFFIX = ".dhpart"
+
+
+class ExtractionJournal:
+    """
+    追加写入的解压日志，与输出目录同级存放（.<输出目录名>.dhjournal）。
+
+    每个成员完整写出并重命名后追加一行 JSON：{"name": 成员名, "size": 大小, "crc": CRC32}，
+    非续解时沿用的已存在文件同样记入。续解时只需比对日志与归档元数据即可跳过已完成的成员，无需重新 stat 或计算哈希。
+    归档全部解压成功后删除日志。
+    """
+
+    # 日志刷盘间隔（秒），进程被杀时最多丢失这段时间内的记录，对应成员会被重新解压
+    flush_interval = 1.0
+
+    def __init__(self, output_dir):
+        output_dir = os.path.abspath(os.fspath(output_dir))
+        self.path = os.path.join(os.path.dirname(output_dir), f".{os.path.basename(output_dir)}.dhjournal")
+        self._entries: Dict[str, Tuple[int, Optional[int]]] = {}
+        self._fd: Optional[int] = None
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._flush_time = 0.0
+        # 末行是否写了一半（缺少换行符）
+        self._torn = False
+
+    def load(self):
+        """读取已有日志，忽略进程中断时写了一半的末行"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._entries[entry["name"]] = (entry["size"], entry.get("crc"))
+        except FileNotFoundError:
+            pass
+
+    def open(self, resume: bool = False, load: bool = True):
+        """
+        打开日志。续解时在原日志后追加，否则重新开始。
+
+        :param resume: 是否续解
+        :param load: 续解时是否读取已有记录（分片子进程只追加，无需读取）
+        """
+        if resume and load:
+            self.load()
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | (0 if resume else os.O_TRUNC)
+        self._fd = os.open(self.path, flags, 0o644)
+        if resume and self._torn:
+            # 先补齐换行，避免新记录与半行拼接
+            os.write(self._fd, b"\n")
+
+    def verified(self, name: str, size: int, crc: Optional[int] = None) -> bool:
+        """成员是否已完整写出，且大小与 CRC 与归档元数据一致"""
+        entry = self._entries.get(normalize_name(name))
+        if entry is None or entry[0] != size:
+            return False
+        return crc is None or entry[1] is None or entry[1] == crc
+
+    def record(self, name: str, size: int, crc: Optional[int] = None):
+        line = json.dumps({"name": normalize_name(name), "size": size, "crc": crc}, ensure_ascii=False)
+        with self._lock:
+            self._pending.append(line + "\n")
+            now = time.monotonic()
+            if now - self._flush_time >= self.flush_interval:
+                self._flush()
+                self._flush_time = now
+
+    def _flush(self):
+        # 整行一次性追加写入，多个进程共用同一份日志时不会交错
+        if self._pending:
+            os.write(self._fd, "".join(self._pending).encode("utf-8"))
+            self._pending.clear()
+
+    def remove(self):
+        """解压全部成功后删除日志"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._fd is None:
+            return
+        with self._lock:
+            self._flush()
+            start = metrics.clock()
+            os.fsync(self._fd)
+            metrics.observe("fsync", start)
+            os.close(self._fd)
+            self._fd = None
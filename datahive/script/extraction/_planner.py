@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 解压前的目录规划
+@Date       : 2026/10/18 13:40
+@Author     : lkkings
+@FileName:  : _planner.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import os
+import posixpath
+import threading
+from typing import Iterable, Set, Tuple
+
+
+def normalize_name(name: str) -> str:
+    """把成员名统一为不带首尾分隔符的相对 posix 路径"""
+    name = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    return "" if name == "." else name
+
+
+class ExtractionPlan:
+    """
+    一次性规划输出目录：
+
+    - 用 os.scandir 批量扫描输出目录中已存在的文件，之后的存在性判断只查集合；
+    - 根据成员列表推导出全部目录，按深度一次性创建，成员写出时不再逐个 mkdir。
+    """
+
+    def __init__(self, output_dir):
+        self._root = os.fspath(output_dir)
+        self._existing: Set[str] = set()
+        self._dirs: Set[str] = {""}
+        self._lock = threading.Lock()
+
+    def scan(self):
+        """扫描输出目录下已存在的文件与目录"""
+        stack = [(self._root, "")]
+        while stack:
+            path, prefix = stack.pop()
+            try:
+                entries = os.scandir(path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entries:
+                for entry in entries:
+                    name = prefix + entry.name
+                    self._existing.add(name)
+                    if entry.is_dir(follow_symlinks=False):
+                        self._dirs.add(name)
+                        stack.append((entry.path, name + "/"))
+
+    def make_dirs(self, members: Iterable[Tuple[str, bool]]):
+        """
+        推导并创建成员需要的全部目录
+
+        :param members: (成员名, 是否为目录) 序列
+        """
+        dirs = set()
+        for name, is_dir in members:
+            name = normalize_name(name)
+            parent = name if is_dir else posixpath.dirname(name)
+            while parent not in dirs and parent not in self._dirs:
+                dirs.add(parent)
+                parent = posixpath.dirname(parent)
+        for name in sorted(dirs, key=lambda d: d.count("/")):
+            try:
+                os.mkdir(os.path.join(self._root, name))
+            except FileExistsError:
+                pass
+        self._dirs |= dirs
+
+    def exists(self, name: str) -> bool:
+        """成员在解压开始前是否已存在于输出目录"""
+        return normalize_name(name) in self._existing
+
+    def has_parent(self, name: str) -> bool:
+        return posixpath.dirname(normalize_name(name)) in self._dirs
+
+    def ensure_parent(self, name: str):
+        """流式解压时无法预知成员列表，按需创建父目录并缓存"""
+        parent = posixpath.dirname(normalize_name(name))
+        with self._lock:
+            if parent in self._dirs:
+                return
+            os.makedirs(os.path.join(self._root, parent), exist_ok=True)
+            while parent not in self._dirs:
+                self._dirs.add(parent)
+                parent = posixpath.dirname(parent)
+
+    @classmethod
+    def build(cls, output_dir, members: Iterable[Tuple[str, bool]] = (), scan: bool = True) -> "ExtractionPlan":
+        plan = cls(output_dir)
+        if scan:
+            plan.scan()
+        plan.make_dirs(members)
+        return plan
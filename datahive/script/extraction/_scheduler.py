@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 批量解压的工作窃取调度
+@Date       : 2026/10/19 10:40
+@Author     : lkkings
+@FileName:  : _scheduler.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterable, Awaitable, Callable, Deque, List, NamedTuple, Optional, Tuple
+
+from datahive.utils.metrics_util import metrics
+
+# 压缩数据达到该大小的归档才考虑按成员拆分
+SPLIT_MIN_SIZE = 64 * 1024 * 1024
+
+
+class WorkUnit(NamedTuple):
+    """调度的最小单位：整个归档，或大归档按成员拆分出的一部分"""
+    # 所属任务（任务列表中的行）序号
+    task: int
+    input_file: str
+    output_file: str
+    # 工作量估计（压缩字节数）
+    size: int
+    # 本单元负责的成员，None 表示整个归档
+    members: Optional[List[Any]] = None
+
+
+class UnitResult(NamedTuple):
+    unit: WorkUnit
+    # 失败原因，None 表示成功
+    error: Optional[str]
+    start: float
+    end: float
+
+
+class ConcurrencyBudget(NamedTuple):
+    """全局并发预算在进程间的分配：processes 个进程，每个进程同时写出 io_per_process 个成员"""
+    processes: int
+    io_per_process: int
+
+    @classmethod
+    def split(cls, total: int, units: Optional[int] = None) -> "ConcurrencyBudget":
+        """
+        把总并发数分配给解压进程：进程数不超过 CPU 数（解压是 CPU 密集的）与单元数，
+        其余额度作为各进程内的 I/O 并发，总数不超过 total。
+        """
+        total = max(total, 1)
+        processes = min(total, os.cpu_count() or 1)
+        if units is not None:
+            processes = max(min(processes, units), 1)
+        return cls(processes, max(total // processes, 1))
+
+
+def plan_split(sizes: List[int], processes: int, split_min_size: int = SPLIT_MIN_SIZE) -> Tuple[int, int]:
+    """
+    计算需要按成员拆分的归档大小阈值与拆分单元大小。
+
+    单个归档超过每个进程的平均工作量时，即使最先开始也会拖长总耗时（LPT 的最坏情况），
+    需要拆分后由多个进程分担；单元大小取平均工作量的 1/4，留出窃取的余地。
+
+    :return: (拆分阈值, 单元大小)
+    """
+    average = sum(sizes) // max(processes, 1)
+    return max(average, split_min_size), max(average // 4, split_min_size // 4, 1)
+
+
+def run_unit_loop(func: Callable[..., Awaitable], io_concurrency: int, *args, **kwargs):
+    """在工作进程中用新的事件循环运行一个单元，默认线程池大小按该进程的 I/O 并发预算设定"""
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=io_concurrency)
+    loop.set_default_executor(executor)
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(func(*args, **kwargs))
+    finally:
+        loop.close()
+        executor.shutdown(wait=True)
+        asyncio.set_event_loop(None)
+
+
+class WorkStealingScheduler:
+    """
+    按最长处理时间优先（LPT）把单元分配到各工作槽的双端队列，
+    每个槽从自己队列的头部取最大的单元；队列为空时从剩余工作量最大的队列尾部窃取较小的单元。
+    每个槽同一时间只运行一个单元，槽数即并发的进程数。
+
+    单元按批流式加入，LPT 在每批内生效：已排队的单元达到 max_pending 时暂停接收，
+    既保留排序与均衡的余地，又不会把整个任务列表读入内存。
+
+    :param workers: 工作槽数
+    """
+    # 排队中的单元数上限
+    max_pending = 4096
+
+    def __init__(self, workers: int):
+        self.workers = max(workers, 1)
+        self._queues: List[Deque[WorkUnit]] = [deque() for _ in range(self.workers)]
+        self._loads: List[int] = [0] * self.workers
+        # 排队中的单元数
+        self.pending = 0
+        # 被窃取的单元数
+        self.steals = 0
+
+    def add(self, units: List[WorkUnit]):
+        """LPT：本批单元按工作量从大到小依次放入当前负载最小的队列"""
+        for unit in sorted(units, key=lambda u: u.size, reverse=True):
+            slot = min(range(self.workers), key=self._loads.__getitem__)
+            self._queues[slot].append(unit)
+            self._loads[slot] += unit.size
+        self.pending += len(units)
+        metrics.set("queue.scheduler", self.pending)
+
+    def next_unit(self, slot: int) -> Optional[WorkUnit]:
+        """取出槽的下一个单元，自己的队列为空时从负载最大的队列尾部窃取"""
+        queue = self._queues[slot]
+        if queue:
+            unit = queue.popleft()
+        else:
+            victim = max(range(self.workers), key=lambda i: (len(self._queues[i]) > 0, self._loads[i]))
+            if not self._queues[victim]:
+                return None
+            unit = self._queues[victim].pop()
+            self.steals += 1
+            slot = victim
+        self._loads[slot] -= unit.size
+        self.pending -= 1
+        metrics.set("queue.scheduler", self.pending)
+        return unit
+
+    async def run(self, batches: AsyncIterable[List[WorkUnit]],
+                  submit: Callable[[WorkUnit], Awaitable[Optional[str]]],
+                  onresult: Optional[Callable[[UnitResult], Awaitable[None]]] = None):
+        """
+        边接收边执行单元，直到单元来源结束且全部单元完成
+
+        :param batches: 按批产出单元的异步迭代器
+        :param submit: 执行一个单元，返回失败原因，成功时返回 None；抛出的异常同样记为失败
+        :param onresult: 每个单元完成后的回调
+        """
+        changed = asyncio.Condition()
+        feeding = True
+
+        async def feed():
+            nonlocal feeding
+            try:
+                async for units in batches:
+                    async with changed:
+                        await changed.wait_for(lambda: self.pending < self.max_pending)
+                        self.add(units)
+                        changed.notify_all()
+            finally:
+                async with changed:
+                    feeding = False
+                    changed.notify_all()
+
+        async def work(slot: int):
+            while True:
+                async with changed:
+                    await changed.wait_for(lambda: self.pending or not feeding)
+                    unit = self.next_unit(slot)
+                    if unit is None:
+                        return
+                    changed.notify_all()
+                start = time.time()
+                try:
+                    error = await submit(unit)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                if onresult is not None:
+                    await onresult(UnitResult(unit, error, start, time.time()))
+
+        feeder = asyncio.ensure_future(feed())
+        try:
+            await asyncio.gather(*(work(slot) for slot in range(self.workers)))
+        except BaseException:
+            feeder.cancel()
+            raise
+        # 单元来源出错时，已接收的单元先执行完再抛出
+        await feeder
@@ -0,0 +1,509 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 压缩 tar 的随机访问：gzip 检查点与 xz 块索引
+@Date       : 2026/10/18 21:40
+@Author     : lkkings
+@FileName:  : _seekable.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import base64
+import bisect
+import bz2
+import io
+import lzma
+import os
+import struct
+import zlib
+from typing import List, NamedTuple, Optional, Tuple
+
+from datahive.script.extraction._index import ArchiveIndex, read_documents, write_document
+
+# 检查点文件后缀，与成员索引存放在同一位置
+SEEK_SUFFIX = ".dhseek"
+_MAGIC = b"DHSEEK1\n"
+
+GZIP = "gzip"
+XZ = "xz"
+BZIP2 = "bz2"
+_FORMAT_MAGIC = ((b"\x1f\x8b", GZIP), (b"\xfd7zXZ\x00", XZ), (b"BZh", BZIP2))
+
+# deflate 回溯窗口大小，从检查点恢复解压只需要这部分历史数据
+WINDOW_SIZE = 32 * 1024
+# 每次读取的压缩数据大小
+READ_SIZE = 64 * 1024
+# 候选检查点需要验证一致的解压数据量
+_VERIFY_SIZE = 64 * 1024
+# 同步刷新写入的空存储块：LEN=0, NLEN=0xffff，其后的下一个 deflate 块从字节边界开始
+_SYNC_MARKER = b"\x00\x00\xff\xff"
+
+
+def detect_format(path) -> Optional[str]:
+    """按文件头识别压缩格式，未识别返回 None"""
+    with open(path, "rb") as f:
+        return format_of(f.read(6))
+
+
+def format_of(head: bytes) -> Optional[str]:
+    """按已读出的文件头识别压缩格式，未识别返回 None"""
+    for magic, fmt in _FORMAT_MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return None
+
+
+class Checkpoint(NamedTuple):
+    """
+    gzip 检查点
+
+    :param comp_offset: 压缩文件中的位置
+    :param uncomp_offset: 解压后数据流中的位置
+    :param window: 此前最多 32KB 的解压数据，作为 raw inflate 的预置字典；None 表示 gzip 成员的起点
+    """
+    comp_offset: int
+    uncomp_offset: int
+    window: Optional[bytes] = None
+
+
+_ORIGIN = Checkpoint(0, 0)
+
+
+def load_checkpoints(archive) -> Optional[List[Checkpoint]]:
+    """读取与归档当前状态一致的 gzip 检查点，不存在或已过期返回 None"""
+    try:
+        key = ArchiveIndex.key_of(archive)
+    except OSError:
+        return None
+    for document in read_documents(archive, SEEK_SUFFIX, _MAGIC):
+        if document.get("format") != GZIP or document.get("key") != key:
+            continue
+        return [Checkpoint(comp, uncomp, None if window is None else zlib.decompress(base64.b64decode(window)))
+                for comp, uncomp, window in document["checkpoints"]]
+    return None
+
+
+def save_checkpoints(archive, checkpoints: List[Checkpoint]) -> Optional[str]:
+    """保存 gzip 检查点，窗口单独压缩后以 base64 存入 JSON"""
+    document = {
+        "format": GZIP,
+        "key": ArchiveIndex.key_of(archive),
+        "checkpoints": [[c.comp_offset, c.uncomp_offset,
+                         None if c.window is None else base64.b64encode(zlib.compress(c.window)).decode("ascii")]
+                        for c in checkpoints],
+    }
+    return write_document(archive, SEEK_SUFFIX, _MAGIC, document)
+
+
+class _Candidate:
+    """待验证的检查点：另起一个解压器从该点恢复，与主解压器的输出比对一致后才采用"""
+
+    def __init__(self, checkpoint: Checkpoint):
+        self.checkpoint = checkpoint
+        self.decoder = zlib.decompressobj(-15, zdict=checkpoint.window)
+        self.expected = bytearray()
+        self.actual = bytearray()
+        self.verified = 0
+
+
+class _GzipDecoder:
+    """
+    从检查点开始顺序解压 gzip（支持多成员），并在解压过程中每隔 interval 字节压缩数据记录检查点：
+
+    - gzip 成员的起点（bgzip、pigz -i 等分块压缩的文件），从这里恢复无需任何历史数据；
+    - 同步刷新点（pigz 在每个分块之后写入的空存储块），此处 deflate 块从字节边界开始，
+      恢复时只需把此前 32KB 解压数据作为 raw inflate 的预置字典。
+
+    zlib 的 Python 接口没有 inflatePrime，无法在任意比特位置恢复解压，
+    因此单线程 gzip 生成的单一 deflate 流只有起点一个检查点。
+    从同步刷新点恢复的数据不经过成员尾部的 CRC 校验，候选点在采用前先比对验证。
+    """
+
+    def __init__(self, fd: int, start: Checkpoint, interval: Optional[int] = None, last: int = 0):
+        self._fd = fd
+        self._offset = start.comp_offset
+        self.position = start.uncomp_offset
+        self._interval = interval
+        # 最近一个检查点的压缩位置，新检查点与其间隔不小于 interval
+        self._last = max(last, start.comp_offset)
+        self._window = bytearray(start.window or b"")
+        # 当前成员的解压器，None 表示位于成员边界
+        self._decoder = None
+        self._raw = False
+        # raw 模式下成员结束后还需跳过的尾部（CRC32 与长度）字节数
+        self._trailer = 0
+        self._candidate: Optional[_Candidate] = None
+        self.checkpoints: List[Checkpoint] = []
+        self.eof = False
+        if start.window is not None:
+            self._decoder = zlib.decompressobj(-15, zdict=start.window)
+            self._raw = True
+
+    def read(self) -> bytes:
+        """返回下一段解压数据，结束时返回空字节串"""
+        while not self.eof:
+            data = os.pread(self._fd, READ_SIZE, self._offset)
+            if not data:
+                if self._decoder is not None or self._trailer:
+                    raise EOFError("gzip 数据不完整")
+                self.eof = True
+                break
+            before = self._offset
+            pieces = self._feed(data)
+            if pieces:
+                return pieces[0] if len(pieces) == 1 else b"".join(pieces)
+            if self._offset == before:
+                # 文件末尾不足一个成员头的残余数据
+                self.eof = True
+        return b""
+
+    def _feed(self, data: bytes) -> List[bytes]:
+        pieces = []
+        while data:
+            if self._trailer:
+                n = min(self._trailer, len(data))
+                self._trailer -= n
+                self._offset += n
+                data = data[n:]
+                continue
+            if self._decoder is None:
+                if len(data) < 2:
+                    break
+                if data[:2] != b"\x1f\x8b":
+                    # 与 gzip 模块一致，忽略最后一个成员之后的填充数据
+                    self.eof = True
+                    break
+                self._record(Checkpoint(self._offset, self.position))
+                self._decoder = zlib.decompressobj(31)
+                self._raw = False
+            cut = self._find_sync(data)
+            chunk = data if cut is None else data[:cut]
+            piece = self._decoder.decompress(chunk)
+            if piece:
+                pieces.append(piece)
+                self._emit(piece)
+            self._verify(chunk, piece)
+            if self._decoder.eof:
+                used = len(chunk) - len(self._decoder.unused_data)
+                self._settle()
+                self._trailer = 8 if self._raw else 0
+                self._decoder = None
+                self._offset += used
+                data = data[used:]
+                continue
+            self._offset += len(chunk)
+            data = data[len(chunk):]
+            if cut is not None:
+                self._candidate = _Candidate(Checkpoint(self._offset, self.position, bytes(self._window)))
+        return pieces
+
+    def _emit(self, piece: bytes):
+        self.position += len(piece)
+        self._window += piece[-WINDOW_SIZE:]
+        if len(self._window) > WINDOW_SIZE:
+            del self._window[:-WINDOW_SIZE]
+
+    def _find_sync(self, data: bytes) -> Optional[int]:
+        """距上一个检查点足够远时，在本段压缩数据中查找同步刷新点，返回其后的切分位置"""
+        if self._interval is None or self._candidate is not None:
+            return None
+        start = self._last + self._interval - self._offset
+        if start >= len(data):
+            return None
+        index = data.find(_SYNC_MARKER, max(start, 0))
+        return None if index < 0 else index + len(_SYNC_MARKER)
+
+    def _record(self, checkpoint: Checkpoint):
+        if self._interval is not None and checkpoint.comp_offset - self._last >= self._interval:
+            self.checkpoints.append(checkpoint)
+            self._last = checkpoint.comp_offset
+
+    def _verify(self, chunk: bytes, piece: bytes):
+        candidate = self._candidate
+        if candidate is None:
+            return
+        try:
+            candidate.actual += candidate.decoder.decompress(chunk)
+        except zlib.error:
+            self._candidate = None
+            return
+        candidate.expected += piece
+        n = min(len(candidate.expected), len(candidate.actual))
+        if candidate.expected[:n] != candidate.actual[:n]:
+            self._candidate = None
+            return
+        del candidate.expected[:n]
+        del candidate.actual[:n]
+        candidate.verified += n
+        if candidate.verified >= _VERIFY_SIZE:
+            self._accept()
+
+    def _settle(self):
+        """成员结束时，候选点的解压器也须恰好结束且输出一致"""
+        candidate = self._candidate
+        if candidate is not None and candidate.decoder.eof and not candidate.expected and not candidate.actual:
+            self._accept()
+        self._candidate = None
+
+    def _accept(self):
+        self.checkpoints.append(self._candidate.checkpoint)
+        self._last = self._candidate.checkpoint.comp_offset
+        self._candidate = None
+
+
+class XzStream(NamedTuple):
+    """xz 文件中的一个流：流头与数据块所占的范围 [start, end)，end 为流索引的位置"""
+    header: bytes
+    start: int
+    end: int
+
+
+class XzBlock(NamedTuple):
+    comp_offset: int
+    uncomp_offset: int
+    stream: int
+
+
+def _varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("xz 索引损坏")
+
+
+def read_xz_layout(fd: int) -> Tuple[List[XzStream], List[XzBlock]]:
+    """
+    从文件末尾依次读取各个流的流尾与索引，得到全部数据块的位置。
+    xz 的数据块相互独立，从任一块的起点都可以开始解压。
+
+    :raise ValueError: 不是完整的 xz 文件
+    """
+    end = os.fstat(fd).st_size
+    found = []
+    while end > 0:
+        footer = os.pread(fd, 12, end - 12)
+        if len(footer) != 12:
+            raise ValueError("xz 流尾不完整")
+        if footer[8:] == b"\x00\x00\x00\x00":
+            # 流之间的填充
+            end -= 4
+            continue
+        if footer[10:] != b"YZ":
+            raise ValueError("xz 流尾损坏")
+        backward = (struct.unpack("<I", footer[4:8])[0] + 1) * 4
+        index_offset = end - 12 - backward
+        index = os.pread(fd, backward, index_offset)
+        if len(index) != backward or index[0] != 0:
+            raise ValueError("xz 索引损坏")
+        count, pos = _varint(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, pos = _varint(index, pos)
+            size, pos = _varint(index, pos)
+            records.append((unpadded, size))
+        start = index_offset - sum((unpadded + 3) & ~3 for unpadded, _ in records) - 12
+        header = os.pread(fd, 12, start) if start >= 0 else b""
+        if not header.startswith(b"\xfd7zXZ\x00"):
+            raise ValueError("xz 流头损坏")
+        found.append((XzStream(header, start, index_offset), records))
+        end = start
+    streams, blocks = [], []
+    uncomp = 0
+    for number, (stream, records) in enumerate(reversed(found)):
+        streams.append(stream)
+        comp = stream.start + 12
+        for unpadded, size in records:
+            blocks.append(XzBlock(comp, uncomp, number))
+            comp += (unpadded + 3) & ~3
+            uncomp += size
+    return streams, blocks
+
+
+class _XzDecoder:
+    """从某个数据块开始顺序解压：先送入所在流的流头，再依次送入数据块，不送入流索引"""
+
+    def __init__(self, fd: int, streams: List[XzStream], block: XzBlock):
+        self._fd = fd
+        self._streams = streams
+        self._stream = block.stream
+        self._offset = block.comp_offset
+        self.position = block.uncomp_offset
+        self._decoder = self._open(streams[block.stream])
+
+    @staticmethod
+    def _open(stream: XzStream) -> lzma.LZMADecompressor:
+        decoder = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+        decoder.decompress(stream.header)
+        return decoder
+
+    def read(self) -> bytes:
+        while self._stream < len(self._streams):
+            stream = self._streams[self._stream]
+            data = b""
+            if self._decoder.needs_input:
+                if self._offset >= stream.end:
+                    self._stream += 1
+                    if self._stream < len(self._streams):
+                        self._offset = self._streams[self._stream].start + 12
+                        self._decoder = self._open(self._streams[self._stream])
+                    continue
+                data = os.pread(self._fd, min(READ_SIZE, stream.end - self._offset), self._offset)
+                if not data:
+                    raise EOFError("xz 数据不完整")
+                self._offset += len(data)
+            # 限制单次输出，高压缩率的数据块不会一次解压出过多数据
+            piece = self._decoder.decompress(data, READ_SIZE * 16)
+            if piece:
+                self.position += len(piece)
+                return piece
+        return b""
+
+
+class _FileDecoder:
+    """没有检查点的格式从头顺序解压"""
+
+    def __init__(self, file):
+        self._file = file
+        self.position = 0
+
+    def read(self) -> bytes:
+        piece = self._file.read(READ_SIZE * 16)
+        self.position += len(piece)
+        return piece
+
+    def close(self):
+        self._file.close()
+
+
+class SeekableStream(io.RawIOBase):
+    """
+    压缩 tar 解压后数据流的随机访问视图，包装为 BufferedReader 后可供 tarfile 以 'r:' 模式随机读取。
+
+    seek 到某个位置时，从不超过该位置的最近检查点开始解压，只解压检查点到目标之间的数据：
+    gzip 使用已保存的检查点，并在解压过程中按 interval 记录新的检查点，关闭时保存；
+    xz 直接使用文件末尾索引中的数据块位置；bz2 等没有检查点的格式从头解压。
+    顺序向前读取时沿用当前解压器，不会重复解压。
+    """
+
+    def __init__(self, path, interval: Optional[int] = None):
+        super().__init__()
+        self._path = os.fspath(path)
+        self._interval = interval
+        self.format = detect_format(self._path)
+        if self.format is None:
+            raise ValueError(f"不支持随机访问的压缩格式 -> {self._path}")
+        self._fd = os.open(self._path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        self._checkpoints: List[Checkpoint] = [_ORIGIN]
+        self._saved = 1
+        self._xz_streams: List[XzStream] = []
+        self._xz_blocks: List[XzBlock] = []
+        if self.format == GZIP:
+            self._checkpoints = load_checkpoints(self._path) or [_ORIGIN]
+            self._saved = len(self._checkpoints)
+        elif self.format == XZ:
+            try:
+                self._xz_streams, self._xz_blocks = read_xz_layout(self._fd)
+            except ValueError:
+                self._xz_blocks = []
+        self._starts = self._start_offsets()
+        self._decoder = None
+        self._piece = b""
+        self._piece_start = 0
+        self._pos = 0
+
+    @property
+    def checkpoints(self) -> List[Checkpoint]:
+        self._harvest()
+        return list(self._checkpoints)
+
+    def _start_offsets(self) -> List[int]:
+        if self.format == XZ and self._xz_blocks:
+            return [block.uncomp_offset for block in self._xz_blocks]
+        if self.format == GZIP:
+            return [checkpoint.uncomp_offset for checkpoint in self._checkpoints]
+        return [0]
+
+    def _harvest(self):
+        """合并当前解压器新记录的检查点"""
+        if isinstance(self._decoder, _GzipDecoder) and self._decoder.checkpoints:
+            known = {checkpoint.comp_offset for checkpoint in self._checkpoints}
+            self._checkpoints.extend(c for c in self._decoder.checkpoints if c.comp_offset not in known)
+            self._checkpoints.sort()
+            self._decoder.checkpoints = []
+            self._starts = self._start_offsets()
+
+    def _open_decoder(self, index: int):
+        self._harvest()
+        if isinstance(self._decoder, _FileDecoder):
+            self._decoder.close()
+        if self.format == GZIP:
+            start = self._checkpoints[index]
+            self._decoder = _GzipDecoder(self._fd, start, self._interval, self._checkpoints[-1].comp_offset)
+        elif self.format == XZ and self._xz_blocks:
+            self._decoder = _XzDecoder(self._fd, self._xz_streams, self._xz_blocks[index])
+        elif self.format == XZ:
+            self._decoder = _FileDecoder(lzma.open(self._path))
+        else:
+            self._decoder = _FileDecoder(bz2.open(self._path))
+        self._piece = b""
+        self._piece_start = self._decoder.position
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("不支持从末尾定位")
+        if offset < 0:
+            raise ValueError(f"无效的位置 -> {offset}")
+        self._pos = offset
+        return offset
+
+    def readinto(self, b) -> int:
+        while True:
+            rel = self._pos - self._piece_start
+            if 0 <= rel < len(self._piece):
+                n = min(len(b), len(self._piece) - rel)
+                b[:n] = memoryview(self._piece)[rel:rel + n]
+                self._pos += n
+                return n
+            index = bisect.bisect_right(self._starts, self._pos) - 1
+            if self._decoder is None or self._pos < self._piece_start \
+                    or self._starts[index] > self._decoder.position:
+                # 向后定位，或者目标之前有比当前解压位置更近的检查点
+                self._open_decoder(index)
+                continue
+            start = self._decoder.position
+            piece = self._decoder.read()
+            if not piece:
+                return 0
+            self._piece, self._piece_start = piece, start
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._harvest()
+            if isinstance(self._decoder, _FileDecoder):
+                self._decoder.close()
+            if self.format == GZIP and len(self._checkpoints) > self._saved:
+                save_checkpoints(self._path, self._checkpoints)
+        finally:
+            os.close(self._fd)
+            super().close()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 基于位置读取（pread/mmap）的 zip 成员读取器
+@Date       : 2026/10/18 11:05
+@Author     : lkkings
+@FileName:  : _zip_reader.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import bz2
+import copy
+import io
+import lzma
+import mmap
+import os
+import struct
+import threading
+import zlib
+import zipfile
+from typing import BinaryIO, Optional, Union
+
+from datahive.script.extraction._zstd import ZstdDecompressor
+from datahive.utils.metrics_util import metrics
+
+# 本地文件头: 签名、版本、标志、压缩方式、时间、日期、CRC、压缩大小、原始大小、文件名长度、扩展字段长度
+_LOCAL_HEADER_FORMAT = "<4s5H3L2H"
+_LOCAL_HEADER_SIZE = struct.calcsize(_LOCAL_HEADER_FORMAT)
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+# 每次从归档读取的压缩数据大小
+READ_SIZE = 256 * 1024
+
+# APPNOTE 6.3.7 中的 zstd 压缩方式，zipfile 不支持
+ZIP_ZSTANDARD = 93
+
+
+class _Inflater:
+    """让 zlib 解压对象与 bz2/lzma 解压对象拥有一致的接口"""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    @property
+    def needs_input(self) -> bool:
+        return not self._decompressor.unconsumed_tail
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        if not data:
+            data = self._decompressor.unconsumed_tail
+        return self._decompressor.decompress(data, max_length)
+
+
+class _LZMADecompressor:
+    """zip 中的 lzma 数据带有 4 字节头和属性块，需在首次输入时解析"""
+
+    def __init__(self):
+        self._decompressor = None
+        self._header = b""
+
+    @property
+    def needs_input(self) -> bool:
+        return self._decompressor is None or self._decompressor.needs_input
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        if self._decompressor is None:
+            self._header += data
+            if len(self._header) <= 4:
+                return b""
+            props_size, = struct.unpack("<H", self._header[2:4])
+            if len(self._header) <= 4 + props_size:
+                return b""
+            self._decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[
+                lzma._decode_filter_properties(lzma.FILTER_LZMA1, self._header[4:4 + props_size])
+            ])
+            data = self._header[4 + props_size:]
+            self._header = b""
+        return self._decompressor.decompress(data, max_length)
+
+
+_DECOMPRESSORS = {
+    zipfile.ZIP_STORED: None,
+    zipfile.ZIP_DEFLATED: _Inflater,
+    zipfile.ZIP_BZIP2: bz2.BZ2Decompressor,
+    zipfile.ZIP_LZMA: _LZMADecompressor,
+    ZIP_ZSTANDARD: ZstdDecompressor,
+}
+
+
+class ZipMemberReader(io.RawIOBase):
+    """单个成员的只读流，只持有自己的偏移量，多个线程可同时读取不同成员"""
+
+    def __init__(self, archive: "PreadZipReader", file_info: zipfile.ZipInfo):
+        super().__init__()
+        self._archive = archive
+        self._offset = archive.data_offset(file_info)
+        self._end = self._offset + file_info.compress_size
+        self._init_decoder(file_info)
+
+    def _init_decoder(self, file_info: zipfile.ZipInfo):
+        self._info = file_info
+        factory = _DECOMPRESSORS[file_info.compress_type]
+        if factory is ZstdDecompressor:
+            # zstd 按需拉取压缩数据，每次最多解出请求的大小
+            self._decompressor = ZstdDecompressor(self._read_input, READ_SIZE)
+        else:
+            self._decompressor = factory() if factory else None
+        self._left = file_info.file_size
+        self._compress_left = file_info.compress_size
+        self._crc = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _read_input(self, size: int) -> bytes:
+        """读取压缩数据，读完时返回空字节串"""
+        if self._compress_left <= 0:
+            return b""
+        data = self._read_raw(min(size, self._compress_left))
+        self._compress_left -= len(data)
+        return data
+
+    def _read_raw(self, size: int) -> bytes:
+        size = min(size, self._end - self._offset)
+        start = metrics.clock()
+        data = self._archive.pread(size, self._offset) if size > 0 else b""
+        metrics.observe("read", start, len(data))
+        if not data:
+            raise zipfile.BadZipFile(f"成员数据不完整 -> {self._info.filename}")
+        self._offset += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        if self._left <= 0:
+            return 0
+        view = memoryview(buffer).cast("B")
+        max_length = min(len(view), self._left)
+        if self._decompressor is None:
+            data = self._read_raw(max_length)
+        else:
+            while True:
+                raw = self._read_raw(READ_SIZE) if self._decompressor.needs_input else b""
+                data = self._decompressor.decompress(raw, max_length)
+                if data:
+                    break
+        n = len(data)
+        view[:n] = data
+        self._left -= n
+        self._crc = zlib.crc32(data, self._crc)
+        if self._left == 0 and self._crc != self._info.CRC:
+            raise zipfile.BadZipFile(f"CRC 校验失败 -> {self._info.filename}")
+        return n
+
+
+class StreamMemberReader(ZipMemberReader):
+    """
+    从 ZipFile 读出的原始压缩数据上解压，用于 zipfile 不支持的压缩方式（zstd）。
+    ZipFile 以 STORED 方式打开成员，只负责定位与读出压缩数据，解压与 CRC 校验由本类完成。
+    """
+
+    def __init__(self, zip_file: zipfile.ZipFile, file_info: zipfile.ZipInfo):
+        io.RawIOBase.__init__(self)
+        raw_info = copy.copy(file_info)
+        raw_info.compress_type = zipfile.ZIP_STORED
+        raw_info.file_size = file_info.compress_size
+        raw_info.CRC = None
+        self._raw = zip_file.open(raw_info)
+        self._init_decoder(file_info)
+
+    def _read_raw(self, size: int) -> bytes:
+        start = metrics.clock()
+        data = self._raw.read(size)
+        metrics.observe("read", start, len(data))
+        if not data:
+            raise zipfile.BadZipFile(f"成员数据不完整 -> {self._info.filename}")
+        return data
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+
+def open_member(zip_file: Union[zipfile.ZipFile, "PreadZipReader"], file_info: zipfile.ZipInfo) -> BinaryIO:
+    """打开成员数据流，zipfile 不支持的 zstd 成员由本模块解压"""
+    if isinstance(zip_file, zipfile.ZipFile) and file_info.compress_type == ZIP_ZSTANDARD:
+        return io.BufferedReader(StreamMemberReader(zip_file, file_info), READ_SIZE)
+    return zip_file.open(file_info)
+
+
+class PreadZipReader:
+    """
+    zip 成员读取后端，可替代 ZipFile.open。
+
+    根据中央目录中的偏移量，用 os.pread（不支持时退化为 mmap）按位置读取本地文件头与压缩数据，
+    不存在共享的文件游标，也就无需加锁。加密成员或不支持的压缩方式交给 zipfile 处理。
+    """
+
+    def __init__(self, path, fallback: Optional[zipfile.ZipFile] = None):
+        self._path = path
+        self._fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        self._mmap = None
+        if not hasattr(os, "pread"):
+            self._mmap = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        self._fallback = fallback
+        self._owns_fallback = False
+        self._fallback_lock = threading.Lock()
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def pread(self, size: int, offset: int) -> bytes:
+        if self._mmap is None:
+            return os.pread(self._fd, size, offset)
+        return self._mmap[offset:offset + size]
+
+    def data_offset(self, file_info: zipfile.ZipInfo) -> int:
+        """解析本地文件头，返回成员压缩数据在归档中的起始偏移"""
+        header = self.pread(_LOCAL_HEADER_SIZE, file_info.header_offset)
+        if len(header) != _LOCAL_HEADER_SIZE or header[:4] != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"本地文件头损坏 -> {file_info.filename}")
+        name_length, extra_length = struct.unpack(_LOCAL_HEADER_FORMAT, header)[-2:]
+        return file_info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length
+
+    def supports(self, file_info: zipfile.ZipInfo) -> bool:
+        return not file_info.flag_bits & 0x1 and file_info.compress_type in _DECOMPRESSORS
+
+    def open(self, file_info: zipfile.ZipInfo):
+        if self.supports(file_info):
+            return ZipMemberReader(self, file_info)
+        with self._fallback_lock:
+            if self._fallback is None:
+                self._fallback = zipfile.ZipFile(self._path)
+                self._owns_fallback = True
+        return self._fallback.open(file_info)
+
+    def close(self):
+        if self._owns_fallback:
+            self._fallback.close()
+        if self._mmap is not None:
+            self._mmap.close()
+        os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
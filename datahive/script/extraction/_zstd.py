@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: zstd 解压：按帧切分，内容大小已知的独立帧并行解压
+@Date       : 2026/10/19 0:20
+@Author     : lkkings
+@FileName:  : _zstd.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import io
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# 可跳过帧的魔数为 0x184D2A50 ~ 0x184D2A5F
+_SKIPPABLE_MASK = 0xFFFFFFF0
+_SKIPPABLE_MAGIC = 0x184D2A50
+
+_DICT_ID_SIZES = (0, 1, 2, 4)
+_FCS_SIZES = (0, 2, 4, 8)
+
+
+def load_zstandard():
+    """zstandard 为可选依赖，只在读取 zstd 数据时导入"""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("读取 zstd 格式需要安装 zstandard: pip install zstandard") from e
+    return zstandard
+
+
+class ZstdFrameReader(io.RawIOBase):
+    """
+    zstd 数据的只读解压流。
+
+    按帧头与块头切分帧，不需要先解压：帧头记录了内容大小且不超过 frame_limit 的帧整帧读入，
+    交给线程池并行解压（zstd 解压时释放 GIL），按顺序输出；
+    内容大小未知或过大的帧（如 zstd 命令行从管道压缩的单帧数据）逐块流式解压，内存占用不随帧大小增长。
+
+    :param source: 压缩数据流，只需顺序读取
+    :param workers: 并行解压的线程数，1 表示全部流式解压
+    :param close_source: 关闭时是否一并关闭 source
+    """
+    # 整帧读入并行解压的帧内容大小上限
+    frame_limit = 64 * 1024 * 1024
+
+    def __init__(self, source: BinaryIO, workers: int = 1, close_source: bool = False):
+        super().__init__()
+        self._zstd = load_zstandard()
+        self._source = source
+        self._close_source = close_source
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._limit = workers * 2
+        # 当前帧是否在末尾带有 4 字节校验和
+        self._checksum = 0
+        self._pieces = self._iter_pieces()
+        self._piece = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def _read_exact(self, size: int) -> bytes:
+        data = self._source.read(size)
+        while len(data) < size:
+            more = self._source.read(size - len(data))
+            if not more:
+                raise EOFError("zstd 数据不完整")
+            data += more
+        return data
+
+    def _read_frame_header(self) -> Optional[Tuple[bytes, Optional[int]]]:
+        """读取下一个数据帧的帧头，跳过可跳过帧；返回 (帧头, 内容大小)，数据结束时返回 None"""
+        while True:
+            magic = self._source.read(4)
+            if not magic:
+                return None
+            if len(magic) < 4:
+                magic += self._read_exact(4 - len(magic))
+            number, = struct.unpack("<L", magic)
+            if number & _SKIPPABLE_MASK == _SKIPPABLE_MAGIC:
+                size, = struct.unpack("<L", self._read_exact(4))
+                self._read_exact(size)
+                continue
+            if magic != ZSTD_MAGIC:
+                raise ValueError("不是有效的 zstd 数据")
+            descriptor = self._read_exact(1)
+            flags = descriptor[0]
+            single_segment = flags >> 5 & 1
+            fcs_size = _FCS_SIZES[flags >> 6] or single_segment
+            size = (0 if single_segment else 1) + _DICT_ID_SIZES[flags & 3] + fcs_size
+            rest = self._read_exact(size)
+            content_size = None
+            if fcs_size:
+                content_size = int.from_bytes(rest[size - fcs_size:], "little")
+                if fcs_size == 2:
+                    content_size += 256
+            self._checksum = flags >> 2 & 1
+            return magic + descriptor + rest, content_size
+
+    def _iter_blocks(self) -> Iterator[bytes]:
+        """逐块读出当前帧剩余的压缩数据（块头 + 块内容，最后附带校验和）"""
+        while True:
+            header = self._read_exact(3)
+            value = int.from_bytes(header, "little")
+            block_type = value >> 1 & 3
+            # RLE 块只存一个字节
+            size = 1 if block_type == 1 else value >> 3
+            data = header + self._read_exact(size)
+            if value & 1:
+                if self._checksum:
+                    data += self._read_exact(4)
+                yield data
+                return
+            yield data
+
+    def _decompress_frame(self, frame: bytes, content_size: int) -> bytes:
+        return self._zstd.ZstdDecompressor().decompress(frame, max_output_size=content_size)
+
+    def _iter_pieces(self) -> Iterator[bytes]:
+        pending = deque()
+        while True:
+            frame = self._read_frame_header()
+            if frame is None:
+                break
+            header, content_size = frame
+            if self._pool is not None and content_size is not None and content_size <= self.frame_limit:
+                data = header + b"".join(self._iter_blocks())
+                pending.append(self._pool.submit(self._decompress_frame, data, content_size))
+                if len(pending) > self._limit:
+                    yield pending.popleft().result()
+                continue
+            # 流式解压前先按顺序输出已提交的帧
+            while pending:
+                yield pending.popleft().result()
+            decompressor = self._zstd.ZstdDecompressor().decompressobj()
+            decompressor.decompress(header)
+            for block in self._iter_blocks():
+                # 每块解压后不超过 128KB
+                data = decompressor.decompress(block)
+                if data:
+                    yield data
+        while pending:
+            yield pending.popleft().result()
+
+    def readinto(self, buffer) -> int:
+        while not self._piece:
+            piece = next(self._pieces, None)
+            if piece is None:
+                return 0
+            self._piece = memoryview(piece)
+        view = memoryview(buffer).cast("B")
+        n = min(len(view), len(self._piece))
+        view[:n] = self._piece[:n]
+        self._piece = self._piece[n:]
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._pieces.close()
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+            if self._close_source:
+                self._source.close()
+        finally:
+            super().close()
+
+
+class _Source:
+    """把 read 函数包装为 stream_reader 需要的可读对象"""
+
+    def __init__(self, read: Callable[[int], bytes]):
+        self.read = read
+
+
+class ZstdDecompressor:
+    """
+    让 zstd 解压与 bz2/lzma 解压对象拥有一致的接口（needs_input / decompress(data, max_length)）。
+
+    zstandard 的 decompressobj 会一次解出传入的全部数据，高压缩率的数据（如成片的零）可膨胀上万倍；
+    这里改为由 stream_reader 按需从 source 拉取压缩数据，每次最多解出 max_length 字节，
+    因此 needs_input 恒为 False，decompress 的 data 参数不使用。
+
+    :param source: 提供压缩数据的 read(size) 函数，数据读完时返回空字节串
+    """
+    needs_input = False
+
+    def __init__(self, source: Callable[[int], bytes], read_size: int = 256 * 1024):
+        self._reader = load_zstandard().ZstdDecompressor().stream_reader(
+            _Source(source), read_size=read_size, read_across_frames=True)
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        output = self._reader.read(max_length)
+        if not output:
+            raise EOFError("zstd 数据不完整")
+        return output
+
@@ -10,20 +10,604 @@
 Change Log  :
 
 """
+import asyncio
+import fnmatch
+import hashlib
+import os
+import threading
 from abc import abstractmethod, ABC
-from typing import Callable, Awaitable, Optional
+from contextlib import asynccontextmanager
+from io import BytesIO
+from typing import Callable, Awaitable, Optional, BinaryIO, List, Tuple, Any, Iterator, NamedTuple
 
 from aiopath import AsyncPath
 
+from datahive.script.extraction._dedup import dedup
+from datahive.script.extraction._index import ArchiveIndex, IndexEntry
+from datahive.script.extraction._journal import ExtractionJournal, PART_SUFFIX
+from datahive.script.extraction._planner import ExtractionPlan, normalize_name
+from datahive.utils.budget_util import MemoryBudget, budget
+from datahive.utils.io_util import CHUNK_SIZE, COPY_STEP, copy_chunk, copy_range, crc32_range, preallocate, \
+    write_sparse
+from datahive.utils.metrics_util import metrics
+
+
+# 解压日志记录的成员信息: (名称, 大小, CRC)
+MemberEntry = Tuple[str, int, Optional[int]]
+# 成批写出的成员: (打开成员数据流的函数, 目标文件路径, 日志记录)
+BatchItem = Tuple[Callable[[], BinaryIO], AsyncPath, Optional[MemberEntry]]
+
+
+class ArchiveMember(NamedTuple):
+    """转换归档时按顺序传递的成员，open 只在迭代到下一个成员之前有效"""
+    name: str
+    is_dir: bool
+    size: int
+    # 修改时间（Unix 时间戳）
+    mtime: float
+    # 权限位，None 表示归档中没有记录
+    mode: Optional[int]
+    open: Callable[[], BinaryIO]
+
+
+def to_part_path(target_path) -> str:
+    return os.fspath(target_path) + PART_SUFFIX
+
+
+def read_all(open_member: Callable[[], BinaryIO]) -> bytes:
+    with open_member() as src:
+        return src.read()
+
+
+def summarize_failures(failures: List[Tuple[str, str]], limit: int = 3) -> Optional[str]:
+    """把解压失败的成员汇总为一条失败原因，没有失败时返回 None"""
+    if not failures:
+        return None
+    details = "; ".join(f"{name}: {error}" for name, error in failures[:limit])
+    more = " 等" if len(failures) > limit else ""
+    return f"{len(failures)} 个成员解压失败 -> {details}{more}"
+
+
+def discard(path: str):
+    """删除写了一半的临时文件"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
 async def async_empty_fun(*args,**kwargs):
     pass
 class ExtractionStrategy(ABC):
     support_types = []
+    # 文件头特征 (偏移, 字节)，用于按内容识别格式
+    magic: List[Tuple[int, bytes]] = []
+    # 归档索引中的格式名，None 表示不支持索引
+    index_format: Optional[str] = None
+    # 是否读写归档索引
+    use_index = True
+    # 流式写出时每次读写的块大小
+    chunk_size = CHUNK_SIZE
+    # 不超过该大小的成员视为小文件，合并成批在一个工作线程内读取并写出
+    small_file_size = 256 * 1024
+    # 每批小文件的数量
+    batch_size = 64
+    # 达到该大小的成员写出前按原始大小预分配磁盘空间
+    preallocate_size = 8 * 1024 * 1024
+    # 压缩率高于该倍数的成员大多是成片的零，不预分配，让跳过的全零块成为空洞
+    sparse_ratio = 16
+    # 跳过全零块，在目标文件中留下空洞
+    sparse = True
+    # 去重模式下超过该大小的成员才参与去重，小文件链接与直接写出的开销相当
+    dedup_min_size = 256 * 1024
+    # 能否解压内存中的数据流，即能否作为嵌套归档递归解压
+    streamable = False
+    # 嵌套归档整体读入内存后递归解压，超过该大小的按普通文件写出；同时在内存中的嵌套归档总大小也以此为限
+    nested_max_size = 64 * 1024 * 1024
 
     def __init__(self):
         self.file_count = 0
+        # 解压单个归档时可使用的进程数，支持分片的策略据此并行
+        self.max_workers = 1
+        # 同时写出的成员（批次）数，批量解压时由调度器按全局并发预算分配
+        self.io_concurrency = (os.cpu_count() or 1) * 10
         self.onsuccess: Optional[Callable[[AsyncPath, int], Awaitable[None]]] = async_empty_fun
         self.onupdate: Optional[Callable[[AsyncPath, str], Awaitable[None]]] = async_empty_fun
+        # 与 onsuccess 同时回调，参数为待解压成员的总字节数（解压后），未知时为 None
+        self.onsuccess_bytes: Optional[Callable[[AsyncPath, Optional[int]], Awaitable[None]]] = async_empty_fun
+        # 每写入一块数据回调一次，参数为本次写入的字节数；跳过的已完成成员按其大小一次计入
+        self.onupdate_bytes: Optional[Callable[[AsyncPath, int], Awaitable[None]]] = async_empty_fun
+        # 续解时只跳过解压日志中核对无误的成员
+        self.resume = False
+        self.journal: Optional[ExtractionJournal] = None
+        # 选择性解压的成员名模式（fnmatch），None 表示解压全部成员
+        self.include: Optional[List[str]] = None
+        # 递归解压嵌套归档的剩余层数，0 表示不递归
+        self.recursive = 0
+        # 是否作为嵌套归档在父归档的解压过程中运行
+        self.nested = False
+        self._nested_budget: Optional[MemoryBudget] = None
+        self._buffers: List[bytearray] = []
+        # 解压失败的成员: (成员名, 失败原因)，单个成员失败不中断解压，由调用方汇总报告
+        self.failures: List[Tuple[str, str]] = []
+
+    def fail(self, name: str, error: BaseException):
+        """记录解压失败的成员"""
+        self.failures.append((name, f"{type(error).__name__}: {error}"))
+
+    def _acquire_buffer(self) -> bytearray:
+        """从缓冲池取出一个复用缓冲区"""
+        if self._buffers:
+            return self._buffers.pop()
+        return bytearray(self.chunk_size)
+
+    def _release_buffer(self, buffer: bytearray):
+        """归还缓冲区，供后续成员复用"""
+        self._buffers.append(buffer)
+
+    @asynccontextmanager
+    async def journaling(self, output_dir: AsyncPath, cleanup: bool = True):
+        """
+        解压期间打开与输出目录同级的解压日志，续解时先读取已有记录
+
+        :param cleanup: 没有失败的成员时是否删除日志；只做规划、成员由其他单元继续解压时保留
+        """
+        journal = self.journal = ExtractionJournal(output_dir)
+        await asyncio.to_thread(journal.open, self.resume)
+        try:
+            yield journal
+        finally:
+            self.journal = None
+            await asyncio.to_thread(journal.close)
+        if cleanup and not self.failures:
+            await asyncio.to_thread(journal.remove)
+
+    async def load_index(self, input_file: AsyncPath) -> Optional[ArchiveIndex]:
+        """读取与归档当前状态一致的索引"""
+        if not self.use_index or self.index_format is None:
+            return None
+        return await asyncio.to_thread(ArchiveIndex.load, input_file, self.index_format)
+
+    async def save_index(self, input_file: AsyncPath, entries: List[IndexEntry]):
+        if not self.use_index or self.index_format is None:
+            return
+        index = ArchiveIndex.build(input_file, self.index_format, entries)
+        await asyncio.to_thread(index.save, input_file)
+
+    def build_index(self, input_file: AsyncPath) -> List[IndexEntry]:
+        """读取归档生成索引（在工作线程中执行）"""
+        raise NotImplementedError
+
+    async def list_members(self, input_file: AsyncPath) -> List[IndexEntry]:
+        """列出归档成员，优先使用已缓存的索引"""
+        index = await self.load_index(input_file)
+        if index is not None:
+            return index.entries
+        entries = await asyncio.to_thread(self.build_index, input_file)
+        await self.save_index(input_file, entries)
+        return entries
+
+    async def plan_units(self, input_file: AsyncPath, output_file: AsyncPath,
+                         unit_size: int) -> Optional[List[Tuple[int, List[Any]]]]:
+        """
+        把归档拆分为可在不同进程中独立解压的成员单元，供批量调度器均衡负载。
+        成员选择、输出目录规划与进度登记在调用方进程中完成，各单元只需写出成员。
+
+        :param unit_size: 每个单元的目标工作量（压缩字节数）
+        :return: (工作量, 成员) 列表；不支持按成员拆分时返回 None，整个归档作为一个单元
+        """
+        return None
+
+    async def extract_unit(self, input_file: AsyncPath, output_file: AsyncPath, members: List[Any]):
+        """解压 plan_units 拆分出的一个成员单元"""
+        raise NotImplementedError
+
+    def iter_members(self, input_file, entries: Optional[List[IndexEntry]] = None) -> Iterator[ArchiveMember]:
+        """
+        按归档顺序逐个产出成员，不写出文件（在工作线程中执行），供归档格式转换使用
+
+        :param entries: 不为 None 时顺带收集全部成员的索引，遍历完成后可直接保存，无需再读一遍归档
+        """
+        raise NotImplementedError(f"{type(self).__name__} 不支持读取成员数据流")
+
+    def selected(self, name: str) -> bool:
+        """成员是否在 --include 选择的范围内，模式匹配到目录时包含其下的全部成员"""
+        if not self.include:
+            return True
+        name = normalize_name(name)
+        for pattern in self.include:
+            pattern = normalize_name(pattern)
+            if fnmatch.fnmatchcase(name, pattern) or name.startswith(pattern + "/"):
+                return True
+        return False
+
+    def is_done(self, plan: ExtractionPlan, name: str, size: int, crc: Optional[int] = None) -> bool:
+        """
+        成员是否无需再解压：续解时以日志为准，只跳过大小与 CRC 均核对无误的成员；
+        否则沿用已存在即跳过的规则（临时文件原子重命名保证了已存在的文件是完整的）。
+        """
+        if self.resume:
+            return self.journal is not None and self.journal.verified(name, size, crc)
+        if not plan.exists(name):
+            return False
+        # 沿用的文件同样记入日志，本次解压中断后续解时不必重新解压
+        if self.journal is not None:
+            self.journal.record(name, size, crc)
+        return True
+
+    async def skip_member(self, input_file: AsyncPath, target_path: AsyncPath, size: int):
+        """无需写出的成员（目录、已完成的成员）直接上报完成，大小计入字节进度"""
+        await self.onupdate(input_file, str(target_path))
+        if size:
+            await self.onupdate_bytes(input_file, size)
+
+    async def plan_members(self, input_file: AsyncPath, output_dir: AsyncPath, members: List[Any],
+                           key: Callable[[Any], Tuple[str, bool, int, Optional[int]]]) -> List[Any]:
+        """
+        解压前统一规划输出目录：扫描已存在的文件，按深度一次性创建全部目录。
+        目录成员与已完成的成员直接上报完成，之后每个成员只需打开并写入。
+        续解时以日志判断成员是否完成，不再扫描输出目录。
+
+        :param members: 成员信息列表
+        :param key: 返回成员 (名称, 是否为目录, 大小, CRC) 的函数
+        :return: 仍需写出的文件成员
+        """
+        entries = [key(member) for member in members]
+        plan = await asyncio.to_thread(ExtractionPlan.build, output_dir, [e[:2] for e in entries],
+                                       not self.resume)
+        pending = []
+        for member, (name, is_dir, size, crc) in zip(members, entries):
+            if is_dir or self.is_done(plan, name, size, crc):
+                await self.skip_member(input_file, output_dir / name, 0 if is_dir else size)
+            else:
+                pending.append(member)
+        return pending
+
+    def split_batches(self, members: List[Any], size_of: Callable[[Any], int],
+                      name_of: Optional[Callable[[Any], str]] = None) -> Tuple[List[List[Any]], List[Any]]:
+        """
+        按大小拆分成员，递归解压时嵌套归档不论大小都单独处理
+
+        :param name_of: 返回成员名的函数，用于识别嵌套归档
+        :return: (小文件批次列表, 大文件列表)
+        """
+        batches, large, batch = [], [], []
+        for member in members:
+            size = size_of(member)
+            if size > self.small_file_size or (name_of is not None and self.match_nested(name_of(member), size)):
+                large.append(member)
+                continue
+            batch.append(member)
+            if len(batch) >= self.batch_size:
+                batches.append(batch)
+                batch = []
+        if batch:
+            batches.append(batch)
+        return batches, large
+
+    def match_nested(self, name: str, size: int) -> Optional[Tuple["ExtractionStrategy", str]]:
+        """成员是可在内存中解压的归档且未超出递归层数与大小限制时，返回 (匹配的策略, 归档扩展名)"""
+        if self.recursive <= 0 or size > self.nested_max_size:
+            return None
+        # 工厂模块导入了全部策略，在此处导入避免循环引用
+        from datahive.script.extraction._factory import factory
+        found = factory.match(name)
+        if found is None or not found[0].streamable or len(name) == len(found[1]):
+            return None
+        return found
+
+    def reserve(self, nbytes: int):
+        """
+        预约全局内存预算。嵌套归档在父归档的解压过程中运行，父归档（如 tar 流水线）可能已持有全部额度，
+        再预约会与之互相等待；嵌套归档的数据已整体读入内存并计入 nested_budget，因此不再预约。
+        """
+        return budget.reserve(0 if self.nested else nbytes)
+
+    @property
+    def nested_budget(self) -> MemoryBudget:
+        """同时读入内存的嵌套归档总大小的额度"""
+        if self._nested_budget is None:
+            self._nested_budget = MemoryBudget()
+            self._nested_budget.configure(self.nested_max_size)
+        return self._nested_budget
+
+    async def extract_stream(self, fileobj: BinaryIO, input_file: AsyncPath, output_file: AsyncPath):
+        """
+        解压内存中的归档数据流，streamable 的策略需要实现
+
+        :param fileobj: 归档数据
+        :param input_file: 最外层归档的路径（用于进度回调）
+        :param output_file: 输出目录
+        """
+        raise NotImplementedError
+
+    async def extract_nested(self, data: bytes, name: str, output_dir: AsyncPath, input_file: AsyncPath,
+                             entry: Optional[MemberEntry]) -> Optional[AsyncPath]:
+        """
+        把已读入内存的嵌套归档直接交给对应策略解压，不写出中间文件。
+        输出目录为成员名去掉归档扩展名，写入的字节数计入外层归档的进度。
+
+        :return: 嵌套归档的输出目录；无法解压（如扩展名与内容不符）时返回 None，由调用方按普通文件写出
+        """
+        found = self.match_nested(name, len(data))
+        if found is None:
+            return None
+        strategy = type(found[0])()
+        strategy.recursive = self.recursive - 1
+        strategy.nested = True
+        strategy.nested_max_size = self.nested_max_size
+        strategy.sparse = self.sparse
+
+        async def onupdate_bytes(_: AsyncPath, n: int):
+            await self.onupdate_bytes(input_file, n)
+
+        strategy.onupdate_bytes = onupdate_bytes
+        target_dir = output_dir / name[:-len(found[1])]
+        try:
+            await strategy.extract_stream(BytesIO(data), input_file, target_dir)
+        except Exception:
+            return None
+        prefix = name[:-len(found[1])]
+        self.failures.extend((f"{prefix}/{member}", error) for member, error in strategy.failures)
+        if self.journal is not None and entry is not None:
+            await asyncio.to_thread(self.journal.record, *entry)
+        return target_dir
+
+    async def try_nested(self, open_member: Callable[[], BinaryIO], output_dir: AsyncPath, input_file: AsyncPath,
+                         entry: MemberEntry) -> Optional[AsyncPath]:
+        """
+        成员是嵌套归档时读入内存递归解压
+
+        :return: 嵌套归档的输出目录；不是嵌套归档或无法解压时返回 None
+        """
+        name, size, _ = entry
+        if self.match_nested(name, size) is None:
+            return None
+        async with self.nested_budget.reserve(size):
+            try:
+                data = await asyncio.to_thread(read_all, open_member)
+            except Exception:
+                return None
+            return await self.extract_nested(data, name, output_dir, input_file, entry)
+
+    def should_preallocate(self, size: int, compress_size: Optional[int] = None) -> bool:
+        if size < self.preallocate_size:
+            return False
+        return not (self.sparse and compress_size is not None and compress_size * self.sparse_ratio < size)
+
+    def open_target(self, part_path: str, size: Optional[int] = None, compress_size: Optional[int] = None) -> BinaryIO:
+        """打开临时文件，已知大小的大文件先预分配空间"""
+        dst = open(part_path, 'wb')
+        try:
+            if size is not None and self.should_preallocate(size, compress_size):
+                preallocate(dst.fileno(), size)
+        except OSError:
+            dst.close()
+            raise
+        return dst
+
+    def close_target(self, dst: BinaryIO, size: Optional[int] = None):
+        """关闭临时文件；稀疏写入时末尾的全零块只做了 seek，需要补齐文件长度"""
+        try:
+            if self.sparse:
+                dst.truncate(dst.tell() if size is None else size)
+        finally:
+            dst.close()
+
+    def write_buffer(self, dst: BinaryIO, buffer: bytearray, n: int, hasher=None):
+        """写出缓冲区中的 n 字节，按需跳过全零块、计算哈希"""
+        if hasher is not None:
+            hasher.update(memoryview(buffer)[:n])
+        start = metrics.clock()
+        if self.sparse:
+            write_sparse(dst, buffer, n)
+        else:
+            dst.write(memoryview(buffer)[:n])
+        metrics.observe("write", start, n)
+
+    @staticmethod
+    def member_name(target_path: AsyncPath, entry: Optional[MemberEntry]) -> str:
+        """失败报告中的成员名，没有日志记录时使用目标路径"""
+        return str(target_path) if entry is None else entry[0]
+
+    def dedupable(self, size: int) -> bool:
+        return dedup.enabled and size > self.dedup_min_size
+
+    def commit(self, part_path: str, target_path: AsyncPath, entry: Optional[MemberEntry],
+               digest: Optional[str] = None):
+        """
+        临时文件写完后原子重命名为目标文件，并记入解压日志。
+        去重模式下传入内容的 SHA-256：已有相同内容的文件时替换为链接，否则登记到去重索引。
+        """
+        os.replace(part_path, target_path)
+        if digest is not None and entry is not None:
+            _, size, crc = entry
+            target = os.fspath(target_path)
+            source = dedup.lookup(size, digest)
+            if source is not None and source != target and dedup.link(source, part_path, size):
+                os.replace(part_path, target)
+            else:
+                dedup.register(size, crc, digest, target)
+        if self.journal is not None and entry is not None:
+            self.journal.record(*entry)
+        metrics.add("members")
+
+    @staticmethod
+    def _hash_member(open_member: Callable[[], BinaryIO], view: memoryview,
+                     lock: Optional[threading.Lock]) -> str:
+        hasher = hashlib.sha256()
+        with open_member() as src:
+            while copy_chunk(src, None, view, lock, hasher=hasher):
+                pass
+        return hasher.hexdigest()
+
+    async def _link_duplicate(self, open_member: Callable[[], BinaryIO], target_path: AsyncPath,
+                              input_file: AsyncPath, entry: MemberEntry, view: memoryview,
+                              lock: Optional[threading.Lock]) -> bool:
+        """
+        带 CRC 的成员先按 (大小, CRC) 查找已写出的候选，
+        只读计算 SHA-256 确认内容相同后直接链接到候选文件，不再写盘。
+
+        :return: 已链接返回 True，没有相同内容的文件返回 False
+        """
+        _, size, crc = entry
+        found = await asyncio.to_thread(dedup.candidate, size, crc)
+        if found is None:
+            return False
+        digest, source = found
+        if await asyncio.to_thread(self._hash_member, open_member, view, lock) != digest:
+            return False
+        part_path = to_part_path(target_path)
+        if not await asyncio.to_thread(dedup.link, source, part_path, size):
+            return False
+        await asyncio.to_thread(self.commit, part_path, target_path, entry)
+        await self.onupdate_bytes(input_file, size)
+        return True
+
+    def _write_batch(self, items: List[BatchItem]) -> Tuple[List[AsyncPath], int]:
+        """在当前线程内依次写出一批小文件，返回写出成功的路径与总字节数"""
+        buffer = self._acquire_buffer()
+        view = memoryview(buffer)
+        done, nbytes = [], 0
+        try:
+            for open_member, target_path, entry in items:
+                part_path = to_part_path(target_path)
+                dst = None
+                try:
+                    with open_member() as src:
+                        dst = open(part_path, 'wb')
+                        while True:
+                            n = copy_chunk(src, dst, view)
+                            if n == 0:
+                                break
+                            nbytes += n
+                    dst.close()
+                    self.commit(part_path, target_path, entry)
+                    done.append(target_path)
+                except Exception as e:
+                    self.fail(self.member_name(target_path, entry), e)
+                    if dst is not None:
+                        dst.close()
+                        discard(part_path)
+        finally:
+            view.release()
+            self._release_buffer(buffer)
+        return done, nbytes
+
+    async def write_batch(self, items: List[BatchItem], input_file: AsyncPath, reserve_size: Optional[int] = None):
+        """
+        一次线程调用写出一批小文件，省去逐个成员的线程切换与进度回调开销
+
+        :param items: (打开成员数据流的函数, 目标文件路径, 日志记录) 列表
+        :param reserve_size: 需要预约的内存预算，默认为一个缓冲区（一批成员共用）；调用方已预约时传 0
+        """
+        async with self.reserve(self.chunk_size if reserve_size is None else reserve_size):
+            done, nbytes = await asyncio.to_thread(self._write_batch, items)
+        if nbytes:
+            await self.onupdate_bytes(input_file, nbytes)
+        for target_path in done:
+            await self.onupdate(input_file, str(target_path))
+
+    async def write_member(self, open_member: Callable[[], BinaryIO], target_path: AsyncPath,
+                           input_file: AsyncPath, entry: Optional[MemberEntry] = None,
+                           lock: Optional[threading.Lock] = None, compress_size: Optional[int] = None) -> bool:
+        """
+        将归档成员分块流式写入临时文件，完整写出后重命名为目标文件，峰值内存与成员大小无关。
+        大文件按原始大小预分配空间，全零块跳过写入。
+
+        :param open_member: 在工作线程中打开成员数据流的函数
+        :param target_path: 目标文件路径
+        :param input_file: 归档文件路径（用于进度回调）
+        :param entry: 成员的 (名称, 大小, CRC)，用于预约内存预算、预分配空间与记录解压日志
+        :param lock: 读取成员数据时需要持有的锁
+        :param compress_size: 成员压缩后的大小，用于判断是否可能为稀疏文件
+        :return: 写出成功返回 True，失败时记入 failures 并返回 False
+        """
+        reserve_size = self.chunk_size if entry is None else min(entry[1], self.chunk_size)
+        async with self.reserve(reserve_size):
+            return await self._write_member(open_member, target_path, input_file, entry, lock, compress_size)
+
+    async def _write_member(self, open_member: Callable[[], BinaryIO], target_path: AsyncPath,
+                            input_file: AsyncPath, entry: Optional[MemberEntry],
+                            lock: Optional[threading.Lock], compress_size: Optional[int]) -> bool:
+        buffer = self._acquire_buffer()
+        view = memoryview(buffer)
+        part_path = to_part_path(target_path)
+        size = None if entry is None else entry[1]
+        hasher = hashlib.sha256() if size is not None and self.dedupable(size) else None
+        src = dst = None
+        try:
+            if hasher is not None and entry[2] is not None \
+                    and await self._link_duplicate(open_member, target_path, input_file, entry, view, lock):
+                return True
+            src = await asyncio.to_thread(open_member)
+            dst = await asyncio.to_thread(self.open_target, part_path, size, compress_size)
+            while True:
+                n = await asyncio.to_thread(copy_chunk, src, dst, view, lock, self.sparse, hasher)
+                if n == 0:
+                    break
+                await self.onupdate_bytes(input_file, n)
+            await asyncio.to_thread(self.close_target, dst, size)
+            await asyncio.to_thread(self.commit, part_path, target_path, entry,
+                                    None if hasher is None else hasher.hexdigest())
+            return True
+        except Exception as e:
+            self.fail(self.member_name(target_path, entry), e)
+            if dst is not None:
+                dst.close()
+                dst = None
+                await asyncio.to_thread(discard, part_path)
+            return False
+        finally:
+            if src is not None:
+                src.close()
+            if dst is not None:
+                dst.close()
+            view.release()
+            self._release_buffer(buffer)
+
+    async def copy_member(self, src_fd: int, offset: int, size: int, target_path: AsyncPath,
+                          input_file: AsyncPath, entry: Optional[MemberEntry] = None) -> bool:
+        """
+        未压缩成员的零拷贝快速路径：直接把归档中 [offset, offset + size) 的数据在内核中复制到目标文件。
+        数据复制时不经过 Python 内存；记录中带 CRC 的成员复制完后读回目标文件（刚写入，通常仍在页缓存中）校验，
+        校验通过才重命名并记入解压日志。不参与去重。
+
+        :return: 复制成功返回 True，失败时记入 failures 并返回 False
+        """
+        part_path = to_part_path(target_path)
+        dst_fd = None
+        try:
+            dst_fd = await asyncio.to_thread(
+                os.open, part_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666
+            )
+            if size >= self.preallocate_size:
+                await asyncio.to_thread(preallocate, dst_fd, size)
+            left = size
+            while left > 0:
+                n = await asyncio.to_thread(copy_range, src_fd, dst_fd, offset, min(left, COPY_STEP))
+                if n == 0:
+                    raise EOFError(f"归档数据不完整 -> {target_path}")
+                offset += n
+                left -= n
+                await self.onupdate_bytes(input_file, n)
+            if entry is not None and entry[2] is not None:
+                if await asyncio.to_thread(crc32_range, dst_fd, 0, size) != entry[2]:
+                    raise ValueError(f"CRC 校验失败 -> {entry[0]}")
+            os.close(dst_fd)
+            dst_fd = None
+            await asyncio.to_thread(self.commit, part_path, target_path, entry)
+            return True
+        except Exception as e:
+            self.fail(self.member_name(target_path, entry), e)
+            if dst_fd is not None:
+                os.close(dst_fd)
+                dst_fd = None
+            await asyncio.to_thread(discard, part_path)
+            return False
+        finally:
+            if dst_fd is not None:
+                os.close(dst_fd)
 
     @abstractmethod
     async def extract(self, input_file: AsyncPath, output_file: AsyncPath) -> None:
@@ -11,57 +11,285 @@ Change Log  :
 
 """
 import asyncio
-import multiprocessing as mp
+import io
+import subprocess
+import tempfile
 import threading
+import time
+import zlib
+from functools import partial
+from io import BytesIO
+from typing import BinaryIO, Iterator, List, Optional
 
 import rarfile
 
-import aiofiles
 from aiopath import AsyncPath
 from asyncio_pool import AioPool
 
-from datahive.script.extraction.base_extraction import ExtractionStrategy
+from datahive.script.extraction._formats import RAR
+from datahive.script.extraction._index import IndexEntry
+from datahive.script.extraction.base_extraction import ArchiveMember, ExtractionStrategy, read_all
+from datahive.utils.budget_util import budget
+
+
+def stream_members(rar_file: rarfile.RarFile) -> List[rarfile.RarInfo]:
+    """解压工具输出全部数据时包含的成员：普通文件，按归档顺序"""
+    return [i for i in rar_file.infolist() if i.is_file() and not i.file_redir]
+
+
+class _SolidMember(io.RawIOBase):
+    """单个成员的数据流：从解压进程的输出中读取恰好 file_size 字节，读完时校验 CRC"""
+
+    def __init__(self, src: BinaryIO, file_info: rarfile.RarInfo):
+        super().__init__()
+        self._src = src
+        self._info = file_info
+        self._left = file_info.file_size
+        self._crc = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._left <= 0:
+            return 0
+        view = memoryview(buffer).cast("B")
+        n = self._src.readinto(view[:min(len(view), self._left)])
+        if not n:
+            raise rarfile.BadRarFile(f"解压输出不完整 -> {self._info.filename}")
+        self._crc = zlib.crc32(view[:n], self._crc)
+        self._left -= n
+        if self._left == 0 and self._info.CRC is not None and self._crc != self._info.CRC:
+            raise rarfile.BadRarFile(f"CRC 校验失败 -> {self._info.filename}")
+        return n
+
+    def close(self):
+        """未读完就关闭时读掉剩余数据，保证下一个成员从正确的位置开始"""
+        if not self.closed:
+            try:
+                while self._left > 0 and self.readinto(bytearray(min(self._left, 1024 * 1024))):
+                    pass
+            finally:
+                super().close()
+
+
+class SolidStream:
+    """
+    单遍顺序解压：只启动一个解压进程（unrar p / bsdtar -xO 等，由 rarfile 选择可用的工具），
+    按归档顺序输出全部文件数据，再按成员大小切分。
+
+    固实归档中每个成员都依赖之前的全部数据，逐个成员打开时每次都要从头解压并启动一个进程，总开销为 O(n²)；
+    分卷归档的成员也可能跨卷。单遍解压只需解压一次，成员只能按顺序打开，跳过的成员读出后丢弃。
+    """
+
+    def __init__(self, rar_file: rarfile.RarFile):
+        self._members = stream_members(rar_file)
+        self._position = 0
+        self._current: Optional[_SolidMember] = None
+        tool = rarfile.tool_setup()
+        self._errmap = tool.get_errmap()
+        # 错误输出单独写入临时文件，不能混进数据流，也不能因管道写满而阻塞解压进程
+        self._errors = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(tool.open_cmdline(None, rar_file.filename), stdout=subprocess.PIPE,
+                                      stderr=self._errors, stdin=subprocess.DEVNULL)
+
+    def open(self, file_info: rarfile.RarInfo) -> _SolidMember:
+        """打开下一个需要的成员，其间的成员读出后丢弃"""
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        while True:
+            if self._position >= len(self._members):
+                raise rarfile.BadRarFile(f"成员不在解压输出中或已被跳过 -> {file_info.filename}")
+            member = self._members[self._position]
+            self._position += 1
+            reader = _SolidMember(self._proc.stdout, member)
+            if member is file_info:
+                self._current = reader
+                return reader
+            reader.close()
+
+    def close(self, completed: bool = True):
+        """completed 时读完剩余输出并检查退出码，否则直接结束解压进程"""
+        try:
+            if completed:
+                if self._current is not None:
+                    self._current.close()
+                while self._position < len(self._members):
+                    _SolidMember(self._proc.stdout, self._members[self._position]).close()
+                    self._position += 1
+                self._proc.stdout.read()
+                code = self._proc.wait()
+                self._errors.seek(0)
+                rarfile.check_returncode(code, self._errors.read().decode(errors="replace").strip(), self._errmap)
+        finally:
+            if self._proc.poll() is None:
+                self._proc.kill()
+                self._proc.wait()
+            self._proc.stdout.close()
+            self._errors.close()
 
 
 class RarExtractionStrategy(ExtractionStrategy):
-    support_types = [".rar"]
+    """
+    非固实的单卷归档逐个成员并行解压；固实归档与分卷归档由一个解压进程单遍顺序输出全部成员（见 SolidStream），
+    多个归档之间的并行由批量任务的进程池提供。
+    """
+    support_types = RAR.support_types
+    magic = RAR.magic
+    index_format = "rar"
+    # 单遍解压时同时在写出的小文件批次数
+    solid_write_batches = 4
+
+    @staticmethod
+    def entry_of(file_info: rarfile.RarInfo):
+        return file_info.filename, file_info.file_size, file_info.CRC
+
+    def build_index(self, input_file: AsyncPath) -> List[IndexEntry]:
+        with rarfile.RarFile(input_file) as rar_file:
+            return [self.to_index(i) for i in rar_file.infolist()]
+
+    @staticmethod
+    def to_index(file_info: rarfile.RarInfo) -> IndexEntry:
+        return IndexEntry(file_info.filename, file_info.is_dir(), file_info.file_size, file_info.compress_size,
+                          file_info.CRC)
+
+    @staticmethod
+    def single_pass(rar_file: rarfile.RarFile) -> bool:
+        """固实归档与分卷归档单遍顺序解压；加密归档仍交给 rarfile 处理"""
+        return (rar_file.is_solid() or len(rar_file.volumelist()) > 1) and not rar_file.needs_password()
+
+    def iter_members(self, input_file, entries: Optional[List[IndexEntry]] = None) -> Iterator[ArchiveMember]:
+        with rarfile.RarFile(input_file) as rar_file:
+            if entries is not None:
+                entries.extend(self.to_index(i) for i in rar_file.infolist())
+            stream = SolidStream(rar_file) if self.single_pass(rar_file) else None
+            completed = False
+            try:
+                for file_info in rar_file.infolist():
+                    if not self.selected(file_info.filename):
+                        continue
+                    if file_info.mtime:
+                        mtime = file_info.mtime.timestamp()
+                    else:
+                        mtime = time.mktime(file_info.date_time + (0, 0, -1)) if file_info.date_time else 0
+                    # Windows 下打包的归档记录的是 DOS 属性，只保留带文件类型位的 Unix 权限
+                    mode = file_info.mode if file_info.mode and file_info.mode & 0o170000 else None
+                    open_member = partial(rar_file.open if stream is None or file_info.file_redir else stream.open,
+                                          file_info)
+                    yield ArchiveMember(file_info.filename, file_info.is_dir(), file_info.file_size, mtime, mode,
+                                        open_member)
+                completed = True
+            finally:
+                if stream is not None:
+                    stream.close(completed)
 
     async def extract_file(self, rar_file: rarfile.RarFile, file_info: rarfile.RarInfo,
                            input_dir: AsyncPath, output_dir: AsyncPath):
         target_path = output_dir / file_info.filename
-        if await target_path.exists():
+        nested_dir = await self.try_nested(partial(rar_file.open, file_info), output_dir, input_dir,
+                                           self.entry_of(file_info))
+        if nested_dir is not None:
+            await self.onupdate(input_dir, str(nested_dir))
+        elif await self.write_member(lambda: rar_file.open(file_info), target_path, input_dir,
+                                     self.entry_of(file_info), compress_size=file_info.compress_size):
             await self.onupdate(input_dir, str(target_path))
-            return
-        if file_info.is_dir():
-            await target_path.mkdir(exist_ok=True, parents=True)
-            await self.onupdate(input_dir, str(target_path))
-        else:
-            data = await self.read_file_data(rar_file, file_info)
-            if data:
-                await target_path.parent.mkdir(exist_ok=True, parents=True)
-                async with aiofiles.open(target_path, 'wb') as f:
-                    await f.write(data)
-                await self.onupdate(input_dir, str(target_path))
-
-    async def read_file_data(self, rar_file: rarfile.RarFile, file_info: rarfile.RarInfo):
-        def read_file():
-            try:
-                with rar_file.open(file_info) as f:
-                    data = f.read()
-                return data
-            except:
-                return None
 
-        return await asyncio.to_thread(read_file)
+    async def _flush_batch(self, batch: list, granted: int, input_file: AsyncPath):
+        try:
+            # 小文件数据读出前已预约内存预算
+            await self.write_batch(batch, input_file, reserve_size=0)
+        finally:
+            budget.release(granted)
+
+    async def _write_nested_data(self, data: bytes, file_info: rarfile.RarInfo, granted: int,
+                                 input_file: AsyncPath, output_dir: AsyncPath):
+        """嵌套归档已整体读出，无法解压时按普通文件写出"""
+        try:
+            nested_dir = await self.extract_nested(data, file_info.filename, output_dir, input_file,
+                                                   self.entry_of(file_info))
+            if nested_dir is not None:
+                await self.onupdate(input_file, str(nested_dir))
+                return
+            target_path = output_dir / file_info.filename
+            if await self.write_member(partial(BytesIO, data), target_path, input_file, self.entry_of(file_info)):
+                await self.onupdate(input_file, str(target_path))
+        finally:
+            self.nested_budget.release(granted)
+
+    async def _extract_single_pass(self, rar_file: rarfile.RarFile, info_list: List[rarfile.RarInfo],
+                                   input_file: AsyncPath, output_file: AsyncPath):
+        """
+        单遍顺序解压：成员按归档顺序从解压进程的输出中读出，小文件读入内存后成批写出，
+        写出与解压进程并行；大文件直接从输出流写入目标文件。
+        """
+        pending = set(id(i) for i in info_list)
+        # 链接等不在解压输出中的成员仍逐个交给 rarfile
+        others = [i for i in info_list if i.file_redir or not i.is_file()]
+        stream = await asyncio.to_thread(SolidStream, rar_file)
+        completed = False
+        try:
+            async with AioPool(size=self.solid_write_batches) as pool:
+                batch, granted = [], 0
+                for file_info in stream_members(rar_file):
+                    if id(file_info) not in pending:
+                        continue
+                    target_path = output_file / file_info.filename
+                    if self.match_nested(file_info.filename, file_info.file_size):
+                        nested = await self.nested_budget.acquire(file_info.file_size)
+                        try:
+                            data = await asyncio.to_thread(read_all, partial(stream.open, file_info))
+                        except Exception:
+                            self.nested_budget.release(nested)
+                            raise
+                        await pool.spawn(self._write_nested_data(data, file_info, nested, input_file, output_file))
+                    elif file_info.file_size <= self.small_file_size:
+                        granted += await budget.acquire(file_info.file_size)
+                        try:
+                            data = await asyncio.to_thread(read_all, partial(stream.open, file_info))
+                        except Exception:
+                            budget.release(granted)
+                            raise
+                        batch.append((partial(BytesIO, data), target_path, self.entry_of(file_info)))
+                        if len(batch) >= self.batch_size:
+                            await pool.spawn(self._flush_batch(batch, granted, input_file))
+                            batch, granted = [], 0
+                    else:
+                        name, size, crc = self.entry_of(file_info)
+                        # 输出流不能重复打开，去重时不走先按 CRC 找候选再读一遍比对的路径
+                        entry = (name, size, None if self.dedupable(size) else crc)
+                        if await self.write_member(partial(stream.open, file_info), target_path, input_file, entry,
+                                                   compress_size=file_info.compress_size):
+                            await self.onupdate(input_file, str(target_path))
+                if batch or granted:
+                    await pool.spawn(self._flush_batch(batch, granted, input_file))
+            completed = True
+        finally:
+            await asyncio.to_thread(stream.close, completed)
+        for file_info in others:
+            await self.extract_file(rar_file, file_info, input_file, output_file)
 
     async def extract(self, input_file: AsyncPath, output_file: AsyncPath):
         with rarfile.RarFile(input_file) as rar_file:
-            info_list = rar_file.infolist()
+            info_list = [i for i in rar_file.infolist() if self.selected(i.filename)]
             if self.onsuccess:
                 await self.onsuccess(input_file, len(info_list))
+            if self.onsuccess_bytes:
+                await self.onsuccess_bytes(input_file, sum(i.file_size for i in info_list if not i.is_dir()))
             await output_file.mkdir(exist_ok=True, parents=True)
-            async with AioPool(size=mp.cpu_count() * 10) as pool:
-                for file_info in info_list:
-                    # 提交任务到池中
-                    await pool.spawn(self.extract_file(rar_file, file_info, input_file, output_file))
-
+            async with self.journaling(output_file):
+                info_list = await self.plan_members(input_file, output_file, info_list,
+                                                    lambda i: (i.filename, i.is_dir(), i.file_size, i.CRC))
+                if info_list and self.single_pass(rar_file):
+                    await self._extract_single_pass(rar_file, info_list, input_file, output_file)
+                    return
+                batches, info_list = self.split_batches(info_list, lambda i: i.file_size, lambda i: i.filename)
+                async with AioPool(size=self.io_concurrency) as pool:
+                    for batch in batches:
+                        await pool.spawn(self.write_batch(
+                            [(partial(rar_file.open, i), output_file / i.filename, self.entry_of(i)) for i in batch],
+                            input_file
+                        ))
+                    for file_info in info_list:
+                        # 提交任务到池中
+                        await pool.spawn(self.extract_file(rar_file, file_info, input_file, output_file))
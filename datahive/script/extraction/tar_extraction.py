@@ -11,77 +11,686 @@ Change Log  :
 
 """
 import asyncio
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
 import multiprocessing as mp
+import os
+import posixpath
+import queue
+import shutil
 import tarfile
 import threading
+import time
+from functools import partial
+from io import BytesIO
+from typing import BinaryIO, Iterator, List, Optional
 
-import aiofiles
 from aiopath import AsyncPath
-from asyncio_pool import AioPool
 
-from datahive.script.extraction.base_extraction import ExtractionStrategy
+from datahive.script.extraction._formats import TAR, TAR_BZ2, TAR_GZ, TAR_XZ, TAR_ZST
+from datahive.script.extraction._index import ArchiveIndex, IndexEntry
+from datahive.script.extraction._planner import ExtractionPlan, normalize_name
+from datahive.script.extraction._seekable import BZIP2, GZIP, XZ, SeekableStream, detect_format, format_of
+from datahive.script.extraction._zstd import ZstdFrameReader
+from datahive.script.extraction.base_extraction import ArchiveMember, ExtractionStrategy, to_part_path, discard
+from datahive.utils.async_util import run_in_thread
+from datahive.utils.budget_util import MemoryBudget, budget
+from datahive.utils.io_util import ZERO_COPY
+from datahive.utils.metrics_util import metrics
+
+# 解压线程发往写出协程的消息类型
+_MEMBER = 0
+_DATA = 1
+_END = 2
+_COPY = 3
+_SMALL = 4
+_SEEK = 5
+_NESTED = 6
+_LINK = 7
+
+# 常见压缩格式的文件头，均不匹配时视为未压缩的 tar
+_COMPRESSED_MAGIC = (b"\x1f\x8b", b"BZh", b"\xfd7zXZ\x00", b"\x28\xb5\x2f\xfd")
+
+
+def is_plain_tar(input_file) -> bool:
+    with open(input_file, 'rb') as f:
+        head = f.read(6)
+    return not head.startswith(_COMPRESSED_MAGIC)
+
+
+def _peek(fileobj: BinaryIO, n: int) -> bytes:
+    """读取数据流开头的 n 个字节而不消耗它们"""
+    if hasattr(fileobj, "peek"):
+        return fileobj.peek(n)[:n]
+    position = fileobj.tell()
+    head = fileobj.read(n)
+    fileobj.seek(position)
+    return head
+
+
+def open_decompressed(fileobj: BinaryIO) -> BinaryIO:
+    """
+    按文件头把数据流包装为解压流，未压缩时原样返回。
+    gzip 的多个成员（bgzip、pigz -i 或直接拼接）与 bz2、xz 的多个流（pbzip2、分块压缩）依次全部解压，
+    tarfile 流模式自带的解压只读到第一个成员（流）为止。包装流关闭时不关闭 fileobj。
+    """
+    fmt = format_of(_peek(fileobj, 6))
+    if fmt == GZIP:
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if fmt == BZIP2:
+        return bz2.BZ2File(fileobj)
+    if fmt == XZ:
+        return lzma.LZMAFile(fileobj)
+    return fileobj
+
+
+def extractable(file_info: tarfile.TarInfo) -> bool:
+    """目录、普通文件与链接会被解压，设备文件、FIFO 等跳过"""
+    return file_info.isdir() or file_info.isreg() or file_info.issym() or file_info.islnk()
+
+
+def _within(root: str, path: str) -> bool:
+    return path == root or path.startswith(root + os.sep)
+
+
+def link_source(output_dir, file_info: tarfile.TarInfo) -> str:
+    """
+    校验链接成员并返回写入的链接目标：符号链接为相对于成员所在目录的路径，硬链接为已解压的目标文件路径。
+    绝对路径的目标，以及解析已解压的符号链接后位于输出目录之外的成员或目标均不予创建。
+    """
+    root = os.path.realpath(output_dir)
+    name = normalize_name(file_info.name)
+    linkname = file_info.linkname.replace("\\", "/")
+    parent = os.path.realpath(os.path.join(root, posixpath.dirname(name)))
+    if not name or not linkname or posixpath.isabs(linkname) or not _within(root, parent):
+        raise ValueError(f"不安全的链接 -> {file_info.linkname}")
+    if file_info.issym():
+        # 去掉中间的 ..，避免其经过之后才创建的符号链接改变指向
+        source = posixpath.normpath(linkname)
+        resolved = os.path.realpath(os.path.join(parent, source))
+    else:
+        source = resolved = os.path.realpath(os.path.join(root, normalize_name(linkname)))
+    if not _within(root, resolved):
+        raise ValueError(f"链接目标位于输出目录之外 -> {file_info.linkname}")
+    return source
+
+
+class _StreamTarFile(tarfile.TarFile):
+    """tarfile 不会关闭外部传入的数据流，由本工具打开的解压流与文件随 TarFile 一起关闭"""
+    sources: tuple = ()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for source in self.sources:
+                source.close()
+
+
+class _Pipeline:
+    """解压线程与写出协程之间的通道，缓冲区与小文件名额用于反压"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, buffer_count: int, buffer_size: int, small_slots: int,
+                 use_budget: bool = True):
+        self.loop = loop
+        # 嵌套归档的流水线不预约全局内存预算（见 ExtractionStrategy.reserve）
+        self.use_budget = use_budget
+        self.channel = asyncio.Queue()
+        self.free = queue.Queue()
+        for _ in range(buffer_count):
+            self.free.put(bytearray(buffer_size))
+        self.small_slots = threading.Semaphore(small_slots)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def send(self, *item):
+        self.loop.call_soon_threadsafe(self.channel.put_nowait, item)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.channel.put_nowait, None)
+
+    def take_buffer(self) -> Optional[bytearray]:
+        """等待空闲缓冲区，流水线停止时返回 None"""
+        while not self.stop.is_set():
+            try:
+                return self.free.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def take_small_slot(self, nbytes: int) -> Optional[int]:
+        """等待小文件名额并预约内存预算，返回预约的字节数，流水线停止时返回 None"""
+        while not self.stop.is_set():
+            if self.small_slots.acquire(timeout=0.1):
+                break
+        else:
+            return None
+        if budget.limit is None or not self.use_budget:
+            nbytes = 0
+        else:
+            nbytes = min(nbytes, budget.limit)
+            while not budget.try_acquire(nbytes):
+                # 本流水线没有在途的小文件时不再等待，避免与整体预约的缓冲区互相等待
+                with self._lock:
+                    if self._in_flight == 0:
+                        nbytes = 0
+                        break
+                if self.stop.is_set():
+                    self.small_slots.release()
+                    return None
+                time.sleep(budget.poll_interval)
+        with self._lock:
+            self._in_flight += 1
+        return nbytes
+
+    def take_nested(self, nested_budget: MemoryBudget, nbytes: int) -> bool:
+        """等待嵌套归档的内存额度，流水线停止时返回 False"""
+        while not nested_budget.try_acquire(nbytes):
+            if self.stop.is_set():
+                return False
+            time.sleep(budget.poll_interval)
+        return True
+
+    def release_small_slot(self, nbytes: int):
+        with self._lock:
+            self._in_flight -= 1
+        self.small_slots.release()
+        budget.release(nbytes)
 
 
 class TarExtractionStrategy(ExtractionStrategy):
-    support_types = [".tar.bz2", ".tar.xz"]
+    """
+    单遍顺序解压：压缩流只从头到尾解压一次，
+    解压线程按成员顺序读出数据，经队列交给写出协程落盘。
+
+    指定 include 且已有成员索引时改为选择性解压：按索引中的偏移只读取选中的成员，
+    压缩归档从目标之前最近的检查点开始解压（见 _seekable），无需解压整个归档。
+    """
+    support_types = TAR_BZ2.support_types + TAR_XZ.support_types + TAR.support_types
+    magic = TAR_BZ2.magic + TAR_XZ.magic + TAR.magic
+    index_format = "tar"
+    streamable = True
+    # 解压线程与写出协程之间流转的缓冲区数量
+    buffer_count = 8
+    # gzip 检查点的间隔（压缩数据字节数）
+    checkpoint_interval = 16 * 1024 * 1024
+
+    def open_archive(self, input_file: AsyncPath, plain: bool = False,
+                     fileobj: Optional[io.BufferedReader] = None) -> tarfile.TarFile:
+        """压缩归档以流模式打开，只允许向前读取；未压缩归档可随机访问"""
+        if plain and fileobj is None:
+            return tarfile.open(input_file, 'r:')
+        source = open(input_file, 'rb') if fileobj is None else fileobj
+        stream = None
+        try:
+            stream = open_decompressed(source)
+            tar_file = _StreamTarFile.open(fileobj=stream, mode='r|')
+        except Exception:
+            if stream is not None and stream is not source:
+                stream.close()
+            if fileobj is None:
+                source.close()
+            raise
+        # 外部传入的数据流由调用方关闭
+        tar_file.sources = tuple(s for s in (stream, source) if s is not fileobj)
+        return tar_file
+
+    def is_plain(self, input_file: AsyncPath) -> bool:
+        """是否为未压缩的 tar，未压缩时可按偏移随机访问与零拷贝复制"""
+        return is_plain_tar(input_file)
+
+    @staticmethod
+    def to_index(file_info: tarfile.TarInfo) -> IndexEntry:
+        """偏移均为解压后数据流中的位置"""
+        return IndexEntry(file_info.name, file_info.isdir(), file_info.size, None, None,
+                          file_info.offset, file_info.offset_data,
+                          [file_info.type.decode("latin-1"), file_info.mode, file_info.mtime,
+                           file_info.linkname, file_info.sparse])
+
+    @staticmethod
+    def from_index(entry: IndexEntry) -> tarfile.TarInfo:
+        file_info = tarfile.TarInfo(entry.name)
+        file_info.size = entry.size
+        file_info.offset = entry.offset
+        file_info.offset_data = entry.data_offset
+        type_, file_info.mode, file_info.mtime, file_info.linkname, sparse = entry.meta
+        file_info.type = type_.encode("latin-1")
+        file_info.sparse = None if sparse is None else [tuple(region) for region in sparse]
+        return file_info
+
+    def build_index(self, input_file: AsyncPath) -> List[IndexEntry]:
+        with self.open_archive(input_file, self.is_plain(input_file)) as tar_file:
+            return [self.to_index(file_info) for file_info in tar_file]
 
-    def __init__(self):
+    def iter_members(self, input_file, entries: Optional[List[IndexEntry]] = None) -> Iterator[ArchiveMember]:
+        """流模式顺序读取，只产出目录与普通文件；链接无法以成员数据流表示，记为失败，设备文件跳过"""
+        with self.open_archive(input_file) as tar_file:
+            for file_info in tar_file:
+                if entries is not None:
+                    entries.append(self.to_index(file_info))
+                if not (file_info.isdir() or file_info.isreg()) or not self.selected(file_info.name):
+                    if (file_info.issym() or file_info.islnk()) and self.selected(file_info.name):
+                        self.fail(file_info.name, ValueError(f"不支持转换链接成员 -> {file_info.linkname}"))
+                    continue
+                yield ArchiveMember(file_info.name, file_info.isdir(), file_info.size, file_info.mtime,
+                                    file_info.mode, partial(tar_file.extractfile, file_info))
 
-        super().__init__()
-        self.lock = threading.Lock()
+    @staticmethod
+    def _read_member(tar_file: tarfile.TarFile, file_info: tarfile.TarInfo) -> bytes:
+        """整体读出小文件或嵌套归档的数据"""
+        start = metrics.clock()
+        data = tar_file.extractfile(file_info).read()
+        metrics.observe("decompress", start, len(data))
+        return data
 
-    async def extract_file(self, tar_file: tarfile.TarFile, file_info: tarfile.TarInfo,
-                           input_dir: AsyncPath, output_dir: AsyncPath):
+    def _read_stream(self, input_file: AsyncPath, plain: bool, pipeline: _Pipeline,
+                     entries: Optional[List[IndexEntry]] = None, fileobj: Optional[BinaryIO] = None) -> bool:
+        """
+        解压线程：顺序遍历成员，把数据读入空闲缓冲区后发给写出协程。
+        小文件整体读出后发送，由写出协程成批写出；
+        未压缩归档中的普通文件只发送偏移量，由写出协程在内核中直接复制；
+        GNU 稀疏成员只读出数据段，空洞由写出协程 seek 跳过；
+        递归解压时嵌套归档整体读出后发送，由写出协程交给对应策略解压；
+        链接只发送成员信息，由写出协程校验后创建。
+
+        :param entries: 不为 None 时顺带收集全部成员的索引，gzip 归档同时记录检查点
+        :param fileobj: 从该数据流而不是 input_file 读取归档
+        :return: 是否完整遍历了归档
+        """
+        stream = None
+        try:
+            if fileobj is None and entries is not None and not plain and detect_format(input_file) == GZIP:
+                stream = SeekableStream(input_file, self.checkpoint_interval)
+                fileobj = io.BufferedReader(stream, self.chunk_size)
+            with self.open_archive(input_file, plain, fileobj) as tar_file:
+                for file_info in tar_file:
+                    if pipeline.stop.is_set():
+                        return False
+                    if entries is not None:
+                        entries.append(self.to_index(file_info))
+                    if not extractable(file_info) or not self.selected(file_info.name):
+                        continue
+                    if file_info.issym() or file_info.islnk():
+                        pipeline.send(_LINK, file_info)
+                        continue
+                    if file_info.isreg() and not file_info.issparse():
+                        if self.match_nested(file_info.name, file_info.size):
+                            if not pipeline.take_nested(self.nested_budget, file_info.size):
+                                return False
+                            pipeline.send(_NESTED, file_info, self._read_member(tar_file, file_info))
+                            continue
+                        if file_info.size <= self.small_file_size:
+                            reserved = pipeline.take_small_slot(file_info.size)
+                            if reserved is None:
+                                return False
+                            pipeline.send(_SMALL, file_info, self._read_member(tar_file, file_info), reserved)
+                            continue
+                        if plain and not self.dedupable(file_info.size):
+                            pipeline.send(_COPY, file_info)
+                            continue
+                    pipeline.send(_MEMBER, file_info)
+                    if file_info.isreg():
+                        member = tar_file.extractfile(file_info)
+                        sparse = file_info.issparse()
+                        if sparse:
+                            # 流模式下带缓冲的成员对象不支持 seek，直接使用底层按稀疏映射定位的原始流
+                            member = member.raw
+                        for offset, size in file_info.sparse if sparse else [(0, file_info.size)]:
+                            if sparse:
+                                member.seek(offset)
+                                pipeline.send(_SEEK, offset)
+                            while size > 0:
+                                buffer = pipeline.take_buffer()
+                                if buffer is None:
+                                    return False
+                                start = metrics.clock()
+                                n = member.readinto(memoryview(buffer)[:size])
+                                metrics.observe("decompress", start, n or 0)
+                                if not n:
+                                    pipeline.free.put(buffer)
+                                    break
+                                pipeline.send(_DATA, buffer, n)
+                                size -= n
+                    pipeline.send(_END, file_info)
+            return True
+        finally:
+            if stream is not None:
+                stream.close()
+            pipeline.close()
+
+    async def _flush_batch(self, input_file: AsyncPath, batch: list, reserved: list, pipeline: _Pipeline):
+        try:
+            # 小文件数据与缓冲区均已预约
+            await self.write_batch(batch, input_file, reserve_size=0)
+        finally:
+            for nbytes in reserved:
+                pipeline.release_small_slot(nbytes)
+            batch.clear()
+            reserved.clear()
+
+    async def _write_nested(self, input_file: AsyncPath, output_dir: AsyncPath, plan: ExtractionPlan,
+                            file_info: tarfile.TarInfo, data: bytes):
         target_path = output_dir / file_info.name
-        if await target_path.exists():
-            await self.onupdate(input_dir, str(target_path))
+        entry = (file_info.name, file_info.size, None)
+        if self.is_done(plan, file_info.name, file_info.size):
+            await self.skip_member(input_file, target_path, file_info.size)
+            return
+        nested_dir = await self.extract_nested(data, file_info.name, output_dir, input_file, entry)
+        if nested_dir is not None:
+            await self.onupdate(input_file, str(nested_dir))
             return
-        if file_info.isdir():
-            await target_path.mkdir(exist_ok=True, parents=True)
-            await self.onupdate(input_dir, str(target_path))
+        # 无法作为归档解压，按普通文件写出；数据已在内存中，流水线也已持有预算，不再预约
+        if not plan.has_parent(file_info.name):
+            await asyncio.to_thread(plan.ensure_parent, file_info.name)
+        await self.write_batch([(partial(BytesIO, data), target_path, entry)], input_file, reserve_size=0)
+
+    def make_link(self, output_dir: AsyncPath, target_path: AsyncPath, file_info: tarfile.TarInfo):
+        """创建符号链接或硬链接（硬链接失败时复制目标文件），先建在临时路径再原子重命名"""
+        source = link_source(output_dir, file_info)
+        part_path = to_part_path(target_path)
+        discard(part_path)
+        if file_info.issym():
+            os.symlink(source, part_path)
         else:
-            data = await self.read_file_data(tar_file, file_info)
-            if data:
-                await target_path.parent.mkdir(exist_ok=True, parents=True)
-                async with aiofiles.open(target_path, 'wb') as f:
-                    await f.write(data)
-                await self.onupdate(input_dir, str(target_path))
-
-    async def read_file_data(self, tar_file: tarfile.TarFile, file_info: tarfile.TarInfo):
-        def read_file():
-            with self.lock:
-                try:
-                    with tar_file.extractfile(file_info) as file:
-                        data = file.read()
-                        return data
-                except:
-                    return None
+            try:
+                os.link(source, part_path)
+            except OSError:
+                if not os.path.isfile(source):
+                    raise
+                shutil.copy2(source, part_path)
+        try:
+            self.commit(part_path, target_path, (file_info.name, 0, None))
+        except BaseException:
+            discard(part_path)
+            raise
 
+    async def _write_link(self, input_file: AsyncPath, output_dir: AsyncPath, file_info: tarfile.TarInfo):
+        """链接成员在其之前的成员全部写出后创建，硬链接的目标此时已经存在"""
+        target_path = output_dir / file_info.name
+        try:
+            await asyncio.to_thread(self.make_link, output_dir, target_path, file_info)
+        except (OSError, ValueError) as e:
+            self.fail(file_info.name, e)
+            return
+        await self.onupdate(input_file, str(target_path))
+
+    async def _write_stream(self, input_file: AsyncPath, output_dir: AsyncPath, src_fd: Optional[int],
+                            pipeline: _Pipeline):
+        """写出协程：按消息顺序创建目录、写入文件数据"""
+        # 流模式下无法预知成员列表，只预先扫描已有文件（续解时以日志为准），目录按需创建并缓存
+        plan = await asyncio.to_thread(ExtractionPlan.build, output_dir, (), not self.resume)
+        channel = pipeline.channel
+        target_path = part_path = dst = hasher = member_name = None
+        batch, reserved = [], []
+        try:
+            while True:
+                item = await channel.get()
+                metrics.set("queue.pipeline", channel.qsize())
+                if item is None:
+                    break
+                kind = item[0]
+                if kind == _SMALL:
+                    _, file_info, data, nbytes = item
+                    target_path = output_dir / file_info.name
+                    if self.is_done(plan, file_info.name, file_info.size):
+                        pipeline.release_small_slot(nbytes)
+                        await self.skip_member(input_file, target_path, file_info.size)
+                    else:
+                        if not plan.has_parent(file_info.name):
+                            await asyncio.to_thread(plan.ensure_parent, file_info.name)
+                        batch.append((partial(BytesIO, data), target_path, (file_info.name, file_info.size, None)))
+                        reserved.append(nbytes)
+                    # 攒满一批或暂无后续消息时写出
+                    if batch and (len(batch) >= self.batch_size or channel.empty()):
+                        await self._flush_batch(input_file, batch, reserved, pipeline)
+                    continue
+                if batch:
+                    await self._flush_batch(input_file, batch, reserved, pipeline)
+                if kind == _NESTED:
+                    _, file_info, data = item
+                    try:
+                        await self._write_nested(input_file, output_dir, plan, file_info, data)
+                    finally:
+                        self.nested_budget.release(file_info.size)
+                elif kind == _LINK:
+                    file_info: tarfile.TarInfo = item[1]
+                    if self.is_done(plan, file_info.name, 0):
+                        await self.skip_member(input_file, output_dir / file_info.name, 0)
+                        continue
+                    if not plan.has_parent(file_info.name):
+                        await asyncio.to_thread(plan.ensure_parent, file_info.name)
+                    await self._write_link(input_file, output_dir, file_info)
+                elif kind == _COPY:
+                    file_info: tarfile.TarInfo = item[1]
+                    target_path = output_dir / file_info.name
+                    if self.is_done(plan, file_info.name, file_info.size):
+                        await self.skip_member(input_file, target_path, file_info.size)
+                        continue
+                    if not plan.has_parent(file_info.name):
+                        await asyncio.to_thread(plan.ensure_parent, file_info.name)
+                    if await self.copy_member(src_fd, file_info.offset_data, file_info.size, target_path,
+                                              input_file, (file_info.name, file_info.size, None)):
+                        await self.onupdate(input_file, str(target_path))
+                elif kind == _DATA:
+                    _, buffer, n = item
+                    try:
+                        if dst is not None:
+                            await asyncio.to_thread(self.write_buffer, dst, buffer, n, hasher)
+                            await self.onupdate_bytes(input_file, n)
+                    except OSError as e:
+                        self.fail(member_name, e)
+                        dst.close()
+                        dst = None
+                        await asyncio.to_thread(discard, part_path)
+                    finally:
+                        pipeline.free.put(buffer)
+                elif kind == _MEMBER:
+                    file_info: tarfile.TarInfo = item[1]
+                    target_path = output_dir / file_info.name
+                    member_name = file_info.name
+                    if file_info.isdir():
+                        await asyncio.to_thread(plan.make_dirs, [(file_info.name, True)])
+                    elif self.is_done(plan, file_info.name, file_info.size):
+                        target_path = None
+                    else:
+                        if not plan.has_parent(file_info.name):
+                            await asyncio.to_thread(plan.ensure_parent, file_info.name)
+                        part_path = to_part_path(target_path)
+                        # tar 没有 CRC，去重模式下边写边计算 SHA-256，写完后再查重
+                        hasher = hashlib.sha256() if self.dedupable(file_info.size) else None
+                        try:
+                            # 稀疏成员不预分配，保留空洞
+                            dst = await asyncio.to_thread(self.open_target, part_path,
+                                                          None if file_info.issparse() else file_info.size)
+                        except OSError as e:
+                            self.fail(member_name, e)
+                            dst = None
+                elif kind == _SEEK:
+                    if dst is not None:
+                        await asyncio.to_thread(dst.seek, item[1])
+                else:
+                    file_info: tarfile.TarInfo = item[1]
+                    if dst is not None:
+                        # close_target 无论成败都会关闭文件
+                        closing, dst = dst, None
+                        try:
+                            await asyncio.to_thread(self.close_target, closing, file_info.size)
+                            await asyncio.to_thread(self.commit, part_path, target_path,
+                                                    (file_info.name, file_info.size, None),
+                                                    None if hasher is None else hasher.hexdigest())
+                        except OSError as e:
+                            self.fail(member_name, e)
+                            await asyncio.to_thread(discard, part_path)
+                            continue
+                        except BaseException:
+                            discard(part_path)
+                            raise
+                        await self.onupdate(input_file, str(target_path))
+                    elif file_info.isdir() or target_path is None:
+                        await self.skip_member(input_file, output_dir / file_info.name,
+                                               0 if file_info.isdir() else file_info.size)
+            if batch:
+                await self._flush_batch(input_file, batch, reserved, pipeline)
+        finally:
+            metrics.set("queue.pipeline", 0)
+            if dst is not None:
+                dst.close()
+                discard(part_path)
+
+    def open_seekable(self, input_file: AsyncPath, plain: bool) -> tarfile.TarFile:
+        """随机访问打开归档，压缩归档从检查点开始解压所需的片段"""
+        if plain:
+            return tarfile.open(input_file, 'r:')
+        stream = io.BufferedReader(SeekableStream(input_file, self.checkpoint_interval), self.chunk_size)
+        try:
+            return tarfile.open(fileobj=stream, mode='r:')
+        except Exception:
+            stream.close()
+            raise
+
+    @staticmethod
+    def close_seekable(tar_file: tarfile.TarFile):
+        """外部传入的数据流不随 TarFile 关闭，需单独关闭以保存新记录的检查点"""
+        stream = tar_file.fileobj
+        tar_file.close()
+        stream.close()
 
-        return await asyncio.to_thread(read_file)
+    async def _extract_selected(self, input_file: AsyncPath, output_file: AsyncPath, index: ArchiveIndex):
+        """按索引只读取 include 选中的成员，成员按偏移顺序读取，压缩流只向前解压"""
+        infos = [self.from_index(entry) for entry in index.entries if self.selected(entry.name)]
+        infos = [i for i in infos if extractable(i)]
+        await self.onsuccess(input_file, len(infos))
+        await self.onsuccess_bytes(input_file, sum(i.size for i in infos if i.isreg()))
+        await output_file.mkdir(exist_ok=True, parents=True)
+        async with self.journaling(output_file):
+            infos = await self.plan_members(input_file, output_file, infos,
+                                            lambda i: (i.name, i.isdir(), i.size, None))
+            if not infos:
+                return
+            infos.sort(key=lambda i: i.offset_data)
+            plain = await asyncio.to_thread(self.is_plain, input_file)
+            src_fd = await asyncio.to_thread(os.open, input_file, os.O_RDONLY) if plain and ZERO_COPY else None
+            tar_file = await asyncio.to_thread(self.open_seekable, input_file, plain)
+            try:
+                for file_info in infos:
+                    target_path = output_file / file_info.name
+                    if file_info.issym() or file_info.islnk():
+                        # 硬链接的目标未被选中时没有可链接的文件，记为失败
+                        await self._write_link(input_file, output_file, file_info)
+                        continue
+                    entry = (file_info.name, file_info.size, None)
+                    nested_dir = await self.try_nested(partial(tar_file.extractfile, file_info), output_file,
+                                                       input_file, entry)
+                    if nested_dir is not None:
+                        await self.onupdate(input_file, str(nested_dir))
+                        continue
+                    if src_fd is not None and not file_info.issparse() and not self.dedupable(file_info.size):
+                        done = await self.copy_member(src_fd, file_info.offset_data, file_info.size, target_path,
+                                                      input_file, entry)
+                    else:
+                        # 成员共用同一个解压流，逐个顺序写出
+                        done = await self.write_member(partial(tar_file.extractfile, file_info), target_path,
+                                                       input_file, entry)
+                    if done:
+                        await self.onupdate(input_file, str(target_path))
+            finally:
+                await asyncio.to_thread(self.close_seekable, tar_file)
+                if src_fd is not None:
+                    os.close(src_fd)
 
     async def extract(self, input_file: AsyncPath, output_file: AsyncPath):
-        with tarfile.open(input_file, 'r:*') as tar_file:
-            info_list = tar_file.getmembers()
-            if self.onsuccess:
-                await self.onsuccess(input_file, len(info_list))
-            await output_file.mkdir(exist_ok=True, parents=True)
-            async with AioPool(size=mp.cpu_count() * 10) as pool:
-                for file_info in info_list:
-                    # 提交任务到池中
-                    await pool.spawn(self.extract_file(tar_file, file_info, input_file, output_file))
+        # 流模式下成员总数需读完整个归档才能得知，已有索引时可以直接给出
+        index = await self.load_index(input_file)
+        if index is not None and self.include:
+            await self._extract_selected(input_file, output_file, index)
+            return
+        if index is None:
+            entries, total, total_bytes = [], None, None
+        else:
+            entries = None
+            selected = [entry for entry in index.entries
+                        if extractable(self.from_index(entry)) and self.selected(entry.name)]
+            total = len(selected)
+            total_bytes = sum(entry.size for entry in selected if self.from_index(entry).isreg())
+        await self.onsuccess(input_file, total)
+        await self.onsuccess_bytes(input_file, total_bytes)
+        await output_file.mkdir(exist_ok=True, parents=True)
+        plain = ZERO_COPY and await asyncio.to_thread(self.is_plain, input_file)
+        async with self.journaling(output_file):
+            completed = await self._run_pipeline(input_file, output_file, plain, entries)
+        if completed and entries is not None:
+            await self.save_index(input_file, entries)
+
+    async def extract_stream(self, fileobj: BinaryIO, input_file: AsyncPath, output_file: AsyncPath):
+        await output_file.mkdir(exist_ok=True, parents=True)
+        await self._run_pipeline(input_file, output_file, False, fileobj=fileobj)
+
+    async def _run_pipeline(self, input_file: AsyncPath, output_file: AsyncPath, plain: bool,
+                            entries: Optional[List[IndexEntry]] = None, fileobj: Optional[BinaryIO] = None) -> bool:
+        """启动解压线程与写出协程，返回是否完整遍历了归档"""
+        pipeline = _Pipeline(asyncio.get_running_loop(), self.buffer_count, self.chunk_size, self.batch_size * 2,
+                             not self.nested)
+        src_fd = await asyncio.to_thread(os.open, input_file, os.O_RDONLY) if plain else None
+        # 流水线中循环使用的缓冲区整体预约；嵌套归档不再预约，避免与外层持有的额度互相等待
+        async with self.reserve(self.buffer_count * self.chunk_size):
+            # 解压线程在整个归档读完前一直阻塞，使用独立线程，默认线程池留给写出协程
+            reader = run_in_thread(self._read_stream, input_file, plain, pipeline, entries, fileobj,
+                                   name="tar-reader")
+            try:
+                await self._write_stream(input_file, output_file, src_fd, pipeline)
+            finally:
+                pipeline.stop.set()
+                completed = await reader
+                if src_fd is not None:
+                    os.close(src_fd)
+        return completed
 
 
 class TarGzExtractionStrategy(TarExtractionStrategy):
-    support_types = [".tar.gz"]
+    support_types = TAR_GZ.support_types
+    magic = TAR_GZ.magic
 
     async def extract(self, input_file: AsyncPath, output_file: AsyncPath):
         output_file = output_file.with_suffix('')
-        with tarfile.open(input_file, 'r:gz') as tar_file:
-            info_list = tar_file.getmembers()
-            await self.onsuccess(input_file, len(info_list))
-            await output_file.mkdir(exist_ok=True, parents=True)
-            async with AioPool(size=mp.cpu_count() * 10) as pool:
-                for file_info in info_list:
-                    # 提交任务到池中
-                    await pool.spawn(self.extract_file(tar_file, file_info, input_file, output_file))
+        await super().extract(input_file, output_file)
+
+
+class TarZstExtractionStrategy(TarExtractionStrategy):
+    """
+    zstd 压缩的 tar：标准库 tarfile 不支持 zstd，由 ZstdFrameReader 解压后以流模式交给 tarfile。
+    多帧归档（pzstd、本工具 convert 写出的 .tar.zst）中各帧相互独立，按 max_workers 并行解压。
+    选择性解压没有检查点，从头向前解压到选中的成员。
+    """
+    support_types = TAR_ZST.support_types
+    magic = TAR_ZST.magic
+
+    def open_archive(self, input_file: AsyncPath, plain: bool = False,
+                     fileobj: Optional[io.BufferedReader] = None) -> tarfile.TarFile:
+        source = open(input_file, 'rb') if fileobj is None else fileobj
+        workers = min(self.max_workers, mp.cpu_count())
+        try:
+            stream = io.BufferedReader(ZstdFrameReader(source, workers, close_source=fileobj is None),
+                                       self.chunk_size)
+        except Exception:
+            if fileobj is None:
+                source.close()
+            raise
+        try:
+            tar_file = _StreamTarFile.open(fileobj=stream, mode='r|')
+        except Exception:
+            stream.close()
+            raise
+        tar_file.sources = (stream,)
+        return tar_file
+
+    def is_plain(self, input_file: AsyncPath) -> bool:
+        # 开头可能是 zstd 的可跳过帧，不能按文件头判断
+        return False
+
+    def open_seekable(self, input_file: AsyncPath, plain: bool) -> tarfile.TarFile:
+        # 成员已按偏移排序，流模式下向前跳过未选中的数据即可
+        return self.open_archive(input_file)
@@ -11,60 +11,311 @@ Change Log  :
 
 """
 import asyncio
+import heapq
 import multiprocessing as mp
+import queue
+import time
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
 
-import aiofiles
 from aiopath import AsyncPath
 from asyncio_pool import AioPool
 
-from datahive.script.extraction.base_extraction import ExtractionStrategy
+from datahive.script.extraction._dedup import dedup
+from datahive.script.extraction._formats import ZIP
+from datahive.script.extraction._index import IndexEntry
+from datahive.script.extraction._journal import ExtractionJournal
+from datahive.script.extraction._zip_reader import PreadZipReader, open_member
+from datahive.script.extraction.base_extraction import ArchiveMember, ExtractionStrategy
+from datahive.utils.async_util import run_new_loop
+from datahive.utils.budget_util import budget
+from datahive.utils.io_util import ZERO_COPY
+from datahive.utils.metrics_util import metrics
+
+# 分片进程发往主进程的进度消息类型
+_UPDATE = 0
+_BYTES = 1
+_DONE = 2
+# 分片进程发送字节数进度的最小间隔（秒）
+_BYTES_INTERVAL = 0.2
+
+# 分片进程内的进度通道，由进程池 initializer 注入
+_shard_channel: Optional[mp.Queue] = None
+
+
+def split_shards(info_list: List[zipfile.ZipInfo], count: int) -> List[List[zipfile.ZipInfo]]:
+    """
+    按压缩大小把成员均衡切分为至多 count 个分片（最长处理时间优先）。
+    分片内按归档偏移排序，保证每个进程顺序读盘。
+    """
+    shards = [[] for _ in range(count)]
+    loads = [(0, index) for index in range(count)]
+    for file_info in sorted(info_list, key=lambda i: i.compress_size, reverse=True):
+        load, index = heapq.heappop(loads)
+        shards[index].append(file_info)
+        heapq.heappush(loads, (load + file_info.compress_size, index))
+    return [sorted(shard, key=lambda i: i.header_offset) for shard in shards if shard]
+
+
+def split_units(info_list: List[zipfile.ZipInfo], unit_size: int) -> List[List[zipfile.ZipInfo]]:
+    """按归档偏移顺序把成员切分为压缩大小约为 unit_size 的连续单元，单元内顺序读盘"""
+    units, unit, load = [], [], 0
+    for file_info in sorted(info_list, key=lambda i: i.header_offset):
+        unit.append(file_info)
+        load += file_info.compress_size
+        if load >= unit_size:
+            units.append(unit)
+            unit, load = [], 0
+    if unit:
+        units.append(unit)
+    return units
+
+
+def _init_shard_worker(channel: mp.Queue, budget_state, dedup_state, metrics_state):
+    global _shard_channel
+    _shard_channel = channel
+    budget.attach(budget_state)
+    dedup.attach(dedup_state)
+    metrics.attach(metrics_state)
+
+
+def _drain_channel(channel: mp.Queue, timeout: float = 0.2, limit: int = 1024) -> list:
+    """阻塞等待第一条消息，随后一次性取走已到达的消息"""
+    messages = [channel.get(timeout=timeout)]
+    try:
+        while len(messages) < limit:
+            messages.append(channel.get_nowait())
+    except queue.Empty:
+        pass
+    return messages
+
+
+async def _extract_shard_async(input_file: str, output_file: str, info_list: List[zipfile.ZipInfo],
+                               recursive: int, nested_max_size: int):
+    # 写入的字节数在分片内累计，按间隔合并为一条消息，不必每写一块数据就发送一次
+    pending_bytes, sent_at = 0, time.monotonic()
+
+    async def onupdate(input_path: AsyncPath, f: str):
+        _shard_channel.put((_UPDATE, f))
+
+    async def onupdate_bytes(input_path: AsyncPath, n: int):
+        nonlocal pending_bytes, sent_at
+        pending_bytes += n
+        if time.monotonic() - sent_at >= _BYTES_INTERVAL:
+            _shard_channel.put((_BYTES, pending_bytes))
+            pending_bytes, sent_at = 0, time.monotonic()
+
+    strategy = ZipExtractionStrategy()
+    strategy.onupdate = onupdate
+    strategy.onupdate_bytes = onupdate_bytes
+    strategy.recursive = recursive
+    strategy.nested_max_size = nested_max_size
+    try:
+        await strategy.extract_unit(AsyncPath(input_file), AsyncPath(output_file), info_list)
+    finally:
+        if pending_bytes:
+            _shard_channel.put((_BYTES, pending_bytes))
+    return strategy.failures
+
+
+def _extract_shard(input_file: str, output_file: str, info_list: List[zipfile.ZipInfo], shard_id: int,
+                   recursive: int = 0, nested_max_size: int = ExtractionStrategy.nested_max_size
+                   ) -> List[Tuple[str, str]]:
+    """分片进程入口：用独立的文件句柄解压分配到的成员，返回解压失败的成员"""
+    try:
+        return run_new_loop(_extract_shard_async, input_file, output_file, info_list, recursive, nested_max_size)
+    finally:
+        _shard_channel.put((_DONE, shard_id))
 
 
 class ZipExtractionStrategy(ExtractionStrategy):
-    support_types = [".zip"]
+    support_types = ZIP.support_types
+    magic = ZIP.magic
+    index_format = "zip"
+    streamable = True
+    # 压缩数据总量达到该值才值得启动多进程分片
+    shard_min_size = 64 * 1024 * 1024
+    # 成员读取后端：pread 为无锁位置读取，zipfile 为标准库实现
+    reader_backend = "pread"
 
-    async def extract_file(self, zip_file: zipfile.ZipFile, file_info: zipfile.ZipInfo,
+    @staticmethod
+    def entry_of(file_info: zipfile.ZipInfo):
+        return file_info.filename, file_info.file_size, file_info.CRC
+
+    @staticmethod
+    def to_index(file_info: zipfile.ZipInfo) -> IndexEntry:
+        return IndexEntry(file_info.filename, file_info.is_dir(), file_info.file_size, file_info.compress_size,
+                          file_info.CRC, file_info.header_offset, None,
+                          [file_info.compress_type, file_info.flag_bits, list(file_info.date_time),
+                           file_info.external_attr])
+
+    @staticmethod
+    def from_index(entry: IndexEntry) -> zipfile.ZipInfo:
+        """由索引还原 ZipInfo，足以供 PreadZipReader 与 ZipFile.open 读取成员"""
+        file_info = zipfile.ZipInfo(entry.name)
+        file_info.compress_type, file_info.flag_bits, date_time, file_info.external_attr = entry.meta
+        file_info.date_time = tuple(date_time)
+        file_info.file_size = entry.size
+        file_info.compress_size = entry.compress_size
+        file_info.CRC = entry.crc
+        file_info.header_offset = entry.offset
+        return file_info
+
+    def build_index(self, input_file: AsyncPath) -> List[IndexEntry]:
+        with zipfile.ZipFile(input_file) as zip_file:
+            return [self.to_index(i) for i in zip_file.infolist()]
+
+    def iter_members(self, input_file, entries: Optional[List[IndexEntry]] = None) -> Iterator[ArchiveMember]:
+        with zipfile.ZipFile(input_file) as zip_file:
+            if entries is not None:
+                entries.extend(self.to_index(i) for i in zip_file.infolist())
+            for file_info in zip_file.infolist():
+                if not self.selected(file_info.filename):
+                    continue
+                mode = file_info.external_attr >> 16
+                yield ArchiveMember(file_info.filename, file_info.is_dir(), file_info.file_size,
+                                    time.mktime(file_info.date_time + (0, 0, -1)), mode or None,
+                                    partial(open_member, zip_file, file_info))
+
+    async def extract_file(self, zip_file: Union[zipfile.ZipFile, PreadZipReader], file_info: zipfile.ZipInfo,
                            input_dir: AsyncPath, output_dir: AsyncPath):
         target_path = output_dir / file_info.filename
-        if await target_path.exists():
-            await self.onupdate(input_dir, str(target_path))
+        nested_dir = await self.try_nested(partial(open_member, zip_file, file_info), output_dir, input_dir,
+                                           self.entry_of(file_info))
+        if nested_dir is not None:
+            await self.onupdate(input_dir, str(nested_dir))
+            return
+        if ZERO_COPY and file_info.compress_type == zipfile.ZIP_STORED and not self.dedupable(file_info.file_size) \
+                and isinstance(zip_file, PreadZipReader) and zip_file.supports(file_info):
+            # 未压缩成员直接在内核中复制，复制后校验 CRC
+            offset = await asyncio.to_thread(zip_file.data_offset, file_info)
+            if not await self.copy_member(zip_file.fileno(), offset, file_info.file_size,
+                                          target_path, input_dir, self.entry_of(file_info)):
+                return
+        # 分块流式写入文件
+        elif not await self.write_member(partial(open_member, zip_file, file_info), target_path, input_dir,
+                                         self.entry_of(file_info), compress_size=file_info.compress_size):
             return
-        # 如果目标路径是目录，则创建目录
-        if file_info.is_dir():
-            await target_path.mkdir(exist_ok=True, parents=True)
-            await self.onupdate(input_dir, str(target_path))
+        await self.onupdate(input_dir, str(target_path))
+
+    async def extract_members(self, zip_file: Union[zipfile.ZipFile, PreadZipReader], info_list: List[zipfile.ZipInfo],
+                              input_file: AsyncPath, output_file: AsyncPath):
+        batches, large = self.split_batches(info_list, lambda i: i.file_size, lambda i: i.filename)
+        async with AioPool(size=self.io_concurrency) as pool:
+            for batch in batches:
+                await pool.spawn(self.write_batch(
+                    [(partial(open_member, zip_file, i), output_file / i.filename, self.entry_of(i)) for i in batch],
+                    input_file
+                ))
+            for file_info in large:
+                # 提交任务到池中
+                await pool.spawn(self.extract_file(zip_file, file_info, input_file, output_file))
+
+    async def extract_unit(self, input_file: AsyncPath, output_file: AsyncPath, members: List[zipfile.ZipInfo]):
+        """解压一组已规划的成员：已完成的成员由规划方过滤，这里只向同一份日志追加记录"""
+        journal = self.journal = ExtractionJournal(output_file)
+        await asyncio.to_thread(journal.open, True, False)
+        try:
+            # 成员信息已由规划方解析，无需再读取中央目录
+            with PreadZipReader(input_file) as zip_reader:
+                await self.extract_members(zip_reader, members, input_file, output_file)
+        finally:
+            self.journal = None
+            await asyncio.to_thread(journal.close)
+
+    async def plan_units(self, input_file: AsyncPath, output_file: AsyncPath,
+                         unit_size: int) -> Optional[List[Tuple[int, List[zipfile.ZipInfo]]]]:
+        index = await self.load_index(input_file)
+        if index is not None:
+            info_list = [self.from_index(entry) for entry in index.entries]
         else:
+            entries = await asyncio.to_thread(self.build_index, input_file)
+            await self.save_index(input_file, entries)
+            info_list = [self.from_index(entry) for entry in entries]
+        info_list = [i for i in info_list if self.selected(i.filename)]
+        await self.onsuccess(input_file, len(info_list))
+        await self.onsuccess_bytes(input_file, sum(i.file_size for i in info_list))
+        await output_file.mkdir(exist_ok=True, parents=True)
+        async with self.journaling(output_file, cleanup=False):
+            info_list = await self.plan_members(input_file, output_file, info_list,
+                                                lambda i: (i.filename, i.is_dir(), i.file_size, i.CRC))
+        return [(sum(i.compress_size for i in unit), unit) for unit in split_units(info_list, unit_size)]
 
-            # 异步写入文件
-            data = await self.read_file_data(zip_file, file_info)
-            if data is None:
-                return
-            await target_path.parent.mkdir(exist_ok=True, parents=True)
-            async with aiofiles.open(target_path, 'wb') as f:
-                await f.write(data)
-            await self.onupdate(input_dir, str(target_path))
-
-    async def read_file_data(self, zip_file:zipfile.ZipFile, file_info:zipfile.ZipInfo):
-        def read_file():
-            try:
-                with zip_file.open(file_info) as zf:
-                    data = zf.read()
-                return data
-            except:
-                return None
-
-        return await asyncio.to_thread(read_file)
+    async def _extract_sharded(self, input_file: AsyncPath, output_file: AsyncPath,
+                               shards: List[List[zipfile.ZipInfo]]):
+        """多进程分片解压，主进程负责汇总各分片的进度"""
+        loop = asyncio.get_running_loop()
+        channel = mp.Queue()
+        with ProcessPoolExecutor(max_workers=len(shards), initializer=_init_shard_worker,
+                                 initargs=(channel, budget.state, dedup.state, metrics.state)) as pool:
+            futures = [
+                loop.run_in_executor(pool, _extract_shard, str(input_file), str(output_file), shard, shard_id,
+                                     self.recursive, self.nested_max_size)
+                for shard_id, shard in enumerate(shards)
+            ]
+            pending = len(shards)
+            while pending:
+                try:
+                    messages = await asyncio.to_thread(_drain_channel, channel)
+                except queue.Empty:
+                    # 进程异常退出时不会发送完成消息
+                    if all(future.done() for future in futures):
+                        break
+                    continue
+                for kind, value in messages:
+                    if kind == _UPDATE:
+                        await self.onupdate(input_file, value)
+                    elif kind == _BYTES:
+                        await self.onupdate_bytes(input_file, value)
+                    else:
+                        pending -= 1
+            for failures in await asyncio.gather(*futures):
+                self.failures.extend(failures)
+
+    async def _extract_infos(self, input_file: AsyncPath, output_file: AsyncPath, info_list: List[zipfile.ZipInfo],
+                             zip_file: Optional[zipfile.ZipFile]):
+        # 中央目录本身支持随机访问，选择性解压只需过滤成员
+        info_list = [i for i in info_list if self.selected(i.filename)]
+        await self.onsuccess(input_file, len(info_list))
+        await self.onsuccess_bytes(input_file, sum(i.file_size for i in info_list))
+        await output_file.mkdir(exist_ok=True, parents=True)
+        async with self.journaling(output_file):
+            info_list = await self.plan_members(input_file, output_file, info_list,
+                                                lambda i: (i.filename, i.is_dir(), i.file_size, i.CRC))
+            workers = min(self.max_workers, mp.cpu_count())
+            if workers > 1 and sum(i.compress_size for i in info_list) >= self.shard_min_size:
+                shards = split_shards(info_list, workers)
+                if len(shards) > 1:
+                    await self._extract_sharded(input_file, output_file, shards)
+                    return
+            if self.reader_backend == "pread":
+                # 由索引还原成员信息时没有打开 ZipFile，遇到加密成员等情况才按需打开
+                with PreadZipReader(input_file, fallback=zip_file) as zip_reader:
+                    await self.extract_members(zip_reader, info_list, input_file, output_file)
+            else:
+                await self.extract_members(zip_file, info_list, input_file, output_file)
+
+    async def extract_stream(self, fileobj: BinaryIO, input_file: AsyncPath, output_file: AsyncPath):
+        """嵌套的 zip 已整体在内存中，用标准库 ZipFile 直接读取"""
+        with zipfile.ZipFile(fileobj) as zip_file:
+            await output_file.mkdir(exist_ok=True, parents=True)
+            info_list = await self.plan_members(input_file, output_file, zip_file.infolist(),
+                                                lambda i: (i.filename, i.is_dir(), i.file_size, i.CRC))
+            await self.extract_members(zip_file, info_list, input_file, output_file)
 
     async def extract(self, input_file: AsyncPath, output_file: AsyncPath):
+        index = await self.load_index(input_file) if self.reader_backend == "pread" else None
+        if index is not None:
+            # 索引有效时无需重新解析中央目录
+            info_list = [self.from_index(entry) for entry in index.entries]
+            await self._extract_infos(input_file, output_file, info_list, None)
+            return
         with zipfile.ZipFile(input_file) as zip_file:
             info_list = zip_file.infolist()
-            await self.onsuccess(input_file, len(info_list))
-            await output_file.mkdir(exist_ok=True, parents=True)
-            async with AioPool(size=mp.cpu_count() * 10) as pool:
-                for file_info in info_list:
-                    # 提交任务到池中
-                    await pool.spawn(self.extract_file(zip_file, file_info, input_file, output_file))
+            await self.save_index(input_file, [self.to_index(i) for i in info_list])
+            await self._extract_infos(input_file, output_file, info_list, zip_file)
 
 
 if __name__ == '__main__':
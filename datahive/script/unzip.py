@@ -11,100 +11,310 @@ Change Log  :
 
 """
 import asyncio
+import os
 from concurrent.futures import ProcessPoolExecutor
 
-import aiofiles
 from aiopath import AsyncPath
-from typing import Optional
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
 
-from datahive.cli.cli_console import progress, console
+from datahive.cli import cli_console
+from datahive.script._task_list import TaskEntry, iter_tasks, task_list_format
 from datahive.script.extraction import factory
-from datahive.utils.async_util import run_new_loop
-
-
-async def _read_task_list(task_list):
-    if not task_list.endswith('.task'):
-        raise ValueError('任务列表应为 "*.task" 格式')
-    arg_list = []
-    async with aiofiles.open(task_list, 'r', encoding='utf-8') as f:
-        index = 0
-        try:
-            while True:
-                line = await f.readline()
-                if not line:
-                    break
-                index += 1
-                arg = line.split('|')
-                if len(arg) == 1 and arg[0].strip():
-                    _input_file = AsyncPath(arg[0].strip())
-                    if not _input_file.is_absolute():
-                        raise Exception(f'路径必须为绝对路径 -> {_input_file}')
-                    if not await _input_file.exists():
-                        raise FileNotFoundError(f'文件不存在 -> {_input_file}')
-                    arg_list.append((_input_file, None))
-                elif len(arg) == 2 and arg[0].strip():
-                    _input_file = AsyncPath(arg[0].strip())
-                    if not await _input_file.exists():
-                        raise FileNotFoundError(f'文件不存在 -> {_input_file}')
-                    _output_file = AsyncPath(arg[1].strip())
-                    if not _output_file.is_absolute():
-                        raise Exception(f'路径必须为绝对路径 -> {_output_file}')
-                    arg_list.append((_input_file, _output_file))
-                else:
-                    raise Exception(f'格式错误，应为 INPUT_FILE|OUTPUT_FILE')
-        except Exception as e:
-            raise FileExistsError(f'第{index}行存在错误:{e}')
-    return arg_list
-
-
-async def _extract(input_file: str, output_file: Optional[str]):
-    async def onsuccess(input_path: AsyncPath, total):
-        progress.add_task(f"解压{input_path.name}", total)
-
-    async def onupdate(input_path: AsyncPath, f: str):
-        progress.update(f"解压{input_path.name}")
+from datahive.script.extraction._dedup import dedup
+from datahive.script.extraction._journal import ExtractionJournal
+from datahive.script.extraction._scheduler import ConcurrencyBudget, UnitResult, WorkStealingScheduler, WorkUnit, \
+    plan_split, run_unit_loop
+from datahive.script.extraction.base_extraction import summarize_failures
+from datahive.utils.budget_util import budget, format_size, parse_size
+from datahive.utils.metrics_util import metrics
 
+
+class TaskResult(NamedTuple):
+    """任务列表中一个归档的解压结果"""
+    # 在任务列表中的行号
+    line: int
+    input_file: str
+    output_file: str
+    # 失败原因，None 表示成功
+    error: Optional[str]
+    seconds: float
+
+
+def _init_worker(budget_state, dedup_state, progress_state, metrics_state):
+    """批量任务子进程接入主进程的内存预算、去重索引、进度板与运行指标"""
+    budget.attach(budget_state)
+    dedup.attach(dedup_state)
+    cli_console.progress.attach(progress_state)
+    metrics.attach(metrics_state)
+
+
+async def _onsuccess(input_path: AsyncPath, total):
+    cli_console.progress.add_task(f"解压{input_path.name}", total)
+
+
+async def _onsuccess_bytes(input_path: AsyncPath, total_bytes: Optional[int]):
+    cli_console.progress.set_total_bytes(f"解压{input_path.name}", total_bytes)
+
+
+async def _onupdate(input_path: AsyncPath, f: str):
+    cli_console.progress.update(f"解压{input_path.name}")
+
+
+async def _onupdate_bytes(input_path: AsyncPath, n: int):
+    cli_console.progress.update_bytes(f"解压{input_path.name}", n)
+
+
+def _configure(input_file: str, max_workers: int = 1, resume: bool = False, include: Optional[List[str]] = None,
+               recursive: int = 0, nested_max_size: Optional[int] = None, io_concurrency: Optional[int] = None):
+    """取得归档对应的解压策略并设置本次解压的参数"""
+    extraction = factory.get_strategy(input_file)
+    extraction.onsuccess = _onsuccess
+    extraction.onsuccess_bytes = _onsuccess_bytes
+    extraction.onupdate = _onupdate
+    extraction.onupdate_bytes = _onupdate_bytes
+    extraction.max_workers = max_workers
+    extraction.resume = resume
+    extraction.include = include
+    extraction.recursive = recursive
+    # 策略实例由工厂缓存复用，每次解压重新记录失败的成员
+    extraction.failures = []
+    if nested_max_size is not None:
+        extraction.nested_max_size = nested_max_size
+    if io_concurrency is not None:
+        extraction.io_concurrency = io_concurrency
+    return extraction
+
+
+async def _extract(input_file: str, output_file: Optional[str], max_workers: int = 1, resume: bool = False,
+                   include: Optional[List[str]] = None, recursive: int = 0, nested_max_size: Optional[int] = None,
+                   io_concurrency: Optional[int] = None) -> Optional[str]:
+    """解压一个归档，返回失败成员的汇总，全部成功时返回 None"""
     input_file = AsyncPath(input_file)
     input_file = await input_file.absolute()
     if output_file is None:
         output_file = input_file.with_suffix('')
     output_file = AsyncPath(output_file)
     output_file = await output_file.absolute()
-    file_extension = ''.join(input_file.suffixes)
-    extraction = factory.get_strategy(file_extension)
-    extraction.onsuccess = onsuccess
-    extraction.onupdate = onupdate
+    extraction = _configure(str(input_file), max_workers, resume, include, recursive, nested_max_size,
+                            io_concurrency)
     await extraction.extract(input_file, output_file)
+    return summarize_failures(extraction.failures)
 
 
-async def run(input_file: str, output_file: Optional[str]):
-    progress.start()
+async def _extract_unit(unit: WorkUnit, resume: bool, include: Optional[List[str]], recursive: int,
+                        nested_max_size: Optional[int], io_concurrency: int) -> Optional[str]:
+    if unit.members is None:
+        return await _extract(unit.input_file, unit.output_file, 1, resume, include, recursive, nested_max_size,
+                              io_concurrency)
+    extraction = _configure(unit.input_file, 1, resume, include, recursive, nested_max_size, io_concurrency)
+    await extraction.extract_unit(AsyncPath(unit.input_file), AsyncPath(unit.output_file), unit.members)
+    return summarize_failures(extraction.failures)
+
+
+def _run_unit(unit: WorkUnit, resume: bool, include: Optional[List[str]], recursive: int,
+              nested_max_size: Optional[int], io_concurrency: int) -> Optional[str]:
+    """批量任务子进程入口：解压一个单元，返回失败原因（含解压失败的成员），成功时返回 None"""
     try:
-        await _extract(input_file, output_file)
+        return run_unit_loop(_extract_unit, io_concurrency, unit, resume, include, recursive, nested_max_size,
+                             io_concurrency)
     except Exception as e:
-        console.print_error(str(e))
+        return f"{type(e).__name__}: {e}"
     finally:
-        progress.stop()
+        # 本进程累计的进度在单元结束时全部写入进度板
+        cli_console.progress.flush()
+
 
+def _configure_metrics(metrics_path: Optional[str], metrics_interval: float):
+    if metrics_interval <= 0:
+        raise ValueError(f'指标导出间隔必须大于 0 -> {metrics_interval}')
+    if metrics_path:
+        metrics_path = os.path.abspath(metrics_path)
+        if not os.path.isdir(os.path.dirname(metrics_path)):
+            raise FileNotFoundError(f'指标导出目录不存在 -> {os.path.dirname(metrics_path)}')
+    metrics.configure(metrics_path, metrics_interval)
 
-async def batch_run(task_list: str, max_workers: int):
+
+async def run(input_file: str, output_file: Optional[str], max_workers: int = 1, max_memory: Optional[str] = None,
+              resume: bool = False, dedup_mode: Optional[str] = None, include: Optional[List[str]] = None,
+              recursive: int = 0, nested_max_size: Optional[str] = None, metrics_path: Optional[str] = None,
+              metrics_interval: float = 5.0):
     try:
-        args = await _read_task_list(task_list)
-        assert len(args) > 0, f'未发现任务 -> {task_list}'
+        budget.configure(parse_size(max_memory) if max_memory else None)
+        dedup.configure(dedup_mode)
+        nested_max_size = parse_size(nested_max_size) if nested_max_size else None
+        _configure_metrics(metrics_path, metrics_interval)
     except Exception as e:
-        console.print_error(str(e))
+        cli_console.console.print_error(str(e))
         return
-    progress.start()
+    cli_console.progress.start()
     try:
-        loop = asyncio.get_running_loop()
-        with ProcessPoolExecutor(max_workers=max_workers) as pool:
-            for input_file, output_file in args:
-                loop.run_in_executor(pool, run_new_loop, _extract, input_file, output_file)
+        error = await _extract(input_file, output_file, max_workers, resume, include, recursive, nested_max_size)
+        if error is not None:
+            cli_console.console.print_error(error)
     except Exception as e:
-        console.print_error(str(e))
+        cli_console.console.print_error(str(e))
     finally:
-        progress.stop()
+        cli_console.progress.stop()
+        dedup.configure(None)
+        metrics.configure(None)
+
+
+async def list_run(input_file: str):
+    """列出归档成员，索引已缓存时无需解压归档"""
+    try:
+        input_file = AsyncPath(input_file)
+        extraction = factory.get_strategy(str(input_file))
+        entries = await extraction.list_members(input_file)
+    except Exception as e:
+        cli_console.console.print_error(str(e))
+        return
+    rows = [
+        [entry.name, "-" if entry.is_dir else format_size(entry.size),
+         "-" if entry.compress_size is None else format_size(entry.compress_size),
+         "-" if entry.crc is None else f"{entry.crc:08x}"]
+        for entry in entries
+    ]
+    total = sum(entry.size for entry in entries if not entry.is_dir)
+    cli_console.console.print_table(f"{input_file.name}（{len(entries)} 个成员，共 {format_size(total)}）",
+                                    ["名称", "大小", "压缩后", "CRC32"], rows)
+
+
+class _BatchTracker:
+    """按任务汇总各单元的结果：任务的全部单元完成后生成 TaskResult，耗时为第一个单元开始到最后一个单元结束"""
+
+    def __init__(self):
+        self.results: List[TaskResult] = []
+        # 任务序号 -> [输入, 输出, 失败原因, 开始, 结束, 未完成的单元数]
+        self._running: Dict[int, list] = {}
+
+    def start(self, task: int, input_file: str, output_file: str, units: int):
+        if units:
+            self._running[task] = [input_file, output_file, None, None, 0.0, units]
+        else:
+            # 规划时已全部完成
+            self.results.append(TaskResult(task, input_file, output_file, None, 0.0))
+
+    def fail(self, task: int, input_file: str, output_file: Optional[str], error: str):
+        self.results.append(TaskResult(task, input_file, output_file or "", error, 0.0))
+        cli_console.progress.failed(f"解压{os.path.basename(input_file)}")
+
+    async def onresult(self, result: UnitResult):
+        state = self._running[result.unit.task]
+        if result.error is not None and state[2] is None:
+            state[2] = result.error
+            cli_console.progress.failed(f"解压{os.path.basename(state[0])}")
+        state[3] = result.start if state[3] is None else min(state[3], result.start)
+        state[4] = max(state[4], result.end)
+        state[5] -= 1
+        if state[5] == 0:
+            input_file, output_file, error, start, end, _ = self._running.pop(result.unit.task)
+            if error is None and result.unit.members is not None:
+                # 拆分的归档由各单元共用解压日志，全部单元成功后才删除
+                await asyncio.to_thread(ExtractionJournal(output_file).remove)
+            self.results.append(TaskResult(result.unit.task, input_file, output_file, error, end - start))
+
+
+async def _plan_units(entries: List[TaskEntry], processes: int, tracker: _BatchTracker, resume: bool,
+                      include: Optional[List[str]], recursive: int, nested_max_size: Optional[int]
+                      ) -> List[WorkUnit]:
+    """
+    把一批校验后的任务转换为调度单元：以归档大小估计工作量，超过本批每个进程平均工作量的大归档按成员拆分。
+    校验或规划失败的任务直接记为失败。
+    """
+    valid = []
+    for entry in entries:
+        if entry.error is not None:
+            tracker.fail(entry.line, entry.input_file, entry.output_file, entry.error)
+        else:
+            valid.append(entry)
+    threshold, unit_size = plan_split([entry.size for entry in valid], processes)
+    units = []
+    for entry in valid:
+        input_path = os.path.abspath(entry.input_file)
+        output_path = os.path.abspath(entry.output_file) if entry.output_file is not None \
+            else os.path.splitext(input_path)[0]
+        task_units = [WorkUnit(entry.line, input_path, output_path, entry.size)]
+        if processes > 1 and entry.size > threshold:
+            try:
+                extraction = _configure(input_path, 1, resume, include, recursive, nested_max_size)
+                planned = await extraction.plan_units(AsyncPath(input_path), AsyncPath(output_path), unit_size)
+            except Exception as e:
+                tracker.fail(entry.line, input_path, output_path, f"{type(e).__name__}: {e}")
+                continue
+            if planned == []:
+                # 全部成员已完成，不会再有单元运行，规划时保留的解压日志在此删除
+                await asyncio.to_thread(ExtractionJournal(output_path).remove)
+            if planned is not None:
+                task_units = [WorkUnit(entry.line, input_path, output_path, load, members)
+                              for load, members in planned]
+        tracker.start(entry.line, input_path, output_path, len(task_units))
+        units.extend(task_units)
+    return units
+
+
+def _report(task_results: List[TaskResult]):
+    failed = sorted((r for r in task_results if r.error is not None), key=lambda r: r.line)
+    if failed:
+        cli_console.console.print_table(f"解压失败（{len(failed)}/{len(task_results)}）", ["行", "归档", "原因"],
+                                        [[r.line, r.input_file, r.error] for r in failed])
+    else:
+        cli_console.console.print_success(f"全部 {len(task_results)} 个归档解压完成")
 
 
+async def batch_run(task_list: str, max_workers: int, max_memory: Optional[str] = None, resume: bool = False,
+                    dedup_mode: Optional[str] = None, include: Optional[List[str]] = None, recursive: int = 0,
+                    nested_max_size: Optional[str] = None, metrics_path: Optional[str] = None,
+                    metrics_interval: float = 5.0) -> List[TaskResult]:
+    """
+    批量解压任务列表中的归档，等待全部完成并报告每个归档的结果。
+
+    任务列表（*.task、*.jsonl 或标准输入 -）流式读取，按批并行校验，校验通过的任务立即交给调度器，
+    不必等整个列表读完；格式错误或文件不存在的行记为失败，不影响其他任务。
+    max_workers 为全局并发预算：解压进程数不超过 CPU 数，其余额度作为各进程内的 I/O 并发。
+    每批归档按大小从大到小（LPT）分配给各进程，超大的 zip 按成员拆分为多个单元，空闲进程从其他进程的队列中窃取单元。
+    """
+    try:
+        task_list_format(task_list)
+        budget.configure(parse_size(max_memory) if max_memory else None)
+        dedup.configure(dedup_mode)
+        nested_max_size = parse_size(nested_max_size) if nested_max_size else None
+        _configure_metrics(metrics_path, metrics_interval)
+    except Exception as e:
+        cli_console.console.print_error(str(e))
+        return []
+    cli_console.progress.start()
+    tracker = _BatchTracker()
+    try:
+        concurrency = ConcurrencyBudget.split(max_workers)
+        scheduler = WorkStealingScheduler(concurrency.processes)
+        loop = asyncio.get_running_loop()
+
+        async def batches() -> AsyncIterator[List[WorkUnit]]:
+            async for entries in iter_tasks(task_list):
+                units = await _plan_units(entries, concurrency.processes, tracker, resume, include, recursive,
+                                          nested_max_size)
+                if units:
+                    yield units
+
+        with ProcessPoolExecutor(max_workers=concurrency.processes, initializer=_init_worker,
+                                 initargs=(budget.state, dedup.state, cli_console.progress.state,
+                                           metrics.state)) as pool:
+            async def submit(unit: WorkUnit) -> Optional[str]:
+                return await loop.run_in_executor(pool, _run_unit, unit, resume, include, recursive,
+                                                  nested_max_size, concurrency.io_per_process)
+
+            await scheduler.run(batches(), submit, tracker.onresult)
+        if not tracker.results:
+            raise ValueError(f'未发现任务 -> {task_list}')
+    except Exception as e:
+        cli_console.console.print_error(str(e))
+    finally:
+        cli_console.progress.stop()
+        dedup.configure(None)
+        metrics.configure(None)
+    if tracker.results:
+        _report(tracker.results)
+    return tracker.results
+
 if __name__ == '__main__':
     pass
@@ -11,6 +11,8 @@ Change Log  :
 
 """
 import asyncio
+import threading
+from concurrent.futures import Future
 from typing import List, Callable, Any
 from functools import wraps
 
@@ -133,6 +135,25 @@ def run_new_loop(func, *args, **kwargs):
         asyncio.set_event_loop(None)
 
 
+def run_in_thread(func: Callable, *args, name: str = None) -> asyncio.Future:
+    """
+    在独立的线程中运行长时间阻塞的函数（如持续读取数据的生产者），返回可等待的结果。
+    不占用事件循环的默认线程池：线程池按 I/O 并发数设定大小时，生产者占住线程会让等待它的消费者无线程可用。
+    """
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name=name, daemon=True).start()
+    return asyncio.wrap_future(future)
+
+
 if __name__ == '__main__':
     # 示例使用
     @async_logger
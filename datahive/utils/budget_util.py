@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 跨进程共享的内存预算
+@Date       : 2026/10/18 15:20
+@Author     : lkkings
+@FileName:  : budget_util.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import multiprocessing as mp
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
+from datahive.utils.metrics_util import metrics
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(value: str) -> int:
+    """
+    解析带单位的字节数，如 512M、2G、1.5g
+
+    :param value: 字节数字符串
+    :return: 字节数
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*", value, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无法解析的大小 -> {value}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def format_size(nbytes: int) -> str:
+    """把字节数格式化为带单位的字符串，如 1.5M"""
+    for unit in ("", "K", "M", "G"):
+        if nbytes < 1024:
+            return f"{nbytes:.1f}{unit}" if unit else f"{nbytes}"
+        nbytes /= 1024
+    return f"{nbytes:.1f}T"
+
+
+class MemoryBudget:
+    """
+    内存预算：解压成员前先按字节预约额度，超出预算时等待其他成员释放。
+
+    已用额度保存在 multiprocessing.Value 中，通过 state/attach 传给进程池，
+    同一次运行的所有进程共用一份预算。未配置上限时不做任何限制。
+    """
+
+    # 等待额度时的轮询间隔（秒）
+    poll_interval = 0.01
+
+    def __init__(self):
+        self._limit: Optional[int] = None
+        self._used = None
+
+    @property
+    def limit(self) -> Optional[int]:
+        return self._limit
+
+    @property
+    def used(self) -> int:
+        return self._used.value if self._used is not None else 0
+
+    @property
+    def state(self) -> Tuple[Optional[int], object]:
+        """供进程池 initializer 传递的共享状态"""
+        return self._limit, self._used
+
+    def configure(self, limit: Optional[int]):
+        """设置预算上限（字节），None 表示不限制"""
+        self._limit = limit
+        self._used = mp.Value("q", 0) if limit else None
+
+    def attach(self, state: Tuple[Optional[int], object]):
+        """子进程接入主进程的预算"""
+        self._limit, self._used = state
+
+    def _grant(self, nbytes: int) -> int:
+        # 超过上限的请求按上限预约，避免永远等待
+        return min(nbytes, self._limit)
+
+    def try_acquire(self, nbytes: int) -> bool:
+        if self._used is None:
+            return True
+        with self._used.get_lock():
+            if self._used.value + nbytes > self._limit:
+                return False
+            self._used.value += nbytes
+            return True
+
+    def acquire_sync(self, nbytes: int) -> int:
+        """在工作线程中阻塞预约额度，返回实际预约的字节数"""
+        if self._used is None:
+            return 0
+        nbytes = self._grant(nbytes)
+        while not self.try_acquire(nbytes):
+            time.sleep(self.poll_interval)
+        return nbytes
+
+    async def acquire(self, nbytes: int) -> int:
+        """在事件循环中等待预约额度，返回实际预约的字节数"""
+        if self._used is None:
+            return 0
+        nbytes = self._grant(nbytes)
+        while not self.try_acquire(nbytes):
+            await asyncio.sleep(self.poll_interval)
+        return nbytes
+
+    def release(self, nbytes: int):
+        if self._used is None or nbytes <= 0:
+            return
+        with self._used.get_lock():
+            self._used.value -= nbytes
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        granted = await self.acquire(nbytes)
+        # 未配置上限时不预约额度，在途字节数仍按请求的大小统计
+        metrics.add("bytes_in_flight", nbytes)
+        try:
+            yield granted
+        finally:
+            metrics.add("bytes_in_flight", -nbytes)
+            self.release(granted)
+
+
+budget = MemoryBudget()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 文件读写工具
+@Date       : 2026/10/18 9:12
+@Author     : lkkings
+@FileName:  : io_util.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import errno
+import os
+import sys
+import threading
+import zlib
+from typing import BinaryIO, Optional
+
+from datahive.utils.metrics_util import metrics
+
+# 默认分块大小 1MB
+CHUNK_SIZE = 1024 * 1024
+# 稀疏写入时判断全零的块大小
+SPARSE_BLOCK = 64 * 1024
+_ZERO_BLOCK = memoryview(bytes(SPARSE_BLOCK))
+
+
+def _is_zero(buffer: bytearray, start: int, end: int) -> bool:
+    # bytearray.startswith 直接 memcmp，比逐字节比较 memoryview 快两个数量级
+    return buffer.startswith(_ZERO_BLOCK[:end - start], start, end)
+
+
+def write_sparse(dst: BinaryIO, buffer: bytearray, n: int):
+    """
+    把 buffer[:n] 写入 dst 的当前位置，全零块改为 seek 跳过，在文件中留下空洞。
+    全部写完后需调用 dst.truncate() 补齐末尾空洞的文件长度。
+    """
+    view = memoryview(buffer)
+    try:
+        pos = 0
+        while pos < n:
+            end = min(pos + SPARSE_BLOCK, n)
+            zero = _is_zero(buffer, pos, end)
+            # 合并连续的同类块，减少系统调用
+            while end < n:
+                next_end = min(end + SPARSE_BLOCK, n)
+                if _is_zero(buffer, end, next_end) != zero:
+                    break
+                end = next_end
+            if zero:
+                dst.seek(end - pos, os.SEEK_CUR)
+            else:
+                dst.write(view[pos:end])
+            pos = end
+    finally:
+        view.release()
+
+
+def copy_chunk(src: BinaryIO, dst: Optional[BinaryIO], view: memoryview,
+               lock: Optional[threading.Lock] = None, sparse: bool = False, hasher=None) -> int:
+    """
+    从 src 读取一块数据到复用缓冲区，再写入 dst。
+
+    :param src: 源文件对象（需支持 readinto）
+    :param dst: 目标文件对象，为 None 时只读取（配合 hasher 计算哈希）
+    :param view: 复用缓冲区（bytearray）的 memoryview
+    :param lock: 读取时需要持有的锁（源文件对象被多线程共享时使用）
+    :param sparse: 是否跳过全零块
+    :param hasher: hashlib 哈希对象，读出的数据同时送入哈希
+    :return: 本次复制的字节数，0 表示读取完毕
+    """
+    if lock is None:
+        start = metrics.clock()
+        n = src.readinto(view)
+    else:
+        with lock:
+            start = metrics.clock()
+            n = src.readinto(view)
+    metrics.observe("decompress", start, n or 0)
+    if n and hasher is not None:
+        hasher.update(view[:n])
+    if n and dst is not None:
+        start = metrics.clock()
+        if sparse:
+            write_sparse(dst, view.obj, n)
+        else:
+            dst.write(view[:n])
+        metrics.observe("write", start, n)
+    return n or 0
+
+
+# 内核态复制不可用时的错误码（跨文件系统、不支持的文件类型等）
+_UNSUPPORTED_ERRNO = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+# 内核态复制一次处理的最大字节数
+COPY_STEP = 64 * 1024 * 1024
+# 当前平台是否可以在内核中完成文件到文件的复制
+ZERO_COPY = hasattr(os, "copy_file_range") or (hasattr(os, "sendfile") and sys.platform.startswith("linux"))
+_copy_file_range_ok = hasattr(os, "copy_file_range")
+_sendfile_ok = hasattr(os, "sendfile") and sys.platform.startswith("linux")
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    """
+    把 src_fd 中 [offset, offset + count) 的数据复制到 dst_fd 的当前位置，数据不进入 Python 内存。
+    依次尝试 copy_file_range、sendfile，都不可用时退化为分块 pread/write。
+
+    :return: 本次复制的字节数，可能小于 count，0 表示源文件已到末尾
+    """
+    start = metrics.clock()
+    n = _copy_range(src_fd, dst_fd, offset, count)
+    metrics.observe("copy", start, n)
+    return n
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    global _copy_file_range_ok, _sendfile_ok
+    if _copy_file_range_ok:
+        try:
+            return os.copy_file_range(src_fd, dst_fd, count, offset)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNO:
+                raise
+            _copy_file_range_ok = False
+    if _sendfile_ok:
+        try:
+            return os.sendfile(dst_fd, src_fd, offset, count)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNO:
+                raise
+            _sendfile_ok = False
+    data = os.pread(src_fd, min(count, CHUNK_SIZE), offset)
+    if data:
+        os.write(dst_fd, data)
+    return len(data)
+
+
+def crc32_range(fd: int, offset: int, count: int) -> int:
+    """按块读取 fd 中 [offset, offset + count) 的数据计算 CRC32，用于校验内核复制的数据"""
+    crc = 0
+    end = offset + count
+    while offset < end:
+        data = os.pread(fd, min(end - offset, CHUNK_SIZE), offset)
+        if not data:
+            raise EOFError(f"数据不完整，缺少 {end - offset} 字节")
+        crc = zlib.crc32(data, crc)
+        offset += len(data)
+    return crc
+
+
+def preallocate(fd: int, size: int) -> bool:
+    """
+    按最终大小一次性为文件分配磁盘空间，减少碎片。
+    平台或文件系统不支持时返回 False，不影响后续写入。
+    """
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return False
+    try:
+        os.posix_fallocate(fd, 0, size)
+        return True
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED_ERRNO:
+            raise
+        return False
+
+
+# Linux FICLONE ioctl，btrfs/XFS 等文件系统上共享数据块的写时复制克隆
+_FICLONE = 0x40049409
+
+
+def clone_file(src_path: str, dst_path: str):
+    """
+    把 src_path 复制为 dst_path：优先写时复制克隆（reflink），
+    不支持时退化为内核态复制（copy_file_range 在部分文件系统上同样共享数据块）。
+    """
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        try:
+            import fcntl
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return
+        except (ImportError, OSError) as e:
+            if isinstance(e, OSError) and e.errno not in _UNSUPPORTED_ERRNO | {errno.ENOTTY}:
+                raise
+        offset, size = 0, os.fstat(src.fileno()).st_size
+        while offset < size:
+            n = copy_range(src.fileno(), dst.fileno(), offset, min(size - offset, COPY_STEP))
+            if n == 0:
+                raise EOFError(f"源文件被截断 -> {src_path}")
+            offset += n
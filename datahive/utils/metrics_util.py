@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 跨进程汇总的运行指标：各阶段耗时直方图、计数器与仪表，定期导出为 JSON 行或 Prometheus 文本文件
+@Date       : 2026/10/19 15:30
+@Author     : lkkings
+@FileName:  : metrics_util.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+阶段（每次操作记录一次耗时与字节数）:
+    read        从归档读取原始数据（zip 位置读取等可以单独计时的场合）
+    decompress  读出成员数据，包含其中的 read 与解压
+    write       成员数据写入目标文件
+    copy        未压缩成员在内核中直接复制
+    fsync       解压日志落盘
+"""
+import bisect
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+STAGES = ("read", "decompress", "write", "copy", "fsync")
+# 耗时直方图的桶上界（秒），最后另有 +Inf 桶
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+# 计数器与仪表：名称 -> (类型, 说明)；queue. 开头的为各队列的深度
+SCALARS = {
+    "members": ("counter", "写出的成员数"),
+    "bytes_in_flight": ("gauge", "已预约缓冲区的在途字节数"),
+    "queue.scheduler": ("gauge", "调度器中排队的单元数"),
+    "queue.pipeline": ("gauge", "tar 解压线程与写出协程之间排队的消息数"),
+    "cpu_percent": ("gauge", "系统 CPU 使用率"),
+    "memory_percent": ("gauge", "系统内存使用率"),
+}
+# 共享指标表的行数，每个进程占用一行；超出时该进程的指标只在本进程内记录
+MAX_ROWS = 256
+
+# 每个阶段占用的列：各桶的次数、耗时总和、次数、字节数
+_STAGE_WIDTH = len(LATENCY_BUCKETS) + 4
+_SUM = len(LATENCY_BUCKETS) + 1
+_COUNT = _SUM + 1
+_BYTES = _COUNT + 1
+_STAGE_COLUMNS = {stage: i * _STAGE_WIDTH for i, stage in enumerate(STAGES)}
+_SCALAR_COLUMNS = {name: len(STAGES) * _STAGE_WIDTH + i for i, name in enumerate(SCALARS)}
+ROW_SIZE = len(STAGES) * _STAGE_WIDTH + len(SCALARS)
+
+FORMAT_JSON = "json"
+FORMAT_PROMETHEUS = "prometheus"
+
+
+def export_format(path: str) -> str:
+    """*.prom 导出为 Prometheus 文本文件（每次整体替换），其余追加为 JSON 行"""
+    return FORMAT_PROMETHEUS if path.endswith(".prom") else FORMAT_JSON
+
+
+def _format_le(bound: float) -> str:
+    return f"{bound:g}"
+
+
+def render_json(snapshot: Dict) -> str:
+    return json.dumps(snapshot, ensure_ascii=False) + "\n"
+
+
+def render_prometheus(snapshot: Dict) -> str:
+    lines = [
+        "# HELP datahive_stage_seconds 各阶段单次操作的耗时",
+        "# TYPE datahive_stage_seconds histogram",
+    ]
+    for stage, data in snapshot["stages"].items():
+        cumulative = 0
+        for le, count in data["buckets"].items():
+            cumulative += count
+            lines.append(f'datahive_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'datahive_stage_seconds_sum{{stage="{stage}"}} {data["seconds"]}')
+        lines.append(f'datahive_stage_seconds_count{{stage="{stage}"}} {data["count"]}')
+    lines += [
+        "# HELP datahive_stage_bytes_total 各阶段处理的字节数",
+        "# TYPE datahive_stage_bytes_total counter",
+    ]
+    lines += [f'datahive_stage_bytes_total{{stage="{stage}"}} {data["bytes"]}'
+              for stage, data in snapshot["stages"].items()]
+    queues = []
+    for name, (kind, description) in SCALARS.items():
+        if name.startswith("queue."):
+            queues.append(f'datahive_queue_depth{{queue="{name[6:]}"}} {snapshot["queues"][name[6:]]}')
+            continue
+        metric = f"datahive_{name}_total" if kind == "counter" else f"datahive_{name}"
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}", f"{metric} {snapshot[name]}"]
+    lines += ["# HELP datahive_queue_depth 各队列的深度", "# TYPE datahive_queue_depth gauge"] + queues
+    return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """
+    运行指标：各进程只累加自己那一行，记录时不跨进程加锁也不序列化；主进程的后台线程定期汇总各行、
+    采样系统状态并导出。指标表通过 state/attach 传给进程池，未配置导出时记录操作直接返回。
+
+    记录阶段耗时::
+
+        start = metrics.clock()
+        n = src.readinto(view)
+        metrics.observe("decompress", start, n)
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._table = None
+        self._next_row = None
+        self._values: Optional[list] = None
+        self._base = 0
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        self._interval = 5.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> Optional[Tuple[object, object]]:
+        """供进程池 initializer 传递的共享状态"""
+        return (self._table, self._next_row) if self.enabled else None
+
+    def configure(self, path: Optional[str], interval: float = 5.0):
+        """
+        开始记录并定期导出到 path，None 表示不记录
+
+        :param path: 导出文件，*.prom 为 Prometheus 文本文件，其余为 JSON 行
+        :param interval: 导出间隔（秒）
+        """
+        self.stop()
+        self.enabled = path is not None
+        if not self.enabled:
+            self._table = self._next_row = self._values = None
+            return
+        self._path = path
+        self._interval = interval
+        self._table = mp.Array("d", MAX_ROWS * ROW_SIZE, lock=False)
+        self._next_row = mp.Value("i", 1)
+        self._values, self._base = self._table, 0
+        self._lock = threading.Lock()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="metrics", daemon=True)
+        self._sampler.start()
+
+    def attach(self, state: Optional[Tuple[object, object]]):
+        """子进程接入主进程的指标表，分到自己的一行"""
+        self.enabled = state is not None
+        # fork 时其他线程可能正持有锁，子进程重新创建
+        self._lock = threading.Lock()
+        self._sampler = None
+        if not self.enabled:
+            self._table = self._next_row = self._values = None
+            return
+        self._table, self._next_row = state
+        with self._next_row.get_lock():
+            row = self._next_row.value
+            self._next_row.value += 1
+        if row < MAX_ROWS:
+            self._values, self._base = self._table, row * ROW_SIZE
+        else:
+            self._values, self._base = [0.0] * ROW_SIZE, 0
+
+    def clock(self) -> float:
+        """操作开始的时间，未启用时为 0"""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def observe(self, stage: str, start: float, nbytes: int = 0):
+        """记录一次操作：自 start（clock 的返回值）起的耗时与处理的字节数"""
+        if not start:
+            return
+        seconds = time.perf_counter() - start
+        column = self._base + _STAGE_COLUMNS[stage]
+        values = self._values
+        with self._lock:
+            values[column + bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            values[column + _SUM] += seconds
+            values[column + _COUNT] += 1
+            values[column + _BYTES] += nbytes
+
+    def add(self, name: str, value: float = 1):
+        """累加计数器或仪表"""
+        if not self.enabled:
+            return
+        column = self._base + _SCALAR_COLUMNS[name]
+        with self._lock:
+            self._values[column] += value
+
+    def set(self, name: str, value: float):
+        """设置本进程的仪表值，汇总时各进程相加"""
+        if self.enabled:
+            self._values[self._base + _SCALAR_COLUMNS[name]] = value
+
+    def snapshot(self) -> Dict:
+        """汇总所有进程的指标"""
+        rows = min(self._next_row.value, MAX_ROWS)
+        totals = [0.0] * ROW_SIZE
+        for row in range(rows):
+            # 整行一次复制出来再相加，避免逐个读取共享数组
+            for i, value in enumerate(self._table[row * ROW_SIZE:(row + 1) * ROW_SIZE]):
+                totals[i] += value
+        stages = {}
+        for stage, column in _STAGE_COLUMNS.items():
+            buckets = {_format_le(bound): int(totals[column + i]) for i, bound in enumerate(LATENCY_BUCKETS)}
+            buckets["+Inf"] = int(totals[column + len(LATENCY_BUCKETS)])
+            stages[stage] = {
+                "count": int(totals[column + _COUNT]),
+                "seconds": round(totals[column + _SUM], 6),
+                "bytes": int(totals[column + _BYTES]),
+                "buckets": buckets,
+            }
+        snapshot = {"time": round(time.time(), 3), "pid": os.getpid(), "stages": stages, "queues": {}}
+        for name, column in _SCALAR_COLUMNS.items():
+            value = totals[column]
+            value = int(value) if value.is_integer() else round(value, 3)
+            if name.startswith("queue."):
+                snapshot["queues"][name[6:]] = value
+            else:
+                snapshot[name] = value
+        return snapshot
+
+    def export(self):
+        """导出一次汇总结果：JSON 行追加到文件末尾，Prometheus 文本文件先写临时文件再原子替换"""
+        snapshot = self.snapshot()
+        if export_format(self._path) == FORMAT_PROMETHEUS:
+            part_path = f"{self._path}.{os.getpid()}.tmp"
+            with open(part_path, "w", encoding="utf-8") as f:
+                f.write(render_prometheus(snapshot))
+            os.replace(part_path, self._path)
+        else:
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(render_json(snapshot))
+
+    def _sample_system(self, psutil):
+        # interval=None 时与上次调用比较，不阻塞
+        self.set("cpu_percent", psutil.cpu_percent(interval=None))
+        self.set("memory_percent", psutil.virtual_memory().percent)
+
+    def _sample_loop(self):
+        import psutil
+        psutil.cpu_percent(interval=None)
+        while not self._stop.wait(self._interval):
+            self._sample_system(psutil)
+            try:
+                self.export()
+            except OSError:
+                # 导出失败（如磁盘已满）不影响解压，下个周期重试
+                pass
+        self._sample_system(psutil)
+
+    def stop(self):
+        """停止后台采样，导出最终结果"""
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        try:
+            self.export()
+        except OSError:
+            pass
+
+
+metrics = Metrics()
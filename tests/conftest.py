@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 测试共用的归档构造与输出比对工具
+@Date       : 2026/10/20 10:00
+@Author     : lkkings
+@FileName:  : conftest.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import io
+import os
+import random
+import struct
+import tarfile
+import zipfile
+from typing import Dict
+
+import pytest
+
+from datahive.cli import cli_console
+
+
+def make_files(count: int = 8, seed: int = 0, large: int = 0) -> Dict[str, bytes]:
+    """生成 成员名 -> 内容，large 个成员超过小文件阈值以走流式写出路径"""
+    rng = random.Random(seed)
+    files = {}
+    for i in range(count):
+        size = rng.randint(1, 4096)
+        files[f"sub{i % 3}/f{i}.txt"] = bytes(rng.getrandbits(8) for _ in range(size))
+    for i in range(large):
+        files[f"big/large{i}.bin"] = rng.randbytes(1024 * 1024 + i)
+    return files
+
+
+def tar_bytes(files: Dict[str, bytes], mode: str = "w") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar_file:
+        for name, data in files.items():
+            file_info = tarfile.TarInfo(name)
+            file_info.size = len(data)
+            tar_file.addfile(file_info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def read_tree(root) -> Dict[str, bytes]:
+    """读取目录下的全部文件，返回 相对路径 -> 内容"""
+    tree = {}
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            tree[os.path.relpath(path, root).replace(os.sep, "/")] = open(path, "rb").read()
+    return tree
+
+
+@pytest.fixture(autouse=True, scope="session")
+def quiet_progress():
+    """进度条不在测试中刷新终端，进度板在全部测试结束后才关闭"""
+    progress = cli_console.progress
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(progress, "start", lambda: None)
+        patch.setattr(progress, "stop", lambda: None)
+        yield
+    # 渲染线程没有启动，只需关闭进度板（删除共享内存文件）
+    progress._board.close()
+
+
+def zip_data_offset(path, name: str) -> int:
+    """成员压缩数据在 zip 文件中的偏移"""
+    with zipfile.ZipFile(path) as zip_file:
+        file_info = zip_file.getinfo(name)
+    with open(path, "rb") as f:
+        f.seek(file_info.header_offset)
+        header = f.read(30)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    return file_info.header_offset + 30 + name_length + extra_length
+
+
+def flip_byte(path, offset: int):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        value = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([value ^ 0xff]))
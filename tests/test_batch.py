@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 批量解压的调度与结果汇总
+@Date       : 2026/10/20 10:00
+@Author     : lkkings
+@FileName:  : test_batch.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import os
+import zipfile
+
+from conftest import flip_byte, make_files, read_tree, tar_bytes, zip_data_offset
+from datahive.script import unzip
+from datahive.script.extraction._journal import ExtractionJournal
+
+
+def test_batch_tar_single_worker(tmp_path):
+    """-P 1 时每个进程只有一个 I/O 线程，tar 解压线程不能占住它让写出协程无线程可用"""
+    # 小文件数量超过流水线的小文件名额，解压线程必须等待写出协程消费
+    files = make_files(300, large=2)
+    archive = tmp_path / "a.tar.gz"
+    archive.write_bytes(tar_bytes(files, "w:gz"))
+    task_list = tmp_path / "list.task"
+    task_list.write_text(f"{archive}|{tmp_path / 'out'}\n")
+    results = asyncio.run(unzip.batch_run(str(task_list), 1))
+    assert [r.error for r in results] == [None]
+    assert read_tree(tmp_path / "out") == files
+
+
+def test_batch_reports_member_failures(tmp_path):
+    """成员 CRC 校验失败时整个任务记为失败，原因中包含失败的成员"""
+    files = make_files(8, large=1)
+    archive = tmp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    # 随机数据的 deflate 流由存储块组成，改动一个字节只会让解压结果与 CRC 不符
+    name = "big/large0.bin"
+    flip_byte(archive, zip_data_offset(archive, name) + 4096)
+    task_list = tmp_path / "list.task"
+    task_list.write_text(f"{archive}|{tmp_path / 'out'}\n")
+    results = asyncio.run(unzip.batch_run(str(task_list), 1))
+    assert len(results) == 1 and results[0].error is not None
+    assert name in results[0].error
+    tree = read_tree(tmp_path / "out")
+    assert name not in tree
+    assert tree == {k: v for k, v in files.items() if k != name}
+
+
+def test_split_task_removes_journal(tmp_path, monkeypatch):
+    """按成员拆分的任务成功后删除共用的解压日志，重跑时全部成员已完成、没有单元可运行时同样删除"""
+    monkeypatch.setattr(unzip.ConcurrencyBudget, "split", classmethod(lambda cls, total, units=None: cls(2, 1)))
+    monkeypatch.setattr(unzip, "plan_split", lambda sizes, processes: (0, 1))
+    files = make_files(8, large=1)
+    archive = tmp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    out = tmp_path / "out"
+    task_list = tmp_path / "list.task"
+    task_list.write_text(f"{archive}|{out}\n")
+    for run in ("first", "rerun"):
+        results = asyncio.run(unzip.batch_run(str(task_list), 2))
+        assert [r.error for r in results] == [None], run
+        assert read_tree(out) == files, run
+        assert not os.path.exists(ExtractionJournal(out).path), run
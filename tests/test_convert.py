@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 归档格式转换后再解压，结果与源归档一致
+@Date       : 2026/10/20 10:00
+@Author     : lkkings
+@FileName:  : test_convert.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import gzip
+import zipfile
+
+import pytest
+
+from conftest import make_files, read_tree, tar_bytes
+from datahive.script import convert, unzip
+from datahive.script.archiving import _parallel
+from datahive.script.extraction import factory
+from datahive.script.extraction._index import ArchiveIndex
+from datahive.script.extraction.tar_extraction import TarExtractionStrategy
+
+
+@pytest.mark.parametrize("suffix", [".zip", ".tar", ".tar.gz", ".tar.xz", ".tar.bz2", ".tar.zst"])
+def test_convert_round_trip(tmp_path, monkeypatch, suffix):
+    """分块压缩写出的多块（多流、多帧）归档能被 unzip 完整解压"""
+    if suffix == ".tar.zst":
+        pytest.importorskip("zstandard")
+    # 缩小块大小，让每种格式都写出多个块
+    for codec in (_parallel.Codec, _parallel.XzCodec, _parallel.Bzip2Codec, _parallel.ZstdCodec):
+        monkeypatch.setattr(codec, "block_size", 64 * 1024)
+    files = make_files(40, large=2)
+    source = tmp_path / "source.zip"
+    with zipfile.ZipFile(source, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    target = tmp_path / f"target{suffix}"
+    asyncio.run(convert.run(str(source), str(target), max_workers=2))
+    asyncio.run(unzip.run(str(target), str(tmp_path / "out")))
+    assert read_tree(tmp_path / "out") == files
+
+
+def test_convert_decompresses_once(tmp_path, monkeypatch):
+    """没有索引时不为统计成员数先解压一遍，转换时顺带保存索引，之后的转换直接使用"""
+    files = make_files(20, large=1)
+    source = tmp_path / "source.tar.gz"
+    source.write_bytes(gzip.compress(tar_bytes(files)))
+    opened = []
+    open_archive = TarExtractionStrategy.open_archive
+
+    def counting_open_archive(self, *args, **kwargs):
+        opened.append(args[0])
+        return open_archive(self, *args, **kwargs)
+
+    monkeypatch.setattr(TarExtractionStrategy, "open_archive", counting_open_archive)
+    for run in range(2):
+        target = tmp_path / f"target{run}.zip"
+        asyncio.run(convert.run(str(source), str(target)))
+        assert len(opened) == run + 1
+        assert ArchiveIndex.load(source, factory.get_strategy(str(source)).index_format) is not None
+        with zipfile.ZipFile(target) as zip_file:
+            assert {i.filename: zip_file.read(i) for i in zip_file.infolist() if not i.is_dir()} == files
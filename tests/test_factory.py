@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 按扩展名与文件头匹配解压策略
+@Date       : 2026/10/21 10:00
+@Author     : lkkings
+@FileName:  : test_factory.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from conftest import make_files, tar_bytes
+from datahive.script.extraction import _factory
+from datahive.script.extraction._factory import ExtractionStrategyFactory
+
+
+def test_builtin_matches_strategy_classes():
+    """工厂登记的扩展名与特征和策略类的一致"""
+    factory = ExtractionStrategyFactory()
+    registered = {}
+    for target, fmt in _factory._BUILTIN:
+        support_types, magic = registered.setdefault(target, ([], []))
+        support_types.extend(fmt.support_types)
+        magic.extend(fmt.magic)
+    for target, (support_types, magic) in registered.items():
+        strategy = factory._instance(target)
+        assert (strategy.support_types, strategy.magic) == (support_types, magic), target
+
+
+_COMPRESS = {"gz": gzip.compress, "bz2": bz2.compress, "xz": lzma.compress}
+
+
+@pytest.mark.parametrize("fmt, name, is_tar, expected", [
+    ("gz", "a.tar.gz", True, "TarGzExtractionStrategy"),
+    ("gz", "a.bin", True, "TarGzExtractionStrategy"),
+    ("gz", "a.gz", False, None),
+    ("gz", "a.bin", False, None),
+    ("bz2", "a.tar.bz2", True, "TarExtractionStrategy"),
+    ("bz2", "a.bz2", False, None),
+    ("xz", "a.tar.xz", True, "TarExtractionStrategy"),
+    ("xz", "a.bin", True, "TarExtractionStrategy"),
+    ("xz", "a.xz", False, None),
+])
+def test_compressed_sniff(tmp_path, fmt, name, is_tar, expected):
+    """压缩文件头只有扩展名为对应的 tar 格式或解压出 tar 头时才按 tar 解压，普通压缩文件不支持"""
+    path = tmp_path / name
+    path.write_bytes(_COMPRESS[fmt](tar_bytes(make_files(4)) if is_tar else b"plain text" * 100))
+    found = ExtractionStrategyFactory().match(str(path), path.read_bytes()[:_factory.SNIFF_SIZE])
+    assert (found and type(found[0]).__name__) == expected
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: 嵌套归档的递归解压
+@Date       : 2026/10/20 10:00
+@Author     : lkkings
+@FileName:  : test_nested.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import io
+import zipfile
+
+from conftest import make_files, read_tree, tar_bytes
+from datahive.script import unzip
+from datahive.utils.budget_util import budget
+
+
+def zip_bytes(files) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_nested_under_memory_budget(tmp_path):
+    """外层 tar 流水线持有的额度可达整个预算，嵌套归档及其按普通文件写出的回退都不能再预约"""
+    files = make_files(20, large=2)
+    outer = {
+        "a.zip": zip_bytes(files),
+        "b.tar.gz": tar_bytes(files, "w:gz"),
+        # 扩展名是归档但内容不是，按普通文件写出
+        "broken.zip": b"not a zip",
+        "x.txt": b"x",
+    }
+    archive = tmp_path / "outer.tar.gz"
+    archive.write_bytes(tar_bytes(outer, "w:gz"))
+    asyncio.run(unzip.run(str(archive), str(tmp_path / "out"), max_memory="4M", recursive=1))
+    expected = {"broken.zip": b"not a zip", "x.txt": b"x"}
+    for prefix in ("a", "b"):
+        expected.update({f"{prefix}/{name}": data for name, data in files.items()})
+    assert read_tree(tmp_path / "out") == expected
+    assert budget.used == 0
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: tar 归档的顺序解压
+@Date       : 2026/10/20 10:00
+@Author     : lkkings
+@FileName:  : test_tar.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import bz2
+import errno
+import gzip
+import io
+import lzma
+import os
+import tarfile
+
+import pytest
+
+from conftest import make_files, read_tree, tar_bytes
+from datahive.script import unzip
+from datahive.script.extraction import factory
+from datahive.script.extraction.tar_extraction import TarExtractionStrategy
+
+_COMPRESS = {"gz": gzip.compress, "bz2": bz2.compress, "xz": lzma.compress}
+
+
+@pytest.mark.parametrize("fmt", sorted(_COMPRESS))
+def test_multi_stream(tmp_path, fmt):
+    """多成员 gzip（bgzip、pigz -i）与多流 bz2/xz（pbzip2）要解压全部成员（流），第二次解压时已有索引"""
+    files = make_files(40, large=1)
+    data = tar_bytes(files)
+    half = len(data) // 2
+    archive = tmp_path / f"a.tar.{fmt}"
+    archive.write_bytes(_COMPRESS[fmt](data[:half]) + _COMPRESS[fmt](data[half:]))
+    for run in ("first", "indexed"):
+        out = tmp_path / run
+        asyncio.run(unzip.run(str(archive), str(out)))
+        assert read_tree(out) == files, run
+
+
+def _link_tar(path):
+    """普通文件、指向它的符号链接与硬链接，以及直接或经由已解压的符号链接指向输出目录之外的链接"""
+    files = {"dir/a.txt": b"hello", "big/large.bin": make_files(0, large=1)["big/large0.bin"]}
+    with tarfile.open(path, "w:gz") as tar_file:
+        for name, data in files.items():
+            file_info = tarfile.TarInfo(name)
+            file_info.size = len(data)
+            tar_file.addfile(file_info, io.BytesIO(data))
+        for name, kind, target in [("dir/sym.txt", tarfile.SYMTYPE, "a.txt"),
+                                   ("hard.bin", tarfile.LNKTYPE, "big/large.bin"),
+                                   ("root", tarfile.SYMTYPE, "."),
+                                   ("escape", tarfile.SYMTYPE, "root/../.."),
+                                   ("up", tarfile.SYMTYPE, "../outside"),
+                                   ("root/up", tarfile.SYMTYPE, "../outside"),
+                                   ("abs", tarfile.SYMTYPE, "/etc")]:
+            file_info = tarfile.TarInfo(name)
+            file_info.type = kind
+            file_info.linkname = target
+            tar_file.addfile(file_info)
+    return files
+
+
+def test_links(tmp_path):
+    """链接按归档重建，指向输出目录之外的链接不创建并作为失败报告，第二次解压时已有索引"""
+    archive = tmp_path / "links.tar.gz"
+    files = _link_tar(archive)
+    for run in ("first", "indexed"):
+        out = tmp_path / run
+        asyncio.run(unzip._extract(str(archive), str(out)))
+        extraction = factory.get_strategy(str(archive))
+        assert sorted(name for name, _ in extraction.failures) == ["abs", "escape", "root/up", "up"], run
+        assert os.readlink(out / "dir" / "sym.txt") == "a.txt"
+        assert os.path.samefile(out / "hard.bin", out / "big" / "large.bin")
+        assert read_tree(out) == {**files, "dir/sym.txt": b"hello", "hard.bin": files["big/large.bin"]}
+        for name in ("escape", "up", "abs"):
+            assert not os.path.lexists(out / name)
+
+
+def test_commit_failure_keeps_streaming(tmp_path, monkeypatch):
+    """大文件重命名失败只记为该成员失败，不留下临时文件，之后的成员继续解压"""
+    files = make_files(8, large=3)
+    archive = tmp_path / "a.tar.gz"
+    archive.write_bytes(gzip.compress(tar_bytes(files)))
+    name = "big/large0.bin"
+    commit = TarExtractionStrategy.commit
+
+    def failing_commit(self, part_path, target_path, entry, digest=None):
+        if entry[0] == name:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        commit(self, part_path, target_path, entry, digest)
+
+    monkeypatch.setattr(TarExtractionStrategy, "commit", failing_commit)
+    out = tmp_path / "out"
+    asyncio.run(unzip._extract(str(archive), str(out)))
+    assert [failed for failed, _ in factory.get_strategy(str(archive)).failures] == [name]
+    assert read_tree(out) == {k: v for k, v in files.items() if k != name}
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+@Description: zip 归档的解压与校验
+@Date       : 2026/10/20 10:00
+@Author     : lkkings
+@FileName:  : test_zip.py
+@Github     : https://github.com/lkkings
+@Mail       : lkkings888@gmail.com
+-------------------------------------------------
+Change Log  :
+
+"""
+import asyncio
+import os
+import resource
+import struct
+import zipfile
+import zlib
+
+import zstandard
+
+from conftest import flip_byte, make_files, read_tree, zip_data_offset
+from datahive.script import unzip
+from datahive.script.extraction._journal import ExtractionJournal
+from datahive.script.extraction._zip_reader import ZIP_ZSTANDARD
+
+
+def test_stored_corruption_detected(tmp_path):
+    """未压缩成员走内核复制时同样校验 CRC，损坏的成员不写出、不记入解压日志"""
+    files = make_files(8, large=2)
+    archive = tmp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    name = "big/large1.bin"
+    flip_byte(archive, zip_data_offset(archive, name) + 1000)
+    out = tmp_path / "out"
+    for resume in (False, True):
+        asyncio.run(unzip.run(str(archive), str(out), resume=resume))
+        assert read_tree(out) == {k: v for k, v in files.items() if k != name}
+        journal = ExtractionJournal(out)
+        journal.load()
+        assert not journal.verified(name, len(files[name]))
+
+
+def test_resume_after_rerun(tmp_path):
+    """成功后删除解压日志；非续解的重跑沿用已存在的文件并记入日志，之后续解不再重新解压它们"""
+    files = make_files(8, large=2)
+    archive = tmp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    out = tmp_path / "out"
+    journal_path = ExtractionJournal(out).path
+    asyncio.run(unzip.run(str(archive), str(out)))
+    assert read_tree(out) == files
+    assert not os.path.exists(journal_path)
+
+    # 重跑时缺失的成员已损坏，解压失败，日志保留
+    name = "big/large1.bin"
+    os.remove(out / name)
+    flip_byte(archive, zip_data_offset(archive, name) + 4096)
+    inodes = {k: os.stat(out / k).st_ino for k in files if k != name}
+    asyncio.run(unzip.run(str(archive), str(out)))
+    assert os.path.exists(journal_path)
+    asyncio.run(unzip.run(str(archive), str(out), resume=True))
+    assert {k: os.stat(out / k).st_ino for k in inodes} == inodes
+
+
+def zstd_zip(path, name: str, data: bytes):
+    """写出单个 zstd 压缩（方式 93）成员的 zip，zipfile 不支持写出该方式"""
+    compressed = zstandard.ZstdCompressor().compress(data)
+    encoded = name.encode()
+    crc = zlib.crc32(data)
+    local = struct.pack("<4s5H3L2H", b"PK\003\004", 63, 0, ZIP_ZSTANDARD, 0, 0x21, crc, len(compressed),
+                        len(data), len(encoded), 0) + encoded
+    central = struct.pack("<4s6H3L5H2L", b"PK\001\002", 63, 63, 0, ZIP_ZSTANDARD, 0, 0x21, crc,
+                          len(compressed), len(data), len(encoded), 0, 0, 0, 0, 0o644 << 16, 0) + encoded
+    end = struct.pack("<4s4H2LH", b"PK\005\006", 0, 0, 1, 1, len(central), len(local) + len(compressed), 0)
+    path.write_bytes(local + compressed + central + end)
+
+
+def test_zstd_member_bounded_memory(tmp_path):
+    """高压缩率的 zstd 成员按读取大小逐块解出，不会一次解出整个成员"""
+    size = 256 * 1024 * 1024
+    archive = tmp_path / "zeros.zip"
+    zstd_zip(archive, "zeros.bin", bytes(size))
+    out = tmp_path / "out"
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    asyncio.run(unzip.run(str(archive), str(out)))
+    grown = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024
+    assert os.path.getsize(out / "zeros.bin") == size
+    assert grown < size // 4